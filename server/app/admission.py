@@ -0,0 +1,92 @@
+import logging
+import time
+from collections import deque
+from itertools import islice
+
+from app.logs import LOGGER_NAME
+from app.metrics import OVERLOAD_LEVEL
+
+OVERLOAD_NORMAL = 0
+OVERLOAD_SHED = 1
+OVERLOAD_REJECT = 2
+OVERLOAD_LEVEL_NAMES = {
+    OVERLOAD_NORMAL: "normal",
+    OVERLOAD_SHED: "shed",
+    OVERLOAD_REJECT: "reject",
+}
+DEFAULT_OVERLOAD_WINDOW_SAMPLES = 4
+MS_PER_SECOND = 1000
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: float) -> None:
+        self.rate_per_second = rate_per_second
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def take(self, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        elapsed = max(now - self._updated, 0.0)
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_second)
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self.rate_per_second
+
+    def refund(self) -> None:
+        self._tokens = min(self.burst, self._tokens + 1.0)
+
+
+def create_bucket(rate_per_second: float, burst: float) -> TokenBucket | None:
+    if rate_per_second <= 0:
+        return None
+    return TokenBucket(rate_per_second, burst)
+
+
+class OverloadGuard:
+    def __init__(
+        self,
+        lag_samples: deque[float],
+        shed_lag_seconds: float,
+        reject_lag_seconds: float,
+        window_samples: int = DEFAULT_OVERLOAD_WINDOW_SAMPLES,
+    ) -> None:
+        self.lag_samples = lag_samples
+        self.shed_lag_seconds = shed_lag_seconds
+        self.reject_lag_seconds = reject_lag_seconds
+        self.window_samples = max(window_samples, 1)
+        self._level = OVERLOAD_NORMAL
+
+    def recent_lag(self) -> float:
+        return max(islice(reversed(self.lag_samples), self.window_samples), default=0.0)
+
+    def level(self) -> int:
+        lag = self.recent_lag()
+        level = OVERLOAD_NORMAL
+        if self.reject_lag_seconds > 0 and lag >= self.reject_lag_seconds:
+            level = OVERLOAD_REJECT
+        elif self.shed_lag_seconds > 0 and lag >= self.shed_lag_seconds:
+            level = OVERLOAD_SHED
+        if level != self._level:
+            LOGGER.warning(
+                "overload level=%s previous=%s lag_ms=%.1f",
+                OVERLOAD_LEVEL_NAMES[level],
+                OVERLOAD_LEVEL_NAMES[self._level],
+                lag * MS_PER_SECOND,
+            )
+            self._level = level
+            OVERLOAD_LEVEL.set(level)
+        return level
+
+    def shedding(self) -> bool:
+        return self.level() >= OVERLOAD_SHED
+
+    def rejecting(self) -> bool:
+        return self.level() >= OVERLOAD_REJECT
+
+    def retry_after_seconds(self) -> float:
+        return max(self.recent_lag(), self.reject_lag_seconds)
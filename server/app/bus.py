@@ -0,0 +1,280 @@
+import abc
+import asyncio
+import json
+import logging
+from collections import deque
+from pathlib import Path
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+from app.logs import LOGGER_NAME
+from app.metrics import BUS_EVENTS_TOTAL
+
+BUS_SCHEME_MEMORY = "memory"
+BUS_SCHEME_UNIX = "unix"
+BUS_SCHEME_REDIS = ("redis", "rediss")
+BUS_SCHEME_SEPARATOR = "://"
+BUS_CHANNEL_PREFIX = "words:"
+BUS_KEY_CHANNEL = "channel"
+BUS_KEY_NODE = "node"
+BUS_KEY_MESSAGE = "message"
+BUS_EVENT_PUBLISHED = "published"
+BUS_EVENT_RECEIVED = "received"
+BUS_EVENT_DROPPED = "dropped"
+DEFAULT_BUS_PENDING_LIMIT = 1024
+DEFAULT_BUS_RECONNECT_SECONDS = 1.0
+BUS_LINE_LIMIT = 1024 * 1024
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+def encode_envelope(channel: str, node_id: str, message: dict) -> bytes:
+    envelope = {BUS_KEY_CHANNEL: channel, BUS_KEY_NODE: node_id, BUS_KEY_MESSAGE: message}
+    return (json.dumps(envelope, separators=(",", ":"), ensure_ascii=False) + "\n").encode(
+        "utf-8"
+    )
+
+
+def decode_envelope(line: bytes) -> tuple[str, str, dict] | None:
+    try:
+        envelope = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(envelope, dict):
+        return None
+    channel = envelope.get(BUS_KEY_CHANNEL)
+    message = envelope.get(BUS_KEY_MESSAGE)
+    if not isinstance(channel, str) or not isinstance(message, dict):
+        return None
+    return channel, str(envelope.get(BUS_KEY_NODE)), message
+
+
+class EventBus(abc.ABC):
+    def __init__(self, node_id: str, pending_limit: int = DEFAULT_BUS_PENDING_LIMIT) -> None:
+        self.node_id = node_id
+        self._handlers: dict[str, list] = {}
+        self._pending: deque[tuple[str, dict]] = deque()
+        self._pending_limit = max(pending_limit, 1)
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def publish(self, channel: str, message: dict) -> None:
+        if len(self._pending) >= self._pending_limit:
+            self._pending.popleft()
+            BUS_EVENTS_TOTAL.inc(BUS_EVENT_DROPPED)
+        self._pending.append((channel, message))
+        self._ready.set()
+
+    def deliver(self, channel: str, node_id: str, message: dict) -> None:
+        BUS_EVENTS_TOTAL.inc(BUS_EVENT_RECEIVED)
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(node_id, message)
+            except Exception as error:
+                LOGGER.error(
+                    "bus_handler_failed channel=%s error=%s message=%s",
+                    channel,
+                    type(error).__name__,
+                    str(error),
+                )
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def next_events(self) -> list[tuple[str, dict]]:
+        while not self._pending:
+            self._ready.clear()
+            await self._ready.wait()
+        events = list(self._pending)
+        self._pending.clear()
+        return events
+
+    @abc.abstractmethod
+    async def run(self) -> None:
+        ...
+
+
+class LocalBus(EventBus):
+    async def run(self) -> None:
+        while True:
+            for channel, message in await self.next_events():
+                BUS_EVENTS_TOTAL.inc(BUS_EVENT_PUBLISHED)
+                self.deliver(channel, self.node_id, message)
+
+
+class UnixSocketBus(EventBus):
+    def __init__(
+        self,
+        node_id: str,
+        path: Path,
+        reconnect_seconds: float = DEFAULT_BUS_RECONNECT_SECONDS,
+    ) -> None:
+        super().__init__(node_id)
+        self.path = path
+        self.reconnect_seconds = reconnect_seconds
+
+    async def run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(
+                    str(self.path), limit=BUS_LINE_LIMIT
+                )
+            except OSError as error:
+                LOGGER.warning(
+                    "bus_connect_failed path=%s error=%s", self.path, type(error).__name__
+                )
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+            tasks = {
+                asyncio.create_task(self.read_events(reader)),
+                asyncio.create_task(self.write_events(writer)),
+            }
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is not None:
+                        LOGGER.warning(
+                            "bus_connection_failed path=%s error=%s",
+                            self.path,
+                            type(task.exception()).__name__,
+                        )
+            finally:
+                for task in tasks:
+                    task.cancel()
+                writer.close()
+            await asyncio.sleep(self.reconnect_seconds)
+
+    async def write_events(self, writer: asyncio.StreamWriter) -> None:
+        while True:
+            events = await self.next_events()
+            writer.writelines(
+                encode_envelope(channel, self.node_id, message) for channel, message in events
+            )
+            await writer.drain()
+            BUS_EVENTS_TOTAL.inc(BUS_EVENT_PUBLISHED, amount=len(events))
+
+    async def read_events(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            event = decode_envelope(line)
+            if event is not None:
+                self.deliver(*event)
+
+
+class BusHub:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(
+            self.handle_connection, str(self.path), limit=BUS_LINE_LIMIT
+        )
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._writers):
+            writer.close()
+        self._writers.clear()
+        self.path.unlink(missing_ok=True)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for target in list(self._writers):
+                    if target.is_closing():
+                        self._writers.discard(target)
+                        continue
+                    target.write(line)
+        except (OSError, ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+class RedisBus(EventBus):
+    def __init__(self, node_id: str, url: str) -> None:
+        super().__init__(node_id)
+        self.url = url
+        self._client = None
+        self._listener: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = redis_asyncio.from_url(self.url)
+            pubsub = self._client.pubsub()
+            await pubsub.psubscribe(BUS_CHANNEL_PREFIX + "*")
+            self._listener = asyncio.create_task(self.read_events(pubsub))
+        await super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def run(self) -> None:
+        while True:
+            for channel, message in await self.next_events():
+                payload = encode_envelope(channel, self.node_id, message)
+                try:
+                    await self._client.publish(BUS_CHANNEL_PREFIX + channel, payload)
+                    BUS_EVENTS_TOTAL.inc(BUS_EVENT_PUBLISHED)
+                except Exception as error:
+                    BUS_EVENTS_TOTAL.inc(BUS_EVENT_DROPPED)
+                    LOGGER.warning(
+                        "bus_publish_failed channel=%s error=%s",
+                        channel,
+                        type(error).__name__,
+                    )
+
+    async def read_events(self, pubsub) -> None:
+        async for item in pubsub.listen():
+            if item.get("type") != "pmessage":
+                continue
+            event = decode_envelope(item.get("data") or b"")
+            if event is not None:
+                self.deliver(*event)
+
+
+def create_bus(url: str, node_id: str) -> EventBus:
+    scheme, _, target = url.partition(BUS_SCHEME_SEPARATOR)
+    if scheme == BUS_SCHEME_MEMORY:
+        return LocalBus(node_id)
+    if scheme == BUS_SCHEME_UNIX and target:
+        return UnixSocketBus(node_id, Path(target))
+    if scheme in BUS_SCHEME_REDIS:
+        if redis_asyncio is None:
+            raise ValueError("redis is not installed")
+        return RedisBus(node_id, url)
+    raise ValueError(f"unsupported bus url {url}")
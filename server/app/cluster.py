@@ -0,0 +1,446 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import FastAPI, WebSocket
+import uvicorn
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from app.bus import (
+    BUS_SCHEME_MEMORY,
+    BUS_SCHEME_SEPARATOR,
+    BUS_SCHEME_UNIX,
+    BusHub,
+    create_bus,
+)
+from app.codec import decode_frame
+from app.logs import LOGGER_NAME
+
+DEFAULT_WORKERS = 1
+DEFAULT_WORKER_INDEX = 0
+DEFAULT_WORKER_HOST = "127.0.0.1"
+DEFAULT_RING_REPLICAS = 64
+DEFAULT_WORKER_RESTART_SECONDS = 1.0
+DEFAULT_WORKER_STOP_SECONDS = 10.0
+DEFAULT_UPSTREAM_CONNECT_ATTEMPTS = 25
+DEFAULT_UPSTREAM_RETRY_SECONDS = 0.2
+DEFAULT_ROOM_ID = "default"
+MAX_FRAMES_BEFORE_JOIN = 16
+ROUTER_NODE_ID = "router"
+WORKER_PERSISTENCE_PREFIX = "worker-"
+BUS_SOCKET_TEMPLATE = "words-bus-{pid}.sock"
+BUS_CHANNEL_PRESENCE = "presence"
+PRESENCE_KEY_ROOM_ID = "roomId"
+PRESENCE_KEY_WORKER = "worker"
+PRESENCE_KEY_ACTIVE_COUNT = "activeCount"
+MESSAGE_TYPE_JOIN = "join"
+JSON_KEY_TYPE = "type"
+JSON_KEY_ROOM_ID = "roomId"
+WS_PATH = "/ws"
+WS_CLOSE_CODE_NORMAL = 1000
+WS_CLOSE_CODE_POLICY_VIOLATION = 1008
+WS_CLOSE_CODE_SERVICE_RESTART = 1012
+WS_CLOSE_CODE_TRY_AGAIN_LATER = 1013
+WS_UNSENDABLE_CLOSE_CODES = (1005, 1006, 1015)
+
+ENV_HOST = "HOST"
+ENV_PORT = "PORT"
+ENV_WORKERS = "WORKERS"
+ENV_WORKER_INDEX = "WORKER_INDEX"
+ENV_WORKER_BASE_PORT = "WORKER_BASE_PORT"
+ENV_BUS_URL = "BUS_URL"
+ENV_PERSISTENCE_DIR = "PERSISTENCE_DIR"
+ENV_HANDOFF_DIR = "HANDOFF_DIR"
+ENV_RECORD_DIR = "RECORD_DIR"
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+def hash_key(value: str) -> int:
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HashRing:
+    def __init__(self, nodes: list[int], replicas: int = DEFAULT_RING_REPLICAS) -> None:
+        points = sorted(
+            (hash_key(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> int | None:
+        if not self._nodes:
+            return None
+        index = bisect.bisect(self._hashes, hash_key(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+def resolve_routing_key(frame: str | bytes) -> str | None:
+    try:
+        payload = json.loads(frame) if isinstance(frame, str) else decode_frame(frame)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or payload.get(JSON_KEY_TYPE) != MESSAGE_TYPE_JOIN:
+        return None
+    value = payload.get(JSON_KEY_ROOM_ID)
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return DEFAULT_ROOM_ID
+
+
+def sendable_close_code(code: int | None, fallback: int) -> int:
+    if code is None or code in WS_UNSENDABLE_CLOSE_CODES:
+        return fallback
+    return code
+
+
+@dataclass
+class WorkerProcess:
+    index: int
+    host: str
+    port: int
+    process: asyncio.subprocess.Process | None = None
+    alive: bool = False
+    restarts: int = 0
+    task: asyncio.Task | None = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}{WS_PATH}"
+
+
+class Cluster:
+    def __init__(
+        self,
+        worker_count: int,
+        worker_host: str,
+        base_port: int,
+        bus_url: str,
+        persistence_dir: str,
+        handoff_dir: str = "",
+        record_dir: str = "",
+    ) -> None:
+        self.workers = [
+            WorkerProcess(index, worker_host, base_port + index)
+            for index in range(worker_count)
+        ]
+        self.bus_url = bus_url
+        self.persistence_dir = persistence_dir
+        self.handoff_dir = handoff_dir
+        self.record_dir = record_dir
+        self.ring = HashRing([])
+        self.directory: dict[str, int] = {}
+        self.stopping = False
+        scheme, _, target = bus_url.partition(BUS_SCHEME_SEPARATOR)
+        self.hub = BusHub(Path(target)) if scheme == BUS_SCHEME_UNIX else None
+        self.bus = create_bus(bus_url, ROUTER_NODE_ID)
+        self.bus.subscribe(BUS_CHANNEL_PRESENCE, self.handle_presence)
+
+    async def start(self) -> None:
+        if self.hub is not None:
+            await self.hub.start()
+        await self.bus.start()
+        for worker in self.workers:
+            worker.task = asyncio.create_task(self.supervise(worker))
+
+    async def drain(self) -> None:
+        self.stopping = True
+        for worker in self.workers:
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.send_signal(signal.SIGTERM)
+        tasks = [
+            worker.task
+            for worker in self.workers
+            if worker.task is not None and not worker.task.done()
+        ]
+        if not tasks:
+            return
+        LOGGER.info("router -> drain -> start workers=%s", len(tasks))
+        done, pending = await asyncio.wait(tasks, timeout=DEFAULT_WORKER_STOP_SECONDS)
+        for worker in self.workers:
+            if worker.process is not None and worker.process.returncode is None:
+                LOGGER.warning("router -> worker_kill -> worker%s", worker.index)
+                worker.process.kill()
+        if pending:
+            await asyncio.wait(pending)
+        LOGGER.info("router -> drain -> done workers=%s", len(done))
+
+    async def stop(self) -> None:
+        await self.drain()
+        await self.bus.stop()
+        if self.hub is not None:
+            await self.hub.stop()
+
+    def worker_env(self, worker: WorkerProcess) -> dict[str, str]:
+        env = dict(os.environ)
+        env[ENV_WORKERS] = str(DEFAULT_WORKERS)
+        env[ENV_WORKER_INDEX] = str(worker.index)
+        env[ENV_HOST] = worker.host
+        env[ENV_PORT] = str(worker.port)
+        env[ENV_BUS_URL] = self.bus_url
+        if self.persistence_dir:
+            env[ENV_PERSISTENCE_DIR] = str(
+                Path(self.persistence_dir) / f"{WORKER_PERSISTENCE_PREFIX}{worker.index}"
+            )
+        if self.handoff_dir:
+            env[ENV_HANDOFF_DIR] = str(
+                Path(self.handoff_dir) / f"{WORKER_PERSISTENCE_PREFIX}{worker.index}"
+            )
+        if self.record_dir:
+            env[ENV_RECORD_DIR] = str(
+                Path(self.record_dir) / f"{WORKER_PERSISTENCE_PREFIX}{worker.index}"
+            )
+        return env
+
+    async def supervise(self, worker: WorkerProcess) -> None:
+        while not self.stopping:
+            worker.process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "app.main",
+                env=self.worker_env(worker),
+                cwd=str(SERVER_DIR),
+            )
+            worker.alive = True
+            self.rebuild_ring()
+            LOGGER.info(
+                "router -> worker_start -> worker%s pid=%s port=%s",
+                worker.index,
+                worker.process.pid,
+                worker.port,
+            )
+            code = await worker.process.wait()
+            worker.alive = False
+            self.forget_worker(worker.index)
+            self.rebuild_ring()
+            if self.stopping:
+                LOGGER.info("router -> worker_stop -> worker%s code=%s", worker.index, code)
+                return
+            worker.restarts += 1
+            LOGGER.warning(
+                "router -> worker_exit -> worker%s code=%s restarts=%s",
+                worker.index,
+                code,
+                worker.restarts,
+            )
+            await asyncio.sleep(DEFAULT_WORKER_RESTART_SECONDS)
+
+    def rebuild_ring(self) -> None:
+        self.ring = HashRing([worker.index for worker in self.workers if worker.alive])
+
+    def forget_worker(self, index: int) -> None:
+        self.directory = {
+            room_id: owner for room_id, owner in self.directory.items() if owner != index
+        }
+
+    def handle_presence(self, _: str, message: dict) -> None:
+        room_id = message.get(PRESENCE_KEY_ROOM_ID)
+        index = message.get(PRESENCE_KEY_WORKER)
+        if not isinstance(room_id, str) or not isinstance(index, int):
+            return
+        if not 0 <= index < len(self.workers):
+            return
+        if message.get(PRESENCE_KEY_ACTIVE_COUNT, 0) > 0:
+            self.directory[room_id] = index
+        elif self.directory.get(room_id) == index:
+            del self.directory[room_id]
+
+    def route(self, room_id: str) -> int | None:
+        index = self.directory.get(room_id)
+        if index is not None and self.workers[index].alive:
+            return index
+        return self.ring.node_for(room_id)
+
+    async def connect_upstream(self, room_id: str):
+        for _ in range(DEFAULT_UPSTREAM_CONNECT_ATTEMPTS):
+            index = self.route(room_id)
+            if index is not None:
+                try:
+                    upstream = await websockets.connect(
+                        self.workers[index].url,
+                        max_size=None,
+                        ping_interval=None,
+                        compression=None,
+                    )
+                    return index, upstream
+                except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake):
+                    pass
+            await asyncio.sleep(DEFAULT_UPSTREAM_RETRY_SECONDS)
+        return None, None
+
+    def report(self) -> dict:
+        rooms_by_worker: dict[int, int] = {}
+        for index in self.directory.values():
+            rooms_by_worker[index] = rooms_by_worker.get(index, 0) + 1
+        return {
+            "busUrl": self.bus_url,
+            "rooms": len(self.directory),
+            "workers": [
+                {
+                    "index": worker.index,
+                    "port": worker.port,
+                    "pid": worker.process.pid if worker.process is not None else None,
+                    "alive": worker.alive,
+                    "restarts": worker.restarts,
+                    "rooms": rooms_by_worker.get(worker.index, 0),
+                }
+                for worker in self.workers
+            ],
+        }
+
+
+CLUSTER: Cluster | None = None
+
+
+class DrainingRouter(uvicorn.Server):
+    async def shutdown(self, sockets=None) -> None:
+        await CLUSTER.drain()
+        await super().shutdown(sockets=sockets)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await CLUSTER.start()
+    try:
+        yield
+    finally:
+        await CLUSTER.stop()
+
+
+router_app = FastAPI(lifespan=lifespan)
+
+
+@router_app.get("/cluster")
+async def cluster_report_endpoint() -> dict:
+    return CLUSTER.report()
+
+
+@router_app.websocket(WS_PATH)
+async def proxy_endpoint(websocket: WebSocket) -> None:
+    await websocket.accept()
+    frames: list[str | bytes] = []
+    room_id = None
+    while room_id is None:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        frame = message.get("text")
+        if frame is None:
+            frame = message.get("bytes") or b""
+        frames.append(frame)
+        room_id = resolve_routing_key(frame)
+        if room_id is None and len(frames) >= MAX_FRAMES_BEFORE_JOIN:
+            await websocket.close(code=WS_CLOSE_CODE_POLICY_VIOLATION, reason="join_required")
+            return
+    index, upstream = await CLUSTER.connect_upstream(room_id)
+    if upstream is None:
+        LOGGER.warning("router -> route -> room(%s) failed reason=no_worker", room_id)
+        await websocket.close(code=WS_CLOSE_CODE_TRY_AGAIN_LATER, reason="no_worker")
+        return
+    LOGGER.info("router -> route -> worker%s room(%s)", index, room_id)
+    relays = {
+        asyncio.create_task(relay_client(websocket, upstream, frames)),
+        asyncio.create_task(relay_upstream(websocket, upstream)),
+    }
+    try:
+        await asyncio.wait(relays, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for relay in relays:
+            relay.cancel()
+        await asyncio.gather(*relays, return_exceptions=True)
+        await upstream.close()
+
+
+async def relay_client(websocket: WebSocket, upstream, frames: list[str | bytes]) -> None:
+    for frame in frames:
+        await upstream.send(frame)
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            await upstream.close(
+                code=sendable_close_code(message.get("code"), WS_CLOSE_CODE_NORMAL),
+                reason=message.get("reason") or "",
+            )
+            return
+        frame = message.get("text")
+        await upstream.send(frame if frame is not None else message.get("bytes") or b"")
+
+
+async def relay_upstream(websocket: WebSocket, upstream) -> None:
+    try:
+        async for frame in upstream:
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+    except websockets.ConnectionClosed:
+        pass
+    await websocket.close(
+        code=sendable_close_code(upstream.close_code, WS_CLOSE_CODE_SERVICE_RESTART),
+        reason=upstream.close_reason or "",
+    )
+
+
+def default_bus_url() -> str:
+    path = Path(tempfile.gettempdir()) / BUS_SOCKET_TEMPLATE.format(pid=os.getpid())
+    return f"{BUS_SCHEME_UNIX}{BUS_SCHEME_SEPARATOR}{path}"
+
+
+def run_cluster(
+    host: str,
+    port: int,
+    worker_count: int,
+    ws_ping_interval: int,
+    ws_ping_timeout: int,
+) -> None:
+    global CLUSTER
+    if websockets is None:
+        raise RuntimeError("websockets is required to run more than one worker")
+    raw_base_port = os.getenv(ENV_WORKER_BASE_PORT, "").strip()
+    base_port = int(raw_base_port) if raw_base_port.isdigit() else port + 1
+    bus_url = os.getenv(ENV_BUS_URL, "").strip()
+    if bus_url.startswith(BUS_SCHEME_MEMORY):
+        LOGGER.warning("invalid_env_value name=%s value=%s", ENV_BUS_URL, bus_url)
+        bus_url = ""
+    CLUSTER = Cluster(
+        worker_count=worker_count,
+        worker_host=DEFAULT_WORKER_HOST,
+        base_port=base_port,
+        bus_url=bus_url or default_bus_url(),
+        persistence_dir=os.getenv(ENV_PERSISTENCE_DIR, "").strip(),
+        handoff_dir=os.getenv(ENV_HANDOFF_DIR, "").strip(),
+        record_dir=os.getenv(ENV_RECORD_DIR, "").strip(),
+    )
+    LOGGER.info(
+        "router -> start -> workers=%s ports=%s-%s bus=%s",
+        worker_count,
+        base_port,
+        base_port + worker_count - 1,
+        CLUSTER.bus_url,
+    )
+    DrainingRouter(
+        uvicorn.Config(
+            router_app,
+            host=host,
+            port=port,
+            ws_ping_interval=ws_ping_interval,
+            ws_ping_timeout=ws_ping_timeout,
+        )
+    ).run()
@@ -0,0 +1,100 @@
+import base64
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CODEC_JSON = "json"
+CODEC_MSGPACK = "msgpack"
+CODECS = (CODEC_JSON, CODEC_MSGPACK) if msgpack is not None else (CODEC_JSON,)
+
+JSON_KEY_SNAPSHOT = "snapshot"
+JSON_KEY_DELTA = "delta"
+JSON_KEY_REVEALED = "revealed"
+JSON_KEY_WORDS = "words"
+JSON_KEY_POSITIONS = "positions"
+JSON_KEY_ROW = "row"
+JSON_KEY_COL = "col"
+PACKED_CELL_SIZE = 2
+PACKED_SECTION_KEYS = (JSON_KEY_SNAPSHOT, JSON_KEY_DELTA)
+
+
+def resolve_codec(value: object) -> str:
+    return value if isinstance(value, str) and value in CODECS else CODEC_JSON
+
+
+def pack_cells(cells: object) -> object:
+    if not isinstance(cells, list):
+        return cells
+    try:
+        return bytes(
+            value for cell in cells for value in (cell[JSON_KEY_ROW], cell[JSON_KEY_COL])
+        )
+    except (KeyError, TypeError, ValueError):
+        return cells
+
+
+def unpack_cells(cells: object) -> object:
+    if not isinstance(cells, bytes) or len(cells) % PACKED_CELL_SIZE:
+        return cells
+    return [
+        {JSON_KEY_ROW: cells[index], JSON_KEY_COL: cells[index + 1]}
+        for index in range(0, len(cells), PACKED_CELL_SIZE)
+    ]
+
+
+def convert_section(section: object, convert_cells) -> object:
+    if not isinstance(section, dict):
+        return section
+    converted = dict(section)
+    if JSON_KEY_REVEALED in converted:
+        converted[JSON_KEY_REVEALED] = convert_cells(converted[JSON_KEY_REVEALED])
+    words = converted.get(JSON_KEY_WORDS)
+    if isinstance(words, list):
+        converted[JSON_KEY_WORDS] = [
+            {**item, JSON_KEY_POSITIONS: convert_cells(item.get(JSON_KEY_POSITIONS))}
+            if isinstance(item, dict) and JSON_KEY_POSITIONS in item
+            else item
+            for item in words
+        ]
+    return converted
+
+
+def convert_message(message: dict, convert_cells) -> dict:
+    if JSON_KEY_WORDS in message:
+        message = convert_section(message, convert_cells)
+    if not any(isinstance(message.get(key), dict) for key in PACKED_SECTION_KEYS):
+        return message
+    converted = dict(message)
+    for key in PACKED_SECTION_KEYS:
+        if key in converted:
+            converted[key] = convert_section(converted[key], convert_cells)
+    return converted
+
+
+def encode_json_bytes(value: object) -> str:
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_frame(message: dict, codec: str) -> str | bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(convert_message(message, pack_cells), use_bin_type=True)
+    return json.dumps(
+        message, separators=(",", ":"), ensure_ascii=False, default=encode_json_bytes
+    )
+
+
+def decode_frame(data: bytes) -> object:
+    if msgpack is None:
+        raise ValueError("msgpack is not installed")
+    try:
+        payload = msgpack.unpackb(data, raw=False)
+    except Exception as error:
+        raise ValueError(str(error)) from error
+    if isinstance(payload, dict):
+        return convert_message(payload, unpack_cells)
+    return payload
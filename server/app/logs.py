@@ -0,0 +1,129 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+LOGGER_NAME = "words.server"
+LOG_CATEGORY_MOVES = "moves"
+LOG_CATEGORY_BROADCAST = "broadcast"
+LOG_CATEGORY_GRID = "grid"
+LOG_CATEGORIES = (LOG_CATEGORY_MOVES, LOG_CATEGORY_BROADCAST, LOG_CATEGORY_GRID)
+RATE_LIMITED_CATEGORIES = (LOG_CATEGORY_MOVES, LOG_CATEGORY_BROADCAST, LOG_CATEGORY_GRID)
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+LOG_LEVELS_ITEM_SEPARATOR = ","
+LOG_LEVELS_VALUE_SEPARATOR = "="
+
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_CATEGORY_LEVELS = {LOG_CATEGORY_GRID: "DEBUG"}
+DEFAULT_LOG_RATE_LIMIT_PER_SECOND = 50
+DEFAULT_LOG_QUEUE_SIZE = 10000
+
+ENV_LOG_LEVEL = "LOG_LEVEL"
+ENV_LOG_LEVELS = "LOG_LEVELS"
+ENV_LOG_RATE_LIMIT_PER_SECOND = "LOG_RATE_LIMIT_PER_SECOND"
+ENV_LOG_QUEUE_SIZE = "LOG_QUEUE_SIZE"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, per_second: int) -> None:
+        super().__init__()
+        self._per_second = per_second
+        self._tokens = float(per_second)
+        self._updated = time.monotonic()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self._per_second <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(
+            float(self._per_second),
+            self._tokens + (now - self._updated) * self._per_second,
+        )
+        self._updated = now
+        if self._tokens < 1:
+            self.suppressed += 1
+            return False
+        self._tokens -= 1
+        if self.suppressed and isinstance(record.args, tuple):
+            record.msg = f"{record.msg} suppressed=%s"
+            record.args = (*record.args, self.suppressed)
+            self.suppressed = 0
+        return True
+
+
+def category_logger_name(category: str) -> str:
+    return f"{LOGGER_NAME}.{category}"
+
+
+def parse_level(raw: str | None, default: str) -> int:
+    level = logging.getLevelName((raw or default).strip().upper())
+    if isinstance(level, int):
+        return level
+    return logging.getLevelName(default)
+
+
+def parse_category_levels(raw: str | None) -> dict[str, str]:
+    levels = dict(DEFAULT_CATEGORY_LEVELS)
+    if not raw:
+        return levels
+    for item in raw.split(LOG_LEVELS_ITEM_SEPARATOR):
+        category, separator, level = item.partition(LOG_LEVELS_VALUE_SEPARATOR)
+        category = category.strip()
+        if separator and category in LOG_CATEGORIES:
+            levels[category] = level.strip()
+    return levels
+
+
+def read_non_negative_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        return max(int(raw), 0)
+    except ValueError:
+        return default
+
+
+def configure_logging() -> DroppingQueueHandler:
+    root_level = parse_level(os.getenv(ENV_LOG_LEVEL), DEFAULT_LOG_LEVEL)
+    category_levels = parse_category_levels(os.getenv(ENV_LOG_LEVELS))
+    rate_limit = read_non_negative_int(
+        ENV_LOG_RATE_LIMIT_PER_SECOND, DEFAULT_LOG_RATE_LIMIT_PER_SECOND
+    )
+    queue_size = read_non_negative_int(ENV_LOG_QUEUE_SIZE, DEFAULT_LOG_QUEUE_SIZE)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(root_level)
+    for category in LOG_CATEGORIES:
+        logger = logging.getLogger(category_logger_name(category))
+        if category in category_levels:
+            logger.setLevel(parse_level(category_levels[category], DEFAULT_LOG_LEVEL))
+        if category in RATE_LIMITED_CATEGORIES:
+            logger.filters = [RateLimitFilter(rate_limit)]
+    return queue_handler
@@ -0,0 +1,160 @@
+import asyncio
+import collections.abc
+import contextvars
+import logging
+import time
+from collections import deque
+
+from app.logs import LOGGER_NAME
+from app.metrics import LOOP_LAG_SECONDS, LOOP_LAG_MAX_SECONDS, SLOW_CALLBACKS_TOTAL
+
+ACTIVITY_UNKNOWN = "unknown"
+ACTIVITY_NO_ROOM = "-"
+CALLBACK_LABEL_LIMIT = 120
+MS_PER_SECOND = 1000
+
+LOOP_ACTIVITY: contextvars.ContextVar[tuple[str, str] | None] = contextvars.ContextVar(
+    "loop_activity", default=None
+)
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+def set_activity(activity: str, room_id: str | None) -> None:
+    LOOP_ACTIVITY.set((activity, room_id or ACTIVITY_NO_ROOM))
+
+
+def describe_coroutine(coroutine: collections.abc.Coroutine) -> str:
+    label = getattr(coroutine, "__qualname__", None) or type(coroutine).__name__
+    return label[:CALLBACK_LABEL_LIMIT]
+
+
+class TimedCoroutine(collections.abc.Coroutine):
+    def __init__(self, coroutine: collections.abc.Coroutine, monitor: "LoopMonitor") -> None:
+        self._coroutine = coroutine
+        self._monitor = monitor
+
+    def __getattr__(self, name: str):
+        return getattr(self._coroutine, name)
+
+    def __await__(self):
+        return self._coroutine.__await__()
+
+    def send(self, value):
+        started = time.perf_counter()
+        try:
+            return self._coroutine.send(value)
+        finally:
+            self._monitor.observe_step(self._coroutine, time.perf_counter() - started)
+
+    def throw(self, *args):
+        started = time.perf_counter()
+        try:
+            return self._coroutine.throw(*args)
+        finally:
+            self._monitor.observe_step(self._coroutine, time.perf_counter() - started)
+
+    def close(self):
+        return self._coroutine.close()
+
+
+class LoopMonitor:
+    def __init__(
+        self, interval_seconds: float, slow_seconds: float, history_limit: int
+    ) -> None:
+        self.interval_seconds = interval_seconds
+        self.slow_seconds = slow_seconds
+        self.slow_events: deque[dict] = deque(maxlen=max(history_limit, 1))
+        self.lag_samples: deque[float] = deque(maxlen=max(history_limit, 1))
+        self.attribution = False
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._previous_factory = None
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        if self.slow_seconds > 0:
+            self.install_task_factory(asyncio.get_running_loop())
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._loop is not None:
+            self._loop.set_task_factory(self._previous_factory)
+            self._loop = None
+            self._previous_factory = None
+            self.attribution = False
+
+    async def run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            lag = max(time.perf_counter() - expected, 0.0)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.lag_samples.append(lag)
+            LOOP_LAG_MAX_SECONDS.set(max(self.lag_samples))
+            if self.slow_seconds > 0 and lag >= self.slow_seconds:
+                LOGGER.warning(
+                    "loop_lag lag_ms=%.1f threshold_ms=%.1f",
+                    lag * MS_PER_SECOND,
+                    self.slow_seconds * MS_PER_SECOND,
+                )
+
+    def install_task_factory(self, loop: asyncio.AbstractEventLoop) -> None:
+        previous_factory = loop.get_task_factory()
+
+        def create_timed_task(task_loop, coroutine, **kwargs):
+            timed = TimedCoroutine(coroutine, self)
+            if previous_factory is not None:
+                return previous_factory(task_loop, timed, **kwargs)
+            return asyncio.Task(timed, loop=task_loop, **kwargs)
+
+        loop.set_task_factory(create_timed_task)
+        self._loop = loop
+        self._previous_factory = previous_factory
+        self.attribution = True
+
+    def observe_step(self, coroutine: collections.abc.Coroutine, duration: float) -> None:
+        if duration >= self.slow_seconds:
+            self.record_slow_callback(coroutine, duration)
+
+    def record_slow_callback(
+        self, coroutine: collections.abc.Coroutine, duration: float
+    ) -> None:
+        activity = LOOP_ACTIVITY.get()
+        activity_type, room_id = activity or (ACTIVITY_UNKNOWN, ACTIVITY_NO_ROOM)
+        callback = describe_coroutine(coroutine)
+        SLOW_CALLBACKS_TOTAL.inc(activity_type)
+        self.slow_events.append(
+            {
+                "at": round(time.time(), 3),
+                "durationMs": round(duration * MS_PER_SECOND, 3),
+                "activity": activity_type,
+                "roomId": room_id,
+                "callback": callback,
+            }
+        )
+        LOGGER.warning(
+            "slow_callback duration_ms=%.1f activity=%s room=%s callback=%s",
+            duration * MS_PER_SECOND,
+            activity_type,
+            room_id,
+            callback,
+        )
+
+    def report(self) -> dict:
+        lags = sorted(self.lag_samples)
+        return {
+            "intervalMs": self.interval_seconds * MS_PER_SECOND,
+            "slowThresholdMs": self.slow_seconds * MS_PER_SECOND,
+            "attribution": self.attribution,
+            "lagMs": {
+                "samples": len(lags),
+                "last": round(self.lag_samples[-1] * MS_PER_SECOND, 3) if lags else None,
+                "median": round(lags[len(lags) // 2] * MS_PER_SECOND, 3) if lags else None,
+                "max": round(lags[-1] * MS_PER_SECOND, 3) if lags else None,
+            },
+            "slowCallbacks": list(self.slow_events),
+        }
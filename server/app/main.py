@@ -1,32 +1,170 @@
 import asyncio
+import json
 import logging
 import os
+import time
 import uuid
+from collections import deque
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from pathlib import Path
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
+from app.admission import OverloadGuard, TokenBucket, create_bucket
+from app.bus import EventBus, create_bus
+from app.cluster import (
+    BUS_CHANNEL_PRESENCE,
+    DEFAULT_WORKER_INDEX,
+    DEFAULT_WORKERS,
+    ENV_BUS_URL,
+    ENV_WORKER_INDEX,
+    ENV_WORKERS,
+    PRESENCE_KEY_ACTIVE_COUNT,
+    PRESENCE_KEY_ROOM_ID,
+    PRESENCE_KEY_WORKER,
+    run_cluster,
+)
+from app.codec import CODEC_JSON, decode_frame, encode_frame, resolve_codec
+from app.logs import (
+    LOG_CATEGORY_BROADCAST,
+    LOG_CATEGORY_GRID,
+    LOG_CATEGORY_MOVES,
+    LOGGER_NAME,
+    category_logger_name,
+    configure_logging,
+)
+from app.loop_monitor import LoopMonitor, set_activity
+from app.metrics import (
+    ACTIVE_ROOMS,
+    ACTIVE_SESSIONS,
+    ACTIVE_SPECTATORS,
+    ADMISSION_REJECTED_TOTAL,
+    BROADCAST_BYTES_TOTAL,
+    BROADCAST_RECIPIENTS_TOTAL,
+    BROADCAST_SECONDS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    ERROR_REPLIES_TOTAL,
+    HANDLER_SECONDS,
+    OUTBOUND_OVERFLOWS_TOTAL,
+    OUTBOUND_QUEUE_FRAMES,
+    RATE_LIMITED_TOTAL,
+    REGISTRY,
+    ROOM_COMMAND_QUEUE_COMMANDS,
+    ROOM_LOCK_HOLD_SECONDS,
+    ROOM_LOCK_WAIT_SECONDS,
+    SENT_BYTES_TOTAL,
+    SENT_FRAMES_TOTAL,
+    SHED_TOTAL,
+    TimedLock,
+)
+from app.persistence import (
+    HANDOFF_FILE_NAME,
+    KEY_GAME_ID as STORED_GAME_ID,
+    KEY_HISTORY as STORED_HISTORY,
+    KEY_SNAPSHOT as STORED_SNAPSHOT,
+    KEY_VERSION as STORED_VERSION,
+    RoomStore,
+    read_handoff,
+    write_handoff,
+)
+from app.puzzles import (
+    DEFAULT_DICTIONARY_PATH,
+    DEFAULT_FORBIDDEN_PATH,
+    DEFAULT_LAB_DIR,
+    PuzzlePool,
+)
+from app.recorder import CAPTURE_FILE_NAME, FrameRecorder
+from app.words import WordIndex, find_snapshot_rejection
+from app.snapshot import (
+    JSON_KEY_COL,
+    JSON_KEY_REVEALED,
+    JSON_KEY_ROW,
+    JSON_KEY_SCHEMA_VERSION,
+    JSON_KEY_SETTINGS,
+    JSON_KEY_SOLVED_BY,
+    JSON_KEY_STATE_VERSION,
+    JSON_KEY_WORD,
+    JSON_KEY_WORD_TABLE_ID,
+    JSON_KEY_WORDS,
+    SCHEMA_VERSION_COMPACT,
+    SCHEMA_VERSION_FULL,
+    SCHEMA_VERSIONS,
+    RoomSnapshot,
+    build_cell_payload,
+    cell_key,
+    expand_compact_payload,
+    word_key,
+)
+
 DEFAULT_HOST = "0.0.0.0"
 DEFAULT_PORT = 9999
 DEFAULT_WS_PING_INTERVAL_SECONDS = 20
 DEFAULT_WS_PING_TIMEOUT_SECONDS = 20
+DEFAULT_SEND_TIMEOUT_SECONDS = 5
+DEFAULT_OUTBOUND_QUEUE_LIMIT = 64
+DEFAULT_ROOM_COMMAND_QUEUE_LIMIT = 256
+DEFAULT_STATE_HISTORY_LIMIT = 64
+DEFAULT_LOOP_MONITOR_INTERVAL_MS = 250
+DEFAULT_LOOP_SLOW_CALLBACK_MS = 100
+DEFAULT_LOOP_MONITOR_HISTORY = 50
+DEFAULT_ROOM_TICK_MS = 0
+DEFAULT_PERSISTENCE_FLUSH_MS = 50
+DEFAULT_PERSISTENCE_COMPACT_RECORDS = 1000
+DEFAULT_PUZZLE_POOL_SIZE = 0
+DEFAULT_PUZZLE_POOL_WORKERS = 1
+DEFAULT_PUZZLE_MAX_LETTER_SET_SIZE = 9
+DEFAULT_WORD_VALIDATION = 0
+DEFAULT_SESSION_RATE_PER_SECOND = 20
+DEFAULT_SESSION_RATE_BURST = 40
+DEFAULT_ROOM_RATE_PER_SECOND = 100
+DEFAULT_ROOM_RATE_BURST = 200
+DEFAULT_ROOM_SESSION_LIMIT = 64
+DEFAULT_PROCESS_SESSION_LIMIT = 0
+DEFAULT_OVERLOAD_SHED_LAG_MS = 100
+DEFAULT_OVERLOAD_REJECT_LAG_MS = 500
+DEFAULT_JOIN_RETRY_AFTER_MS = 5000
+DEFAULT_DRAIN_TIMEOUT_SECONDS = 5
+DEFAULT_DRAIN_RECONNECT_MS = 1000
+DEFAULT_HANDOFF_MAX_AGE_SECONDS = 300
+DEFAULT_RECORD_FLUSH_MS = 200
+RATE_SCOPE_SESSION = "session"
+RATE_SCOPE_ROOM = "room"
+SHED_KIND_GRID_LOG = "grid_log"
+SHED_KIND_PLAYERS_UPDATE = "players_update"
+SHED_KIND_MOVE = "move"
+ROOM_ENGINE_LOCK = "lock"
+ROOM_ENGINE_ACTOR = "actor"
+ROOM_ENGINES = (ROOM_ENGINE_LOCK, ROOM_ENGINE_ACTOR)
+WS_CLOSE_CODE_SERVICE_RESTART = 1012
+WS_CLOSE_CODE_TRY_AGAIN_LATER = 1013
+WS_CLOSE_CODE_SESSION_REPLACED = 4001
+CLOSE_REASON_SESSION_REPLACED = "session_replaced"
+CLOSE_REASON_SERVER_RESTART = "server_restart"
 EMPTY_ROOM_CLIENT_COUNT = 0
 DISCONNECT_MESSAGE_TYPE = "websocket.disconnect"
 MESSAGE_TYPE_JOIN = "join"
 MESSAGE_TYPE_SNAPSHOT = "snapshot"
 MESSAGE_TYPE_STATE_UPDATE = "stateUpdate"
+MESSAGE_TYPE_STATE_DELTA = "stateDelta"
+MESSAGE_TYPE_RESYNC = "resync"
 MESSAGE_TYPE_NEW_GAME = "newGame"
 MESSAGE_TYPE_SUBMIT_WORD = "submitWord"
 MESSAGE_TYPE_REVEAL_CELL = "revealCell"
 MESSAGE_TYPE_PLAYERS_UPDATE = "playersUpdate"
 MESSAGE_TYPE_ERROR = "error"
+MESSAGE_TYPE_WORD_TABLE = "wordTable"
+MESSAGE_TYPE_PLAYER_JOINED = "playerJoined"
+MESSAGE_TYPE_PLAYER_LEFT = "playerLeft"
+MESSAGE_TYPE_RECONNECT = "reconnect"
 MESSAGE_ERROR_CONFLICT = "conflict"
 MESSAGE_ERROR_VERSION_MISMATCH = "version_mismatch"
 
 ROLE_HOST = "host"
 ROLE_GUEST = "guest"
+ROLE_SPECTATOR = "spectator"
 
 JSON_KEY_TYPE = "type"
 JSON_KEY_PLAYER_ID = "playerId"
@@ -36,79 +174,463 @@ JSON_KEY_ROLE = "role"
 JSON_KEY_SNAPSHOT = "snapshot"
 JSON_KEY_ACTIVE_COUNT = "activeCount"
 JSON_KEY_MESSAGE = "message"
-JSON_KEY_STATE_VERSION = "stateVersion"
+JSON_KEY_RETRY_AFTER_MS = "retryAfterMs"
+JSON_KEY_REASON = "reason"
 JSON_KEY_BASE_VERSION = "baseVersion"
 JSON_KEY_BASE_VERSION_ALT = "base_version"
 JSON_KEY_CLIENT_VERSION = "clientVersion"
 JSON_KEY_SERVER_VERSION = "serverVersion"
 JSON_KEY_REQUIRED_CLIENT_VERSION = "requiredClientVersion"
 JSON_KEY_PLAYERS = "players"
-JSON_KEY_SEED_LETTERS = "seedLetters"
-JSON_KEY_WHEEL_LETTERS = "wheelLetters"
-JSON_KEY_GRID_ROWS = "gridRows"
-JSON_KEY_REVEALED = "revealed"
-JSON_KEY_WORDS = "words"
-JSON_KEY_SETTINGS = "settings"
-JSON_KEY_ROW = "row"
-JSON_KEY_COL = "col"
-CROSSWORD_EMPTY_CELL = "."
+JSON_KEY_PLAYERS_VERSION = "playersVersion"
+JSON_KEY_PLAYER = "player"
+JSON_KEY_ROOM_ID = "roomId"
+JSON_KEY_SYNC_MODE = "syncMode"
+JSON_KEY_DELTA = "delta"
+JSON_KEY_FROM_VERSION = "fromVersion"
+JSON_KEY_TO_VERSION = "toVersion"
+JSON_KEY_GAME_ID = "gameId"
+JSON_KEY_LAST_VERSION = "lastVersion"
+JSON_KEY_OPERATION = "operation"
+JSON_KEY_CODEC = "codec"
+SYNC_MODE_SNAPSHOT = "snapshot"
+SYNC_MODE_DELTA = "delta"
+SYNC_MODES = (SYNC_MODE_SNAPSHOT, SYNC_MODE_DELTA)
+COALESCED_MESSAGE_TYPES = {
+    MESSAGE_TYPE_STATE_UPDATE: (MESSAGE_TYPE_STATE_UPDATE, MESSAGE_TYPE_STATE_DELTA),
+    MESSAGE_TYPE_PLAYERS_UPDATE: (MESSAGE_TYPE_PLAYERS_UPDATE,),
+}
 SHORT_ID_PREFIX = 5
 SHORT_ID_SUFFIX = 5
 SERVER_INSTANCE_ID = str(uuid.uuid4())
-GRID_ROW_INDEX_PAD = 2
+GRID_ROW_SEPARATOR = "|"
+DEFAULT_ROOM_ID = "default"
+MAX_ROOM_ID_LENGTH = 64
 STATE_VERSION_INITIAL = 1
 STATE_VERSION_INCREMENT = 1
 VERSION_DEBUG_SUFFIX = "-debug"
 VERSION_UNKNOWN = "unknown"
+METRIC_LABEL_UNSUPPORTED = "unsupported"
+ACTIVITY_SEND = "send"
+ACTIVITY_LEAVE = "leave"
+MS_PER_SECOND = 1000
+MOVE_MESSAGE_TYPES = frozenset({MESSAGE_TYPE_SUBMIT_WORD, MESSAGE_TYPE_REVEAL_CELL})
+DRAIN_REJECTED_MESSAGE_TYPES = MOVE_MESSAGE_TYPES | {MESSAGE_TYPE_NEW_GAME}
+TIMED_MESSAGE_TYPES = frozenset(
+    {
+        MESSAGE_TYPE_JOIN,
+        MESSAGE_TYPE_NEW_GAME,
+        MESSAGE_TYPE_SUBMIT_WORD,
+        MESSAGE_TYPE_REVEAL_CELL,
+        MESSAGE_TYPE_RESYNC,
+    }
+)
 
 ENV_HOST = "HOST"
 ENV_PORT = "PORT"
 ENV_WS_PING_INTERVAL_SECONDS = "WS_PING_INTERVAL_SECONDS"
 ENV_WS_PING_TIMEOUT_SECONDS = "WS_PING_TIMEOUT_SECONDS"
 ENV_VERSION_FILE = "WORDS_VERSION_FILE"
+ENV_SEND_TIMEOUT_SECONDS = "SEND_TIMEOUT_SECONDS"
+ENV_OUTBOUND_QUEUE_LIMIT = "OUTBOUND_QUEUE_LIMIT"
+ENV_ROOM_ENGINE = "ROOM_ENGINE"
+ENV_ROOM_COMMAND_QUEUE_LIMIT = "ROOM_COMMAND_QUEUE_LIMIT"
+ENV_STATE_HISTORY_LIMIT = "STATE_HISTORY_LIMIT"
+ENV_LOOP_MONITOR_INTERVAL_MS = "LOOP_MONITOR_INTERVAL_MS"
+ENV_LOOP_SLOW_CALLBACK_MS = "LOOP_SLOW_CALLBACK_MS"
+ENV_LOOP_MONITOR_HISTORY = "LOOP_MONITOR_HISTORY"
+ENV_ROOM_TICK_MS = "ROOM_TICK_MS"
+ENV_PERSISTENCE_DIR = "PERSISTENCE_DIR"
+ENV_PERSISTENCE_FLUSH_MS = "PERSISTENCE_FLUSH_MS"
+ENV_PERSISTENCE_COMPACT_RECORDS = "PERSISTENCE_COMPACT_RECORDS"
+ENV_PUZZLE_POOL_SIZE = "PUZZLE_POOL_SIZE"
+ENV_PUZZLE_POOL_WORKERS = "PUZZLE_POOL_WORKERS"
+ENV_PUZZLE_LAB_DIR = "PUZZLE_LAB_DIR"
+ENV_PUZZLE_DICTIONARY = "PUZZLE_DICTIONARY"
+ENV_PUZZLE_FORBIDDEN_WORDS = "PUZZLE_FORBIDDEN_WORDS"
+ENV_PUZZLE_MAX_LETTER_SET_SIZE = "PUZZLE_MAX_LETTER_SET_SIZE"
+ENV_WORD_VALIDATION = "WORD_VALIDATION"
+ENV_SESSION_RATE_PER_SECOND = "SESSION_RATE_PER_SECOND"
+ENV_SESSION_RATE_BURST = "SESSION_RATE_BURST"
+ENV_ROOM_RATE_PER_SECOND = "ROOM_RATE_PER_SECOND"
+ENV_ROOM_RATE_BURST = "ROOM_RATE_BURST"
+ENV_ROOM_SESSION_LIMIT = "ROOM_SESSION_LIMIT"
+ENV_PROCESS_SESSION_LIMIT = "PROCESS_SESSION_LIMIT"
+ENV_OVERLOAD_SHED_LAG_MS = "OVERLOAD_SHED_LAG_MS"
+ENV_OVERLOAD_REJECT_LAG_MS = "OVERLOAD_REJECT_LAG_MS"
+ENV_HANDOFF_DIR = "HANDOFF_DIR"
+ENV_HANDOFF_MAX_AGE_SECONDS = "HANDOFF_MAX_AGE_SECONDS"
+ENV_DRAIN_TIMEOUT_SECONDS = "DRAIN_TIMEOUT_SECONDS"
+ENV_DRAIN_RECONNECT_MS = "DRAIN_RECONNECT_MS"
+ENV_RECORD_DIR = "RECORD_DIR"
+ENV_RECORD_FLUSH_MS = "RECORD_FLUSH_MS"
+
+LOG_HANDLER = configure_logging()
+LOGGER = logging.getLogger(LOGGER_NAME)
+MOVE_LOGGER = logging.getLogger(category_logger_name(LOG_CATEGORY_MOVES))
+BROADCAST_LOGGER = logging.getLogger(category_logger_name(LOG_CATEGORY_BROADCAST))
+GRID_LOGGER = logging.getLogger(category_logger_name(LOG_CATEGORY_GRID))
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    LOOP_MONITOR.start()
+    if BUS is not None:
+        await BUS.start()
+    if PUZZLE_POOL is not None:
+        PUZZLE_POOL.start()
+    if ROOM_STORE is not None:
+        recovered = ROOM_STORE.load()
+        LOGGER.info(
+            "%s -> persistence -> recovered rooms=%s path=%s",
+            server_label(),
+            recovered,
+            ROOM_STORE.directory,
+        )
+        ROOM_STORE.start(capture_room_states)
+    if RECORDER is not None:
+        RECORDER.start()
+        LOGGER.info("%s -> capture -> recording path=%s", server_label(), RECORDER.path)
+    if HANDOFF_PATH is not None:
+        HANDOFF_ROOMS.update(
+            await asyncio.to_thread(read_handoff, HANDOFF_PATH, HANDOFF_MAX_AGE_SECONDS)
+        )
+        LOGGER.info(
+            "%s -> handoff -> loaded rooms=%s path=%s",
+            server_label(),
+            len(HANDOFF_ROOMS),
+            HANDOFF_PATH,
+        )
+    try:
+        yield
+    finally:
+        if ROOM_STORE is not None:
+            await ROOM_STORE.stop()
+        if RECORDER is not None:
+            await RECORDER.stop()
+        if PUZZLE_POOL is not None:
+            await PUZZLE_POOL.stop()
+        if BUS is not None:
+            await BUS.stop()
+        LOOP_MONITOR.stop()
 
-LOGGER_NAME = "words.server"
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-)
-LOGGER = logging.getLogger(LOGGER_NAME)
+app = FastAPI(lifespan=lifespan)
+
+
+@dataclass
+class OutboundFrame:
+    message_type: str | None
+    frame: str | bytes
+
+
+class OutboundQueue:
+    def __init__(self, limit: int) -> None:
+        self._limit = max(limit, 1)
+        self._frames: deque[OutboundFrame] = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.finishing = False
+        self.overflowed = False
+        self.feed: SpectatorFeed | None = None
+        self.codec = CODEC_JSON
+        self.cursor = 0
+
+    def put(self, frame: OutboundFrame) -> bool:
+        if self.closed:
+            return True
+        superseded = COALESCED_MESSAGE_TYPES.get(frame.message_type)
+        if superseded and self._frames:
+            self._frames = deque(
+                queued for queued in self._frames if queued.message_type not in superseded
+            )
+        if len(self._frames) >= self._limit:
+            self.overflowed = True
+            self.close()
+            return False
+        self._frames.append(frame)
+        self._ready.set()
+        return True
+
+    async def get(self) -> OutboundFrame | None:
+        while not self._frames:
+            if self.closed or self.finishing:
+                return None
+            if self.feed is not None:
+                pending = self.feed.next_frame(self.cursor, self.codec)
+                if pending is not None:
+                    self.cursor, frame = pending
+                    return frame
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.popleft()
+
+    def follow(self, feed: "SpectatorFeed", codec: str) -> None:
+        self.feed = feed
+        self.codec = codec
+        self.cursor = feed.sequence
+
+    def wake(self) -> None:
+        self._ready.set()
+
+    def finish(self) -> None:
+        self.finishing = True
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._frames.clear()
+        self._ready.set()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+class SpectatorFeed:
+    def __init__(self) -> None:
+        self.sequence = 0
+        self._latest: dict[str | None, tuple[int, dict, dict[str, OutboundFrame]]] = {}
+        self._viewers: dict[str, ClientSession] = {}
+
+    def attach(self, session: "ClientSession") -> int:
+        session.outbound.follow(self, session.codec)
+        self._viewers[session.client_id] = session
+        return len(self._viewers)
+
+    def detach(self, client_id: str) -> int:
+        self._viewers.pop(client_id, None)
+        return len(self._viewers)
+
+    def publish(self, message: dict) -> None:
+        if not self._viewers:
+            return
+        self.sequence += 1
+        self._latest[message.get(JSON_KEY_TYPE)] = (self.sequence, message, {})
+        for session in self._viewers.values():
+            session.outbound.wake()
+
+    def next_frame(self, cursor: int, codec: str) -> tuple[int, OutboundFrame] | None:
+        pending = [entry for entry in self._latest.values() if entry[0] > cursor]
+        if not pending:
+            return None
+        sequence, message, frames = min(pending, key=lambda entry: entry[0])
+        frame = frames.get(codec)
+        if frame is None:
+            frame = OutboundFrame(message.get(JSON_KEY_TYPE), encode_frame(message, codec))
+            frames[codec] = frame
+        return sequence, frame
+
+    def viewers(self) -> list["ClientSession"]:
+        return list(self._viewers.values())
 
-app = FastAPI()
+    def __len__(self) -> int:
+        return len(self._viewers)
 
 
 @dataclass
 class ClientSession:
     client_id: str
+    room_id: str
     websocket: WebSocket
     player_id: str
     player_name: str
     player_color: str
+    outbound: OutboundQueue
+    sync_mode: str = SYNC_MODE_SNAPSHOT
+    codec: str = CODEC_JSON
+    schema_version: int = SCHEMA_VERSION_FULL
+    word_table_id: int | None = None
+    acked_game_id: str | None = None
+    acked_version: int | None = None
+    close_code: int | None = None
+    close_reason: str = ""
+    spectator: bool = False
+    rate_bucket: TokenBucket | None = None
+    throttled_until: float = 0.0
+    writer_task: asyncio.Task | None = None
+
+
+@dataclass
+class RoomCommand:
+    session: ClientSession
+    action: str
+    snapshot: RoomSnapshot | None
+    failure_message: str
+    base_version: int | None = None
+    game_id: str | None = None
+    operation: dict | None = None
 
 
 class RoomState:
-    def __init__(self) -> None:
+    def __init__(self, room_id: str) -> None:
+        self.room_id = room_id
+        self.lock = TimedLock(ROOM_LOCK_WAIT_SECONDS, ROOM_LOCK_HOLD_SECONDS)
+        self.references = 0
         self._clients: dict[str, ClientSession] = {}
-        self.snapshot: dict | None = None
+        self.players_version = 0
+        self._players: list[dict] | None = None
+        self.feed = SpectatorFeed()
+        self.rate_bucket = create_bucket(ROOM_RATE_PER_SECOND, ROOM_RATE_BURST)
+        self.snapshot: RoomSnapshot | None = None
         self.host_player_id: str | None = None
         self.state_version: int = STATE_VERSION_INITIAL
+        self.game_id: str | None = None
+        self.history: deque[tuple[int, dict | None]] = deque(
+            maxlen=max(STATE_HISTORY_LIMIT, 1)
+        )
+        self._commands: deque[RoomCommand] = deque()
+        self._commands_ready = asyncio.Event()
+        self._actor_task: asyncio.Task | None = None
+        self.pending_from_version: int | None = None
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    def start_game(self, snapshot: RoomSnapshot) -> None:
+        self.cancel_pending_updates()
+        self.snapshot = snapshot
+        self.state_version = snapshot.state_version
+        self.game_id = str(uuid.uuid4())
+        self.history.clear()
+
+    def clear_game(self) -> None:
+        self.cancel_pending_updates()
+        self.snapshot = None
+        self.state_version = STATE_VERSION_INITIAL
+        self.game_id = None
+        self.history.clear()
+
+    def defer_update(self, from_version: int, delay_seconds: float, callback) -> None:
+        if self.pending_from_version is not None:
+            return
+        self.pending_from_version = from_version
+        self._flush_handle = asyncio.get_running_loop().call_later(
+            delay_seconds, callback, self
+        )
 
-    def add_client(self, session: ClientSession) -> int:
-        self._clients[session.client_id] = session
+    def take_pending_update(self) -> int | None:
+        from_version = self.pending_from_version
+        self.pending_from_version = None
+        self._flush_handle = None
+        return from_version
+
+    def cancel_pending_updates(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = None
+        self.pending_from_version = None
+
+    def commit_version(self, snapshot: RoomSnapshot, delta: dict | None) -> None:
+        self.snapshot = snapshot
+        self.state_version = snapshot.state_version
+        self.history.append((snapshot.state_version, delta))
+
+    def delta_since(self, version: int) -> dict | None:
+        if version == self.state_version:
+            return {}
+        if version < STATE_VERSION_INITIAL or version > self.state_version:
+            return None
+        deltas = [delta for to_version, delta in self.history if to_version > version]
+        if len(deltas) != self.state_version - version:
+            return None
+        if any(delta is None for delta in deltas):
+            return None
+        return merge_snapshot_deltas(deltas)
+
+    def submit(self, command: RoomCommand) -> bool:
+        if len(self._commands) >= ROOM_COMMAND_QUEUE_LIMIT:
+            return False
+        if self._actor_task is None:
+            self._actor_task = asyncio.create_task(run_room_actor(self))
+        self._commands.append(command)
+        self._commands_ready.set()
+        return True
+
+    async def next_commands(self) -> list[RoomCommand]:
+        while not self._commands:
+            self._commands_ready.clear()
+            await self._commands_ready.wait()
+        batch = list(self._commands)
+        self._commands.clear()
+        return batch
+
+    def pending_commands(self) -> int:
+        return len(self._commands)
+
+    def stop(self) -> None:
+        self.cancel_pending_updates()
+        self._commands.clear()
+        if self._actor_task is not None:
+            self._actor_task.cancel()
+            self._actor_task = None
+
+    def add_client(self, session: ClientSession) -> tuple[int, ClientSession | None]:
+        replaced = self._clients.get(session.player_id)
+        self._clients[session.player_id] = session
+        self.invalidate_players()
+        return len(self._clients), replaced
+
+    def remove_client(self, session: ClientSession) -> tuple[int, bool]:
+        if self._clients.get(session.player_id) is not session:
+            return len(self._clients), False
+        del self._clients[session.player_id]
+        self.invalidate_players()
+        return len(self._clients), True
+
+    def find_client(self, player_id: str) -> ClientSession | None:
+        return self._clients.get(player_id)
+
+    def client_count(self) -> int:
         return len(self._clients)
 
-    def remove_client(self, client_id: str) -> tuple[int, str | None]:
-        session = self._clients.pop(client_id, None)
-        player_id = session.player_id if session is not None else None
-        return len(self._clients), player_id
+    def invalidate_players(self) -> None:
+        self.players_version += 1
+        self._players = None
+
+    def players_payload(self) -> list[dict]:
+        if self._players is None:
+            self._players = build_players_payload(self.sessions())
+        return self._players
 
     def sessions(self) -> list[ClientSession]:
-        return list(self._clients.values())
+        return [session for session in self._clients.values() if not session.outbound.closed]
+
+
+class RoomRegistry:
+    def __init__(self) -> None:
+        self._rooms: dict[str, RoomState] = {}
+        self.draining = False
+
+    def acquire(self, room_id: str) -> tuple[RoomState, bool]:
+        room = self._rooms.get(room_id)
+        created = room is None
+        if room is None:
+            room = RoomState(room_id)
+            self._rooms[room_id] = room
+        room.references += 1
+        return room, created
+
+    def release(self, room: RoomState) -> bool:
+        room.references -= 1
+        if room.references > 0:
+            return False
+        if self._rooms.get(room.room_id) is room:
+            del self._rooms[room.room_id]
+        room.stop()
+        return True
+
+    def get(self, room_id: str) -> RoomState | None:
+        return self._rooms.get(room_id)
+
+    def rooms(self) -> list[RoomState]:
+        return list(self._rooms.values())
+
+    def connection_count(self) -> int:
+        return sum(room.client_count() + len(room.feed) for room in self._rooms.values())
 
+    def __len__(self) -> int:
+        return len(self._rooms)
 
-ROOM = RoomState()
-ROOM_LOCK = asyncio.Lock()
+
+ROOMS = RoomRegistry()
 
 
 def build_error_message(message: str) -> dict:
@@ -118,6 +640,14 @@ def build_error_message(message: str) -> dict:
     }
 
 
+def build_retry_message(message: str, retry_after_seconds: float) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_ERROR,
+        JSON_KEY_MESSAGE: message,
+        JSON_KEY_RETRY_AFTER_MS: max(round(retry_after_seconds * MS_PER_SECOND), 1),
+    }
+
+
 def build_version_mismatch_message(client_version: str, server_version: str) -> dict:
     resolved_client = coalesce_version(client_version)
     resolved_server = coalesce_version(server_version)
@@ -130,8 +660,7 @@ def build_version_mismatch_message(client_version: str, server_version: str) ->
     }
 
 
-def build_conflict_message(snapshot: dict, state_version: int, players: list[dict]) -> dict:
-    snapshot[JSON_KEY_STATE_VERSION] = state_version
+def build_conflict_message(snapshot: dict, players: list[dict]) -> dict:
     return {
         JSON_KEY_TYPE: MESSAGE_TYPE_ERROR,
         JSON_KEY_MESSAGE: MESSAGE_ERROR_CONFLICT,
@@ -140,8 +669,28 @@ def build_conflict_message(snapshot: dict, state_version: int, players: list[dic
     }
 
 
+def build_conflict_delta_message(
+    from_version: int, to_version: int, delta: dict, players: list[dict], game_id: str
+) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_ERROR,
+        JSON_KEY_MESSAGE: MESSAGE_ERROR_CONFLICT,
+        JSON_KEY_GAME_ID: game_id,
+        JSON_KEY_FROM_VERSION: from_version,
+        JSON_KEY_TO_VERSION: to_version,
+        JSON_KEY_DELTA: delta,
+        JSON_KEY_PLAYERS: players,
+    }
+
+
 def build_snapshot_message(
-    role: str, snapshot: dict | None, active_count: int, players: list[dict]
+    role: str,
+    snapshot: dict | None,
+    active_count: int,
+    players: list[dict],
+    sync_mode: str = SYNC_MODE_SNAPSHOT,
+    game_id: str | None = None,
+    codec: str = CODEC_JSON,
 ) -> dict:
     return {
         JSON_KEY_TYPE: MESSAGE_TYPE_SNAPSHOT,
@@ -149,14 +698,69 @@ def build_snapshot_message(
         JSON_KEY_SNAPSHOT: snapshot,
         JSON_KEY_ACTIVE_COUNT: active_count,
         JSON_KEY_PLAYERS: players,
+        JSON_KEY_SYNC_MODE: sync_mode,
+        JSON_KEY_GAME_ID: game_id,
+        JSON_KEY_CODEC: codec,
+    }
+
+
+def build_catch_up_message(
+    role: str,
+    from_version: int,
+    to_version: int,
+    delta: dict,
+    active_count: int,
+    players: list[dict],
+    game_id: str,
+    codec: str = CODEC_JSON,
+) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_SNAPSHOT,
+        JSON_KEY_ROLE: role,
+        JSON_KEY_GAME_ID: game_id,
+        JSON_KEY_FROM_VERSION: from_version,
+        JSON_KEY_TO_VERSION: to_version,
+        JSON_KEY_DELTA: delta,
+        JSON_KEY_ACTIVE_COUNT: active_count,
+        JSON_KEY_PLAYERS: players,
+        JSON_KEY_SYNC_MODE: SYNC_MODE_DELTA,
+        JSON_KEY_CODEC: codec,
     }
 
 
-def build_state_update_message(snapshot: dict, players: list[dict]) -> dict:
+def build_state_update_message(
+    snapshot: dict, players: list[dict], game_id: str | None = None
+) -> dict:
     return {
         JSON_KEY_TYPE: MESSAGE_TYPE_STATE_UPDATE,
         JSON_KEY_SNAPSHOT: snapshot,
         JSON_KEY_PLAYERS: players,
+        JSON_KEY_GAME_ID: game_id,
+    }
+
+
+def build_state_delta_message(
+    from_version: int,
+    to_version: int,
+    delta: dict,
+    players: list[dict],
+    game_id: str | None = None,
+) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_STATE_DELTA,
+        JSON_KEY_GAME_ID: game_id,
+        JSON_KEY_FROM_VERSION: from_version,
+        JSON_KEY_TO_VERSION: to_version,
+        JSON_KEY_DELTA: delta,
+        JSON_KEY_PLAYERS: players,
+    }
+
+
+def build_word_table_message(word_table_id: int, words: list[dict]) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_WORD_TABLE,
+        JSON_KEY_WORD_TABLE_ID: word_table_id,
+        JSON_KEY_WORDS: words,
     }
 
 
@@ -168,17 +772,44 @@ def build_players_update_message(players: list[dict], active_count: int) -> dict
     }
 
 
+def build_player_joined_message(
+    player: dict, players_version: int, active_count: int
+) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_PLAYER_JOINED,
+        JSON_KEY_PLAYER: player,
+        JSON_KEY_PLAYERS_VERSION: players_version,
+        JSON_KEY_ACTIVE_COUNT: active_count,
+    }
+
+
+def build_player_left_message(
+    player_id: str, players_version: int, active_count: int
+) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_PLAYER_LEFT,
+        JSON_KEY_PLAYER_ID: player_id,
+        JSON_KEY_PLAYERS_VERSION: players_version,
+        JSON_KEY_ACTIVE_COUNT: active_count,
+    }
+
+
+def reference_players(message: dict, players_version: int) -> dict:
+    referenced = {key: value for key, value in message.items() if key != JSON_KEY_PLAYERS}
+    referenced[JSON_KEY_PLAYERS_VERSION] = players_version
+    return referenced
+
+
+def build_player_entry(session: ClientSession) -> dict:
+    return {
+        JSON_KEY_PLAYER_ID: session.player_id,
+        JSON_KEY_PLAYER_NAME: session.player_name,
+        JSON_KEY_PLAYER_COLOR: session.player_color,
+    }
+
+
 def build_players_payload(sessions: list[ClientSession]) -> list[dict]:
-    players: list[dict] = []
-    for session in sessions:
-        players.append(
-            {
-                JSON_KEY_PLAYER_ID: session.player_id,
-                JSON_KEY_PLAYER_NAME: session.player_name,
-                JSON_KEY_PLAYER_COLOR: session.player_color,
-            }
-        )
-    return players
+    return [build_player_entry(session) for session in sessions]
 
 
 def get_required_str(payload: dict, key: str) -> str | None:
@@ -196,6 +827,16 @@ def get_optional_str(payload: dict, key: str) -> str:
     return value.strip()
 
 
+def resolve_sync_mode(payload: dict) -> str:
+    value = get_optional_str(payload, JSON_KEY_SYNC_MODE)
+    return value if value in SYNC_MODES else SYNC_MODE_SNAPSHOT
+
+
+def resolve_schema_version(payload: dict) -> int:
+    value = get_optional_int(payload, JSON_KEY_SCHEMA_VERSION)
+    return value if value in SCHEMA_VERSIONS else SCHEMA_VERSION_FULL
+
+
 def get_optional_int(payload: dict, key: str) -> int | None:
     value = payload.get(key)
     if not isinstance(value, int):
@@ -228,6 +869,29 @@ def format_player_label(player_id: str | None, player_name: str, role: str | Non
     return f"player{short_id}"
 
 
+def format_room_label(room_id: str) -> str:
+    return f"room({room_id})"
+
+
+def resolve_room_id(payload: dict) -> str | None:
+    value = payload.get(JSON_KEY_ROOM_ID)
+    if value is None:
+        return DEFAULT_ROOM_ID
+    if not isinstance(value, str):
+        return None
+    trimmed = value.strip()
+    if not trimmed:
+        return DEFAULT_ROOM_ID
+    if len(trimmed) > MAX_ROOM_ID_LENGTH or not trimmed.isprintable():
+        return None
+    return trimmed
+
+
+def format_session_label(room: RoomState, session: ClientSession) -> str:
+    role = ROLE_HOST if session.player_id == room.host_player_id else None
+    return format_player_label(session.player_id, session.player_name, role)
+
+
 def format_connection_label(client_id: str) -> str:
     return f"connection{format_short_id(client_id)}"
 
@@ -289,95 +953,76 @@ def read_server_version() -> str:
 SERVER_VERSION = read_server_version()
 
 
-def summarize_snapshot(snapshot: dict | None) -> str:
-    if not isinstance(snapshot, dict):
+def summarize_snapshot(snapshot: RoomSnapshot | None) -> str:
+    if snapshot is None:
         return "none"
-    state_version = snapshot.get(JSON_KEY_STATE_VERSION)
-    seed_letters = snapshot.get(JSON_KEY_SEED_LETTERS)
-    grid_rows = snapshot.get(JSON_KEY_GRID_ROWS)
-    revealed = snapshot.get(JSON_KEY_REVEALED)
-    words = snapshot.get(JSON_KEY_WORDS)
-    settings = snapshot.get(JSON_KEY_SETTINGS)
-    grid_count = len(grid_rows) if isinstance(grid_rows, list) else None
-    grid_cols = (
-        len(grid_rows[0])
-        if isinstance(grid_rows, list)
-        and grid_rows
-        and isinstance(grid_rows[0], str)
-        else None
-    )
-    return (
-        "stateVersion=%s seedLen=%s grid=%sx%s words=%s revealed=%s settings=%s"
-        % (
-            state_version,
-            len(seed_letters) if isinstance(seed_letters, str) else None,
-            grid_count,
-            grid_cols,
-            len(words) if isinstance(words, list) else None,
-            len(revealed) if isinstance(revealed, list) else None,
-            "yes" if isinstance(settings, dict) else "no",
-        )
-    )
-
-
-def strip_wheel_letters(snapshot: dict) -> None:
-    snapshot.pop(JSON_KEY_WHEEL_LETTERS, None)
-
-
-def build_grid_rows_for_log(snapshot: dict) -> list[str]:
-    grid_rows = snapshot.get(JSON_KEY_GRID_ROWS)
-    if not isinstance(grid_rows, list) or not grid_rows:
-        return []
-    rows: list[list[str]] = []
-    for row in grid_rows:
-        if not isinstance(row, str):
-            return []
-        rows.append(list(row))
-
-    revealed = snapshot.get(JSON_KEY_REVEALED)
-    if isinstance(revealed, list):
-        for item in revealed:
-            if not isinstance(item, dict):
-                continue
-            row_index = item.get(JSON_KEY_ROW)
-            col_index = item.get(JSON_KEY_COL)
-            if not isinstance(row_index, int) or not isinstance(col_index, int):
-                continue
-            if row_index < 0 or row_index >= len(rows):
-                continue
-            row_chars = rows[row_index]
-            if col_index < 0 or col_index >= len(row_chars):
-                continue
-            char = row_chars[col_index]
-            if char != CROSSWORD_EMPTY_CELL:
-                row_chars[col_index] = char.upper()
-
-    return ["".join(row) for row in rows]
+    return snapshot.summary()
+
+
+def merge_snapshot_deltas(deltas: list[dict]) -> dict:
+    revealed: list[dict] = []
+    revealed_keys: set[tuple[int, int] | None] = set()
+    words: list[dict] = []
+    word_keys: set[str | None] = set()
+    solved_by: dict = {}
+    merged: dict = {}
+    for delta in deltas:
+        for item in delta.get(JSON_KEY_REVEALED, []):
+            key = cell_key(item)
+            if key not in revealed_keys:
+                revealed_keys.add(key)
+                revealed.append(item)
+        for item in delta.get(JSON_KEY_WORDS, []):
+            key = word_key(item)
+            if key not in word_keys:
+                word_keys.add(key)
+                words.append(item)
+        solved_by.update(delta.get(JSON_KEY_SOLVED_BY, {}))
+        if JSON_KEY_SETTINGS in delta:
+            merged[JSON_KEY_SETTINGS] = delta[JSON_KEY_SETTINGS]
+    if revealed:
+        merged[JSON_KEY_REVEALED] = revealed
+    if words:
+        merged[JSON_KEY_WORDS] = words
+    if solved_by:
+        merged[JSON_KEY_SOLVED_BY] = solved_by
+    return merged
+
+
+def summarize_delta(message: dict) -> str:
+    delta = message.get(JSON_KEY_DELTA)
+    if not isinstance(delta, dict):
+        delta = {}
+    return "from=%s to=%s revealed=%s words=%s solvedBy=%s settings=%s" % (
+        message.get(JSON_KEY_FROM_VERSION),
+        message.get(JSON_KEY_TO_VERSION),
+        len(delta.get(JSON_KEY_REVEALED, [])),
+        len(delta.get(JSON_KEY_WORDS, [])),
+        len(delta.get(JSON_KEY_SOLVED_BY, {})),
+        "yes" if JSON_KEY_SETTINGS in delta else "no",
+    )
 
 
-def log_snapshot_grid(actor: str, action: str, target: str, snapshot: dict) -> None:
-    rows = build_grid_rows_for_log(snapshot)
+def log_snapshot_grid(
+    actor: str, action: str, target: str, snapshot: RoomSnapshot
+) -> None:
+    if not GRID_LOGGER.isEnabledFor(logging.DEBUG):
+        return
+    if OVERLOAD.shedding():
+        SHED_TOTAL.inc(SHED_KIND_GRID_LOG)
+        return
+    rows = snapshot.grid_rows_for_log()
     if not rows:
         return
-    column_count = max((len(row) for row in rows), default=0)
-    LOGGER.info(
-        "%s -> %s grid -> %s rows=%s cols=%s",
+    GRID_LOGGER.debug(
+        "%s -> %s grid -> %s rows=%s cols=%s grid=%s",
         actor,
         action,
         target,
         len(rows),
-        column_count,
+        snapshot.column_count,
+        GRID_ROW_SEPARATOR.join(rows),
     )
-    for row_index, row in enumerate(rows):
-        LOGGER.info(
-            "%s -> %s row[%0*d] -> %s %s",
-            actor,
-            action,
-            GRID_ROW_INDEX_PAD,
-            row_index,
-            target,
-            row,
-        )
 
 
 def read_int_env(name: str, default: int) -> int:
@@ -391,6 +1036,195 @@ def read_int_env(name: str, default: int) -> int:
         return default
 
 
+SEND_TIMEOUT_SECONDS = read_int_env(ENV_SEND_TIMEOUT_SECONDS, DEFAULT_SEND_TIMEOUT_SECONDS)
+OUTBOUND_QUEUE_LIMIT = read_int_env(ENV_OUTBOUND_QUEUE_LIMIT, DEFAULT_OUTBOUND_QUEUE_LIMIT)
+ROOM_COMMAND_QUEUE_LIMIT = read_int_env(
+    ENV_ROOM_COMMAND_QUEUE_LIMIT, DEFAULT_ROOM_COMMAND_QUEUE_LIMIT
+)
+STATE_HISTORY_LIMIT = read_int_env(ENV_STATE_HISTORY_LIMIT, DEFAULT_STATE_HISTORY_LIMIT)
+ROOM_TICK_SECONDS = read_int_env(ENV_ROOM_TICK_MS, DEFAULT_ROOM_TICK_MS) / MS_PER_SECOND
+SESSION_RATE_PER_SECOND = read_int_env(
+    ENV_SESSION_RATE_PER_SECOND, DEFAULT_SESSION_RATE_PER_SECOND
+)
+SESSION_RATE_BURST = read_int_env(ENV_SESSION_RATE_BURST, DEFAULT_SESSION_RATE_BURST)
+ROOM_RATE_PER_SECOND = read_int_env(ENV_ROOM_RATE_PER_SECOND, DEFAULT_ROOM_RATE_PER_SECOND)
+ROOM_RATE_BURST = read_int_env(ENV_ROOM_RATE_BURST, DEFAULT_ROOM_RATE_BURST)
+ROOM_SESSION_LIMIT = read_int_env(ENV_ROOM_SESSION_LIMIT, DEFAULT_ROOM_SESSION_LIMIT)
+PROCESS_SESSION_LIMIT = read_int_env(ENV_PROCESS_SESSION_LIMIT, DEFAULT_PROCESS_SESSION_LIMIT)
+
+
+def read_room_store() -> RoomStore | None:
+    directory = os.getenv(ENV_PERSISTENCE_DIR, "").strip()
+    if not directory:
+        return None
+    return RoomStore(
+        Path(directory),
+        flush_seconds=read_int_env(ENV_PERSISTENCE_FLUSH_MS, DEFAULT_PERSISTENCE_FLUSH_MS)
+        / MS_PER_SECOND,
+        compact_records=read_int_env(
+            ENV_PERSISTENCE_COMPACT_RECORDS, DEFAULT_PERSISTENCE_COMPACT_RECORDS
+        ),
+    )
+
+
+ROOM_STORE = read_room_store()
+
+
+def read_handoff_path() -> Path | None:
+    directory = os.getenv(ENV_HANDOFF_DIR, "").strip()
+    if not directory:
+        return None
+    return Path(directory) / HANDOFF_FILE_NAME
+
+
+HANDOFF_PATH = read_handoff_path()
+HANDOFF_MAX_AGE_SECONDS = read_int_env(
+    ENV_HANDOFF_MAX_AGE_SECONDS, DEFAULT_HANDOFF_MAX_AGE_SECONDS
+)
+HANDOFF_ROOMS: dict[str, dict] = {}
+DRAIN_TIMEOUT_SECONDS = read_int_env(ENV_DRAIN_TIMEOUT_SECONDS, DEFAULT_DRAIN_TIMEOUT_SECONDS)
+DRAIN_RECONNECT_MS = read_int_env(ENV_DRAIN_RECONNECT_MS, DEFAULT_DRAIN_RECONNECT_MS)
+WORKER_INDEX = read_int_env(ENV_WORKER_INDEX, DEFAULT_WORKER_INDEX)
+
+
+def read_recorder() -> FrameRecorder | None:
+    directory = os.getenv(ENV_RECORD_DIR, "").strip()
+    if not directory:
+        return None
+    return FrameRecorder(
+        Path(directory) / CAPTURE_FILE_NAME,
+        flush_seconds=read_int_env(ENV_RECORD_FLUSH_MS, DEFAULT_RECORD_FLUSH_MS) / MS_PER_SECOND,
+    )
+
+
+RECORDER = read_recorder()
+
+
+def read_event_bus() -> EventBus | None:
+    url = os.getenv(ENV_BUS_URL, "").strip()
+    if not url:
+        return None
+    try:
+        return create_bus(url, server_label())
+    except ValueError:
+        LOGGER.warning("invalid_env_value name=%s value=%s", ENV_BUS_URL, url)
+        return None
+
+
+BUS = read_event_bus()
+
+
+def read_dictionary_paths() -> tuple[Path, Path]:
+    dictionary_path = Path(
+        os.getenv(ENV_PUZZLE_DICTIONARY, "").strip() or DEFAULT_DICTIONARY_PATH
+    )
+    forbidden_path = Path(
+        os.getenv(ENV_PUZZLE_FORBIDDEN_WORDS, "").strip() or DEFAULT_FORBIDDEN_PATH
+    )
+    return dictionary_path, forbidden_path
+
+
+def read_puzzle_pool() -> PuzzlePool | None:
+    size = read_int_env(ENV_PUZZLE_POOL_SIZE, DEFAULT_PUZZLE_POOL_SIZE)
+    if size <= 0:
+        return None
+    lab_dir = Path(os.getenv(ENV_PUZZLE_LAB_DIR, "").strip() or DEFAULT_LAB_DIR)
+    dictionary_path, forbidden_path = read_dictionary_paths()
+    if not lab_dir.is_dir() or not dictionary_path.is_file():
+        LOGGER.warning(
+            "puzzle_pool_disabled reason=missing_files lab=%s dictionary=%s",
+            lab_dir,
+            dictionary_path,
+        )
+        return None
+    return PuzzlePool(
+        size=size,
+        workers=read_int_env(ENV_PUZZLE_POOL_WORKERS, DEFAULT_PUZZLE_POOL_WORKERS),
+        lab_dir=lab_dir,
+        dictionary_path=dictionary_path,
+        forbidden_path=forbidden_path,
+        max_letter_set_size=read_int_env(
+            ENV_PUZZLE_MAX_LETTER_SET_SIZE, DEFAULT_PUZZLE_MAX_LETTER_SET_SIZE
+        ),
+    )
+
+
+PUZZLE_POOL = read_puzzle_pool()
+
+
+def read_word_index() -> WordIndex | None:
+    if read_int_env(ENV_WORD_VALIDATION, DEFAULT_WORD_VALIDATION) <= 0:
+        return None
+    dictionary_path, forbidden_path = read_dictionary_paths()
+    if not dictionary_path.is_file():
+        LOGGER.warning(
+            "word_validation_disabled reason=missing_dictionary dictionary=%s",
+            dictionary_path,
+        )
+        return None
+    index = WordIndex.load(dictionary_path, forbidden_path)
+    LOGGER.info(
+        "%s -> word_index -> loaded words=%s path=%s",
+        server_label(),
+        index.word_count,
+        dictionary_path,
+    )
+    return index
+
+
+WORD_INDEX = read_word_index()
+
+
+def read_room_engine() -> str:
+    raw = os.getenv(ENV_ROOM_ENGINE, ROOM_ENGINE_LOCK).strip().lower()
+    if raw in ROOM_ENGINES:
+        return raw
+    LOGGER.warning("invalid_env_value name=%s value=%s", ENV_ROOM_ENGINE, raw)
+    return ROOM_ENGINE_LOCK
+
+
+ROOM_ENGINE = read_room_engine()
+LOOP_MONITOR = LoopMonitor(
+    interval_seconds=read_int_env(
+        ENV_LOOP_MONITOR_INTERVAL_MS, DEFAULT_LOOP_MONITOR_INTERVAL_MS
+    )
+    / MS_PER_SECOND,
+    slow_seconds=read_int_env(ENV_LOOP_SLOW_CALLBACK_MS, DEFAULT_LOOP_SLOW_CALLBACK_MS)
+    / MS_PER_SECOND,
+    history_limit=read_int_env(ENV_LOOP_MONITOR_HISTORY, DEFAULT_LOOP_MONITOR_HISTORY),
+)
+OVERLOAD = OverloadGuard(
+    LOOP_MONITOR.lag_samples,
+    shed_lag_seconds=read_int_env(ENV_OVERLOAD_SHED_LAG_MS, DEFAULT_OVERLOAD_SHED_LAG_MS)
+    / MS_PER_SECOND,
+    reject_lag_seconds=read_int_env(
+        ENV_OVERLOAD_REJECT_LAG_MS, DEFAULT_OVERLOAD_REJECT_LAG_MS
+    )
+    / MS_PER_SECOND,
+)
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    rooms = ROOMS.rooms()
+    sessions = [session for room in rooms for session in room.sessions()]
+    outbound_depths = [len(session.outbound) for session in sessions]
+    command_depths = [room.pending_commands() for room in rooms]
+    ACTIVE_ROOMS.set(len(rooms))
+    ACTIVE_SESSIONS.set(len(sessions))
+    ACTIVE_SPECTATORS.set(sum(len(room.feed) for room in rooms))
+    OUTBOUND_QUEUE_FRAMES.set(sum(outbound_depths), "sum")
+    OUTBOUND_QUEUE_FRAMES.set(max(outbound_depths, default=0), "max")
+    ROOM_COMMAND_QUEUE_COMMANDS.set(sum(command_depths), "sum")
+    ROOM_COMMAND_QUEUE_COMMANDS.set(max(command_depths, default=0), "max")
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/debug/loop")
+async def loop_report_endpoint() -> dict:
+    return LOOP_MONITOR.report()
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket) -> None:
     client_id = str(uuid.uuid4())
@@ -411,12 +1245,18 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
     close_code = None
     close_reason = None
     session = None
+    room = None
     try:
         join_payload = await receive_join_payload(websocket, client_id)
+        join_started = time.perf_counter()
         player_id = get_required_str(join_payload, JSON_KEY_PLAYER_ID)
         player_color = get_required_str(join_payload, JSON_KEY_PLAYER_COLOR)
         player_name = get_optional_str(join_payload, JSON_KEY_PLAYER_NAME)
-        if player_id is None or player_color is None:
+        sync_mode = resolve_sync_mode(join_payload)
+        codec = resolve_codec(join_payload.get(JSON_KEY_CODEC))
+        schema_version = resolve_schema_version(join_payload)
+        spectator = get_optional_str(join_payload, JSON_KEY_ROLE) == ROLE_SPECTATOR
+        if not spectator and (player_id is None or player_color is None):
             LOGGER.info(
                 "%s -> join -> %s rejected reason=invalid_payload addr=%s playerId=%s playerColor=%s",
                 connection_label,
@@ -425,7 +1265,23 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
                 join_payload.get(JSON_KEY_PLAYER_ID),
                 join_payload.get(JSON_KEY_PLAYER_COLOR),
             )
-            await websocket.send_json(build_error_message("invalid_join_payload"))
+            await send_direct_message(
+                websocket, build_error_message("invalid_join_payload")
+            )
+            await websocket.close()
+            return
+        room_id = resolve_room_id(join_payload)
+        if room_id is None:
+            LOGGER.info(
+                "%s -> join -> %s rejected reason=invalid_room_id addr=%s roomId=%s",
+                connection_label,
+                srv,
+                client_address,
+                join_payload.get(JSON_KEY_ROOM_ID),
+            )
+            await send_direct_message(
+                websocket, build_error_message("invalid_room_id")
+            )
             await websocket.close()
             return
         client_version = normalize_version(
@@ -440,35 +1296,89 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
                 coalesce_version(client_version),
                 coalesce_version(server_version),
             )
-            await websocket.send_json(
-                build_version_mismatch_message(client_version, server_version)
+            await send_direct_message(
+                websocket, build_version_mismatch_message(client_version, server_version)
             )
             await websocket.close()
             return
 
-        async with ROOM_LOCK:
+        admission_reason = find_process_admission_rejection()
+        if admission_reason is not None:
+            await reject_join(websocket, connection_label, admission_reason)
+            return
+        room, room_created = ROOMS.acquire(room_id)
+        set_activity(MESSAGE_TYPE_JOIN, room_id)
+        room_label = format_room_label(room_id)
+        if room_created:
+            LOGGER.info("%s -> room_open -> %s rooms=%s", srv, room_label, len(ROOMS))
+            restore_room_state(room)
+        if spectator:
+            await serve_spectator(websocket, room, client_id, join_payload, codec)
+            return
+        if (
+            ROOM_SESSION_LIMIT > 0
+            and room.find_client(player_id) is None
+            and room.client_count() >= ROOM_SESSION_LIMIT
+        ):
+            await reject_join(websocket, connection_label, "room_full")
+            return
+        async with room.lock:
             role = ROLE_GUEST
-            if ROOM.host_player_id is None:
-                ROOM.host_player_id = player_id
+            if room.host_player_id is None or room.host_player_id == player_id:
+                room.host_player_id = player_id
                 role = ROLE_HOST
             session = ClientSession(
                 client_id=client_id,
+                room_id=room_id,
                 websocket=websocket,
                 player_id=player_id,
                 player_name=player_name,
                 player_color=player_color,
+                outbound=OutboundQueue(OUTBOUND_QUEUE_LIMIT),
+                sync_mode=sync_mode,
+                codec=codec,
+                schema_version=schema_version,
+                rate_bucket=create_bucket(SESSION_RATE_PER_SECOND, SESSION_RATE_BURST),
+            )
+            session.writer_task = asyncio.create_task(run_session_writer(session))
+            active_count, replaced = room.add_client(session)
+            if replaced is not None:
+                resume_session(session, replaced)
+            acknowledge_version(
+                session,
+                get_optional_str(join_payload, JSON_KEY_GAME_ID),
+                get_optional_int(join_payload, JSON_KEY_LAST_VERSION),
+            )
+            targets = room.sessions()
+            players = room.players_payload()
+            snapshot = room.snapshot
+            snapshot_message = build_room_snapshot_message(
+                room,
+                session,
+                role,
+                active_count,
+                players,
+                build_resume_payload(room, session, join_payload),
             )
-            active_count = ROOM.add_client(session)
-            snapshot = ROOM.snapshot
-            targets = ROOM.sessions()
-            players = build_players_payload(targets)
 
         player_label = format_player_label(player_id, player_name, role)
+        if replaced is not None:
+            LOGGER.info(
+                "%s -> join -> %s replaced stale %s",
+                player_label,
+                srv,
+                format_connection_label(replaced.client_id),
+            )
+            replace_stale_session(replaced)
         LOGGER.info(
-            "%s -> join -> %s addr=%s",
+            "%s -> join -> %s %s addr=%s sync=%s codec=%s schema=%s",
             player_label,
             srv,
+            room_label,
             client_address,
+            sync_mode,
+            codec,
+            schema_version,
         )
         if role == ROLE_HOST:
             LOGGER.info("%s assigned as host", player_label)
@@ -477,41 +1387,51 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
             player_label,
             active_count,
         )
-        LOGGER.info(
-            "%s -> snapshot -> %s present=%s info=%s",
-            srv,
-            player_label,
-            snapshot is not None,
-            summarize_snapshot(snapshot),
-        )
-        if snapshot is not None:
-            log_snapshot_grid(srv, "snapshot", player_label, snapshot)
-        await websocket.send_json(
-            build_snapshot_message(role, snapshot, active_count, players)
+        log_snapshot_message(player_label, snapshot_message, snapshot)
+        send_message(session, snapshot_message)
+        broadcast_membership_update(
+            room,
+            targets,
+            active_count,
+            build_player_joined_message(
+                build_player_entry(session), room.players_version, active_count
+            ),
         )
-        players_message = build_players_update_message(players, active_count)
-        await broadcast_message(players_message, targets)
+        publish_presence(room_id, active_count)
+        HANDLER_SECONDS.observe(time.perf_counter() - join_started, MESSAGE_TYPE_JOIN)
 
         while True:
-            payload = await receive_payload(websocket, client_id)
+            payload = await receive_payload(websocket, client_id, session.codec, room_id)
+            handler_started = time.perf_counter()
             message_type = payload.get(JSON_KEY_TYPE)
             safe_type = message_type if message_type else "unknown"
+            handler_label = (
+                message_type
+                if message_type in TIMED_MESSAGE_TYPES
+                else METRIC_LABEL_UNSUPPORTED
+            )
+            set_activity(handler_label, room_id)
+            if not admit_message(room, session, message_type):
+                continue
             if message_type == MESSAGE_TYPE_NEW_GAME:
                 LOGGER.info("%s -> newGame -> %s", player_label, srv)
-                await handle_new_game_message(session, payload)
+                await handle_new_game_message(room, session, payload)
             elif message_type == MESSAGE_TYPE_SUBMIT_WORD:
-                LOGGER.info("%s -> submitWord -> %s", player_label, srv)
-                await handle_submit_word_message(session, payload)
+                MOVE_LOGGER.info("%s -> submitWord -> %s", player_label, srv)
+                await handle_submit_word_message(room, session, payload)
             elif message_type == MESSAGE_TYPE_REVEAL_CELL:
-                LOGGER.info("%s -> revealCell -> %s", player_label, srv)
-                await handle_reveal_cell_message(session, payload)
+                MOVE_LOGGER.info("%s -> revealCell -> %s", player_label, srv)
+                await handle_reveal_cell_message(room, session, payload)
+            elif message_type == MESSAGE_TYPE_RESYNC:
+                LOGGER.info("%s -> resync -> %s", player_label, srv)
+                await handle_resync_message(room, session, payload)
             elif message_type == MESSAGE_TYPE_JOIN:
                 LOGGER.info(
                     "%s -> join -> %s rejected reason=already_joined",
                     player_label,
                     srv,
                 )
-                await websocket.send_json(build_error_message("already_joined"))
+                send_message(session, build_error_message("already_joined"))
             else:
                 LOGGER.info(
                     "%s -> %s -> %s rejected reason=unsupported_message",
@@ -519,7 +1439,8 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
                     safe_type,
                     srv,
                 )
-                await websocket.send_json(build_error_message("unsupported_message"))
+                send_message(session, build_error_message("unsupported_message"))
+            HANDLER_SECONDS.observe(time.perf_counter() - handler_started, handler_label)
     except WebSocketDisconnect as error:
         close_code = error.code
         close_reason = error.reason
@@ -553,14 +1474,19 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
             str(error),
         )
     finally:
+        if RECORDER is not None:
+            RECORDER.record_close(client_id, room.room_id if room is not None else "")
         if session is not None:
+            set_activity(ACTIVITY_LEAVE, session.room_id)
+            session.outbound.close()
+            if session.writer_task is not None:
+                session.writer_task.cancel()
             was_host = False
             active_count = 0
-            players_message = None
-            targets: list[ClientSession] = []
-            async with ROOM_LOCK:
-                active_count, removed_player_id = ROOM.remove_client(client_id)
-                was_host = removed_player_id == ROOM.host_player_id
+            targets: list[ClientSession] | None = None
+            async with room.lock:
+                active_count, removed = room.remove_client(session)
+                was_host = removed and session.player_id == room.host_player_id
                 if was_host:
                     LOGGER.info(
                         "%s released host role",
@@ -570,22 +1496,33 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
                             ROLE_HOST,
                         ),
                     )
-                    ROOM.host_player_id = None
-                if active_count == EMPTY_ROOM_CLIENT_COUNT:
-                    if ROOM.snapshot is not None:
-                        LOGGER.info(
-                            "%s -> room_reset -> snapshot cleared info=%s",
-                            srv,
-                            summarize_snapshot(ROOM.snapshot),
-                        )
-                    ROOM.snapshot = None
-                    ROOM.state_version = STATE_VERSION_INITIAL
+                    room.host_player_id = None
+                if not removed:
+                    disconnect_reason = "replaced"
+                elif active_count == EMPTY_ROOM_CLIENT_COUNT:
+                    if close_code != WS_CLOSE_CODE_SERVICE_RESTART and not ROOMS.draining:
+                        if room.snapshot is not None:
+                            LOGGER.info(
+                                "%s -> room_reset -> %s snapshot cleared info=%s",
+                                srv,
+                                format_room_label(room.room_id),
+                                summarize_snapshot(room.snapshot),
+                            )
+                            if ROOM_STORE is not None:
+                                ROOM_STORE.record_clear(room.room_id)
+                        room.clear_game()
                 else:
-                    targets = ROOM.sessions()
-                    players = build_players_payload(targets)
-                    players_message = build_players_update_message(players, active_count)
-            if players_message is not None:
-                await broadcast_message(players_message, targets)
+                    targets = room.sessions()
+            if targets is not None:
+                broadcast_membership_update(
+                    room,
+                    targets,
+                    active_count,
+                    build_player_left_message(
+                        session.player_id, room.players_version, active_count
+                    ),
+                )
+            publish_presence(room.room_id, active_count)
             LOGGER.info(
                 "%s disconnected active=%s reason=%s code=%s detail=%s",
                 format_player_label(
@@ -598,6 +1535,170 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
                 close_code,
                 close_reason,
             )
+        if room is not None and ROOMS.release(room):
+            park_room_state(room)
+            LOGGER.info(
+                "%s -> room_close -> %s rooms=%s",
+                srv,
+                format_room_label(room.room_id),
+                len(ROOMS),
+            )
+
+
+def find_process_admission_rejection() -> str | None:
+    if ROOMS.draining:
+        return "server_draining"
+    if OVERLOAD.rejecting():
+        return "server_overloaded"
+    if PROCESS_SESSION_LIMIT > 0 and ROOMS.connection_count() >= PROCESS_SESSION_LIMIT:
+        return "server_full"
+    return None
+
+
+async def reject_join(websocket: WebSocket, connection_label: str, reason: str) -> None:
+    ADMISSION_REJECTED_TOTAL.inc(reason)
+    if reason == "server_overloaded":
+        retry_after = OVERLOAD.retry_after_seconds()
+    elif reason == "server_draining":
+        retry_after = DRAIN_RECONNECT_MS / MS_PER_SECOND
+    else:
+        retry_after = DEFAULT_JOIN_RETRY_AFTER_MS / MS_PER_SECOND
+    LOGGER.info(
+        "%s -> join -> %s rejected reason=%s retry_after_ms=%s",
+        connection_label,
+        server_label(),
+        reason,
+        round(retry_after * MS_PER_SECOND),
+    )
+    await send_direct_message(websocket, build_retry_message(reason, retry_after))
+    await websocket.close(code=WS_CLOSE_CODE_TRY_AGAIN_LATER, reason=reason)
+
+
+def find_shared_rejection(room: RoomState, message_type: str | None) -> tuple[str, str, float]:
+    if ROOMS.draining and message_type in DRAIN_REJECTED_MESSAGE_TYPES:
+        return "server_draining", RATE_SCOPE_SESSION, DRAIN_RECONNECT_MS / MS_PER_SECOND
+    if message_type not in MOVE_MESSAGE_TYPES:
+        return "", RATE_SCOPE_SESSION, 0.0
+    if OVERLOAD.rejecting():
+        SHED_TOTAL.inc(SHED_KIND_MOVE)
+        return "server_overloaded", RATE_SCOPE_ROOM, OVERLOAD.retry_after_seconds()
+    retry_after = room.rate_bucket.take() if room.rate_bucket is not None else 0.0
+    return "rate_limited", RATE_SCOPE_ROOM, retry_after
+
+
+def admit_message(room: RoomState, session: ClientSession, message_type: str | None) -> bool:
+    reason = "rate_limited"
+    scope = RATE_SCOPE_SESSION
+    retry_after = session.rate_bucket.take() if session.rate_bucket is not None else 0.0
+    if not retry_after:
+        reason, scope, retry_after = find_shared_rejection(room, message_type)
+        if retry_after and session.rate_bucket is not None:
+            session.rate_bucket.refund()
+    if not retry_after:
+        return True
+    if reason == "rate_limited":
+        RATE_LIMITED_TOTAL.inc(scope)
+    now = time.monotonic()
+    if now < session.throttled_until:
+        return False
+    session.throttled_until = now + retry_after
+    MOVE_LOGGER.info(
+        "%s -> %s -> %s rejected reason=%s scope=%s retry_after_ms=%s",
+        format_session_label(room, session),
+        message_type or "unknown",
+        server_label(),
+        reason,
+        scope,
+        round(retry_after * MS_PER_SECOND),
+    )
+    send_message(session, build_retry_message(reason, retry_after))
+    return False
+
+
+def broadcast_membership_update(
+    room: RoomState,
+    targets: list[ClientSession],
+    active_count: int,
+    event: dict,
+) -> None:
+    if OVERLOAD.shedding():
+        SHED_TOTAL.inc(SHED_KIND_PLAYERS_UPDATE)
+        return
+    full_targets: list[ClientSession] = []
+    event_targets: list[ClientSession] = []
+    for session in targets:
+        if session.schema_version == SCHEMA_VERSION_COMPACT:
+            event_targets.append(session)
+        else:
+            full_targets.append(session)
+    message = build_players_update_message(room.players_payload(), active_count)
+    if full_targets:
+        broadcast_message(message, full_targets)
+    if event_targets:
+        broadcast_message(event, event_targets)
+    room.feed.publish(message)
+
+
+async def serve_spectator(
+    websocket: WebSocket,
+    room: RoomState,
+    client_id: str,
+    join_payload: dict,
+    codec: str,
+) -> None:
+    srv = server_label()
+    connection_label = format_connection_label(client_id)
+    session = ClientSession(
+        client_id=client_id,
+        room_id=room.room_id,
+        websocket=websocket,
+        player_id="",
+        player_name=get_optional_str(join_payload, JSON_KEY_PLAYER_NAME),
+        player_color="",
+        outbound=OutboundQueue(OUTBOUND_QUEUE_LIMIT),
+        codec=codec,
+        spectator=True,
+        rate_bucket=create_bucket(SESSION_RATE_PER_SECOND, SESSION_RATE_BURST),
+    )
+    async with room.lock:
+        viewers = room.feed.attach(session)
+        players = room.players_payload()
+        snapshot = room.snapshot
+        snapshot_message = build_room_snapshot_message(
+            room, session, ROLE_SPECTATOR, len(players), players, join_payload
+        )
+    session.writer_task = asyncio.create_task(run_session_writer(session))
+    LOGGER.info(
+        "%s -> spectate -> %s %s viewers=%s codec=%s",
+        connection_label,
+        srv,
+        format_room_label(room.room_id),
+        viewers,
+        codec,
+    )
+    log_snapshot_message(connection_label, snapshot_message, snapshot)
+    send_message(session, snapshot_message)
+    try:
+        while True:
+            payload = await receive_payload(websocket, client_id, codec, room.room_id)
+            if not admit_message(room, session, payload.get(JSON_KEY_TYPE)):
+                continue
+            if payload.get(JSON_KEY_TYPE) == MESSAGE_TYPE_RESYNC:
+                await handle_resync_message(room, session, payload)
+                continue
+            LOGGER.info(
+                "%s -> %s -> %s rejected reason=spectator_read_only",
+                connection_label,
+                payload.get(JSON_KEY_TYPE) or "unknown",
+                srv,
+            )
+            send_message(session, build_error_message("spectator_read_only"))
+    finally:
+        session.outbound.close()
+        if session.writer_task is not None:
+            session.writer_task.cancel()
+        viewers = room.feed.detach(client_id)
+        LOGGER.info("%s stopped spectating viewers=%s", connection_label, viewers)
 
 
 async def receive_join_payload(websocket: WebSocket, client_id: str) -> dict:
@@ -613,145 +1714,295 @@ async def receive_join_payload(websocket: WebSocket, client_id: str) -> dict:
             payload.get(JSON_KEY_TYPE),
             srv,
         )
-        await websocket.send_json(build_error_message("join_required"))
+        await send_direct_message(websocket, build_error_message("join_required"))
 
 
-async def receive_payload(websocket: WebSocket, client_id: str) -> dict:
+async def receive_payload(
+    websocket: WebSocket, client_id: str, codec: str = CODEC_JSON, room_id: str = ""
+) -> dict:
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    text = message.get("text")
+    if RECORDER is not None:
+        RECORDER.record_frame(client_id, room_id, text if text is not None else message["bytes"])
     try:
-        return await websocket.receive_json()
+        payload = json.loads(text) if text is not None else decode_frame(message["bytes"])
+        if not isinstance(payload, dict):
+            raise ValueError("payload is not an object")
+        return payload
     except ValueError:
         LOGGER.info(
             "%s -> invalid_json -> %s",
             format_connection_label(client_id),
             server_label(),
         )
-        await websocket.send_json(build_error_message("invalid_json"))
+        await send_direct_message(websocket, build_error_message("invalid_json"), codec)
         return {}
 
 
-async def handle_new_game_message(session: ClientSession, payload: dict) -> None:
-    srv = server_label()
-    player_role = ROLE_HOST if session.player_id == ROOM.host_player_id else None
-    player_label = format_player_label(
-        session.player_id,
-        session.player_name,
-        player_role,
-    )
-    snapshot = payload.get(JSON_KEY_SNAPSHOT)
-    if not isinstance(snapshot, dict):
-        LOGGER.info(
-            "%s -> newGame -> %s rejected reason=invalid_snapshot type=%s",
-            player_label,
-            srv,
-            type(snapshot).__name__,
-        )
-        await session.websocket.send_json(build_error_message("invalid_snapshot"))
-        return
-
-    async with ROOM_LOCK:
-        if session.player_id != ROOM.host_player_id:
+async def handle_new_game_message(
+    room: RoomState, session: ClientSession, payload: dict
+) -> None:
+    raw_snapshot = payload.get(JSON_KEY_SNAPSHOT)
+    from_pool = raw_snapshot is None and PUZZLE_POOL is not None
+    if from_pool:
+        if session.player_id != room.host_player_id:
             LOGGER.info(
                 "%s -> newGame -> %s rejected reason=host_required",
-                format_player_label(session.player_id, session.player_name, None),
-                srv,
+                format_session_label(room, session),
+                server_label(),
             )
-            await session.websocket.send_json(build_error_message("host_required"))
+            send_message(session, build_error_message("host_required"))
             return
-        strip_wheel_letters(snapshot)
-        snapshot[JSON_KEY_STATE_VERSION] = STATE_VERSION_INITIAL
-        ROOM.snapshot = snapshot
-        ROOM.state_version = STATE_VERSION_INITIAL
-        targets = ROOM.sessions()
-
-    LOGGER.info(
-        "%s -> newGame -> %s accepted info=%s",
-        player_label,
-        srv,
-        summarize_snapshot(snapshot),
+        raw_snapshot = await PUZZLE_POOL.take()
+        if raw_snapshot is None:
+            LOGGER.warning(
+                "%s -> newGame -> %s rejected reason=puzzle_unavailable",
+                format_session_label(room, session),
+                server_label(),
+            )
+            send_message(session, build_error_message("puzzle_unavailable"))
+            return
+    snapshot = parse_snapshot(raw_snapshot, STATE_VERSION_INITIAL, room.snapshot)
+    if snapshot is None:
+        LOGGER.info(
+            "%s -> newGame -> %s rejected reason=invalid_snapshot type=%s",
+            format_session_label(room, session),
+            server_label(),
+            type(raw_snapshot).__name__,
+        )
+        send_message(session, build_error_message("invalid_snapshot"))
+        return
+    rejection = None if from_pool else find_snapshot_rejection(snapshot, None, WORD_INDEX)
+    if rejection is not None:
+        reason, word = rejection
+        LOGGER.info(
+            "%s -> newGame -> %s rejected reason=%s word=%s",
+            format_session_label(room, session),
+            server_label(),
+            reason,
+            word,
+        )
+        send_message(session, build_error_message(reason))
+        return
+    await dispatch_room_command(
+        room,
+        RoomCommand(
+            session=session,
+            action=MESSAGE_TYPE_NEW_GAME,
+            snapshot=snapshot,
+            failure_message="new_game_failed",
+        ),
     )
-    log_snapshot_grid(player_label, "newGame", srv, snapshot)
-    players = build_players_payload(targets)
-    message = build_state_update_message(snapshot, players)
-    await broadcast_message(message, targets)
 
 
 async def handle_state_update_message(
+    room: RoomState,
     session: ClientSession,
     payload: dict,
     action: str,
     failure_message: str,
 ) -> None:
     srv = server_label()
-    player_role = ROLE_HOST if session.player_id == ROOM.host_player_id else None
-    player_label = format_player_label(
-        session.player_id,
-        session.player_name,
-        player_role,
-    )
-    snapshot = payload.get(JSON_KEY_SNAPSHOT)
-    if not isinstance(snapshot, dict):
-        LOGGER.info(
+    if JSON_KEY_OPERATION in payload:
+        await handle_operation_message(room, session, payload, action, failure_message)
+        return
+    raw_snapshot = payload.get(JSON_KEY_SNAPSHOT)
+    snapshot = parse_snapshot(raw_snapshot, STATE_VERSION_INITIAL, room.snapshot)
+    if snapshot is None:
+        MOVE_LOGGER.info(
             "%s -> %s -> %s rejected reason=invalid_snapshot type=%s",
-            player_label,
+            format_session_label(room, session),
             action,
             srv,
-            type(snapshot).__name__,
+            type(raw_snapshot).__name__,
         )
-        await session.websocket.send_json(build_error_message("invalid_snapshot"))
+        send_message(session, build_error_message("invalid_snapshot"))
         return
-    strip_wheel_letters(snapshot)
     base_version = get_optional_int(payload, JSON_KEY_BASE_VERSION)
     if base_version is None:
         base_version = get_optional_int(payload, JSON_KEY_BASE_VERSION_ALT)
     if base_version is None:
-        base_version = get_optional_int(snapshot, JSON_KEY_STATE_VERSION)
+        base_version = get_optional_int(raw_snapshot, JSON_KEY_STATE_VERSION)
     if base_version is None:
-        LOGGER.info(
+        MOVE_LOGGER.info(
             "%s -> %s -> %s rejected reason=invalid_base_version",
-            player_label,
+            format_session_label(room, session),
             action,
             srv,
         )
-        await session.websocket.send_json(build_error_message("invalid_base_version"))
+        send_message(session, build_error_message("invalid_base_version"))
         return
+    await dispatch_room_command(
+        room,
+        RoomCommand(
+            session=session,
+            action=action,
+            snapshot=snapshot,
+            failure_message=failure_message,
+            base_version=base_version,
+            game_id=get_optional_str(payload, JSON_KEY_GAME_ID) or None,
+        ),
+    )
 
-    conflict_message = None
-    error_message = None
-    targets: list[ClientSession] | None = None
-    current_version = None
-    players: list[dict] = []
-    async with ROOM_LOCK:
-        if ROOM.snapshot is None:
-            error_message = "room_empty"
-        else:
-            current_version = ROOM.state_version
-            if base_version != current_version:
-                players = build_players_payload(ROOM.sessions())
-                conflict_message = build_conflict_message(
-                    ROOM.snapshot,
-                    current_version,
-                    players,
+
+async def handle_operation_message(
+    room: RoomState,
+    session: ClientSession,
+    payload: dict,
+    action: str,
+    failure_message: str,
+) -> None:
+    operation = parse_operation(action, payload.get(JSON_KEY_OPERATION))
+    if operation is None:
+        MOVE_LOGGER.info(
+            "%s -> %s -> %s rejected reason=invalid_operation",
+            format_session_label(room, session),
+            action,
+            server_label(),
+        )
+        send_message(session, build_error_message("invalid_operation"))
+        return
+    await dispatch_room_command(
+        room,
+        RoomCommand(
+            session=session,
+            action=action,
+            snapshot=None,
+            failure_message=failure_message,
+            base_version=get_optional_int(payload, JSON_KEY_BASE_VERSION),
+            game_id=get_optional_str(payload, JSON_KEY_GAME_ID) or None,
+            operation=operation,
+        ),
+    )
+
+
+def parse_snapshot(
+    raw_snapshot: object, state_version: int, reference: RoomSnapshot | None = None
+) -> RoomSnapshot | None:
+    if not isinstance(raw_snapshot, dict):
+        return None
+    if raw_snapshot.get(JSON_KEY_SCHEMA_VERSION) == SCHEMA_VERSION_COMPACT:
+        raw_snapshot = expand_compact_payload(raw_snapshot, reference)
+        if raw_snapshot is None:
+            return None
+    return RoomSnapshot.parse(raw_snapshot, state_version)
+
+
+def parse_operation(action: str, operation: object) -> dict | None:
+    if not isinstance(operation, dict):
+        return None
+    if action == MESSAGE_TYPE_REVEAL_CELL:
+        cell = cell_key(operation)
+        if cell is None:
+            return None
+        return build_cell_payload(cell[0], cell[1])
+    word = get_required_str(operation, JSON_KEY_WORD)
+    if word is None:
+        return None
+    return {JSON_KEY_WORD: word}
+
+
+async def dispatch_room_command(room: RoomState, command: RoomCommand) -> None:
+    acknowledge_version(command.session, command.game_id, command.base_version)
+    if ROOM_ENGINE == ROOM_ENGINE_ACTOR:
+        if not room.submit(command):
+            LOGGER.info(
+                "%s -> %s -> %s rejected reason=room_busy queued=%s",
+                format_session_label(room, command.session),
+                command.action,
+                server_label(),
+                room.pending_commands(),
+            )
+            send_message(command.session, build_error_message("room_busy"))
+        return
+    async with room.lock:
+        apply_room_command(room, command)
+
+
+async def run_room_actor(room: RoomState) -> None:
+    while True:
+        batch = await room.next_commands()
+        for command in batch:
+            set_activity(command.action, room.room_id)
+            try:
+                apply_room_command(room, command)
+            except Exception as error:
+                LOGGER.error(
+                    "%s -> %s -> %s error=%s message=%s",
+                    format_session_label(room, command.session),
+                    command.action,
+                    server_label(),
+                    type(error).__name__,
+                    str(error),
                 )
-            else:
-                next_version = current_version + STATE_VERSION_INCREMENT
-                snapshot[JSON_KEY_STATE_VERSION] = next_version
-                ROOM.snapshot = snapshot
-                ROOM.state_version = next_version
-                targets = ROOM.sessions()
+                send_message(command.session, build_error_message(command.failure_message))
+
+
+def apply_room_command(room: RoomState, command: RoomCommand) -> None:
+    if command.action == MESSAGE_TYPE_NEW_GAME:
+        commit_new_game(room, command)
+    elif command.operation is not None:
+        commit_operation(room, command)
+    else:
+        commit_state_update(room, command)
+
 
-    if error_message is not None:
+def commit_new_game(room: RoomState, command: RoomCommand) -> None:
+    srv = server_label()
+    session = command.session
+    snapshot = command.snapshot
+    if session.player_id != room.host_player_id:
         LOGGER.info(
-            "%s -> %s -> %s rejected reason=%s",
+            "%s -> newGame -> %s rejected reason=host_required",
+            format_player_label(session.player_id, session.player_name, None),
+            srv,
+        )
+        send_message(session, build_error_message("host_required"))
+        return
+    room.start_game(snapshot)
+    if ROOM_STORE is not None:
+        ROOM_STORE.record_game(
+            room.room_id, room.game_id, snapshot.state_version, snapshot.to_payload()
+        )
+    targets = room.sessions()
+
+    player_label = format_session_label(room, session)
+    LOGGER.info(
+        "%s -> newGame -> %s accepted info=%s",
+        player_label,
+        srv,
+        summarize_snapshot(snapshot),
+    )
+    log_snapshot_grid(player_label, "newGame", srv, snapshot)
+    message = build_state_update_message(
+        snapshot.to_payload(), room.players_payload(), room.game_id
+    )
+    broadcast_state_update(message, None, targets, snapshot, room.players_version)
+    room.feed.publish(message)
+
+
+def commit_state_update(room: RoomState, command: RoomCommand) -> None:
+    srv = server_label()
+    session = command.session
+    action = command.action
+    snapshot = command.snapshot
+    base_version = command.base_version
+    player_label = format_session_label(room, session)
+    if room.snapshot is None:
+        MOVE_LOGGER.info(
+            "%s -> %s -> %s rejected reason=room_empty",
             player_label,
             action,
             srv,
-            error_message,
         )
-        await session.websocket.send_json(build_error_message(error_message))
+        send_message(session, build_error_message("room_empty"))
         return
 
-    if conflict_message is not None:
-        LOGGER.info(
+    current_version = room.state_version
+    if base_version != current_version:
+        MOVE_LOGGER.info(
             "%s -> %s -> %s rejected reason=conflict base=%s current=%s",
             player_label,
             action,
@@ -759,14 +2010,33 @@ async def handle_state_update_message(
             base_version,
             current_version,
         )
-        await session.websocket.send_json(conflict_message)
+        send_message(
+            session, build_room_conflict_message(room, command, room.players_payload())
+        )
         return
 
-    if targets is None:
-        await session.websocket.send_json(build_error_message(failure_message))
+    rejection = find_snapshot_rejection(snapshot, room.snapshot, WORD_INDEX)
+    if rejection is not None:
+        reason, word = rejection
+        MOVE_LOGGER.info(
+            "%s -> %s -> %s rejected reason=%s word=%s",
+            player_label,
+            action,
+            srv,
+            reason,
+            word,
+        )
+        send_message(session, build_error_message(reason))
         return
 
-    LOGGER.info(
+    next_version = current_version + STATE_VERSION_INCREMENT
+    snapshot.stamp(next_version)
+    snapshot.share_words(room.snapshot)
+    delta = snapshot.delta_from(room.snapshot)
+    room.commit_version(snapshot, delta)
+    record_room_version(room, delta)
+
+    MOVE_LOGGER.info(
         "%s -> %s -> %s accepted info=%s base=%s",
         player_label,
         action,
@@ -775,13 +2045,468 @@ async def handle_state_update_message(
         base_version,
     )
     log_snapshot_grid(player_label, action, srv, snapshot)
-    players = build_players_payload(targets)
-    message = build_state_update_message(snapshot, players)
-    await broadcast_message(message, targets)
+    publish_room_update(room, current_version, delta)
+
+
+def commit_operation(room: RoomState, command: RoomCommand) -> None:
+    srv = server_label()
+    session = command.session
+    action = command.action
+    operation = command.operation
+    player_label = format_session_label(room, session)
+    snapshot = room.snapshot
+    rejection = None
+    cells: tuple[tuple[int, int], ...] = ()
+    solved_by: dict[str, str] = {}
+    if snapshot is not None and command.game_id != room.game_id:
+        MOVE_LOGGER.info(
+            "%s -> %s -> %s rejected reason=conflict game=%s current=%s",
+            player_label,
+            action,
+            srv,
+            format_short_id(command.game_id),
+            format_short_id(room.game_id),
+        )
+        send_message(
+            session, build_room_conflict_message(room, command, room.players_payload())
+        )
+        return
+    if snapshot is None:
+        rejection = "room_empty"
+    elif action == MESSAGE_TYPE_REVEAL_CELL:
+        cell = (operation[JSON_KEY_ROW], operation[JSON_KEY_COL])
+        if snapshot.is_letter_cell(cell):
+            cells = (cell,)
+        else:
+            rejection = "invalid_cell"
+    else:
+        word = operation[JSON_KEY_WORD]
+        if word not in snapshot.word_cells:
+            rejection = "unknown_word"
+        elif word in snapshot.solved_by:
+            rejection = "already_solved"
+        else:
+            cells = snapshot.word_cells[word]
+            solved_by[word] = session.player_id
+
+    revealed = snapshot.revealed if snapshot is not None else 0
+    for cell in cells:
+        bit = snapshot.cell_bit(cell)
+        if bit is not None:
+            revealed |= bit
+    if rejection is None and revealed == snapshot.revealed and not solved_by:
+        rejection = "duplicate_operation"
+    if rejection is not None:
+        MOVE_LOGGER.info(
+            "%s -> %s -> %s rejected reason=%s operation=%s",
+            player_label,
+            action,
+            srv,
+            rejection,
+            operation,
+        )
+        send_message(session, build_error_message(rejection))
+        return
+
+    current_version = room.state_version
+    next_version = current_version + STATE_VERSION_INCREMENT
+    next_solved_by = snapshot.solved_by
+    if solved_by:
+        next_solved_by = dict(snapshot.solved_by)
+        next_solved_by.update(solved_by)
+    next_snapshot = snapshot.derive(next_version, revealed, next_solved_by)
+    delta: dict = {}
+    new_bits = revealed & ~snapshot.revealed
+    if new_bits:
+        delta[JSON_KEY_REVEALED] = [
+            build_cell_payload(row, col)
+            for row, col in next_snapshot.revealed_cells(new_bits)
+        ]
+    if solved_by:
+        delta[JSON_KEY_SOLVED_BY] = solved_by
+    room.commit_version(next_snapshot, delta)
+    record_room_version(room, delta)
+
+    MOVE_LOGGER.info(
+        "%s -> %s -> %s accepted operation=%s info=%s base=%s",
+        player_label,
+        action,
+        srv,
+        operation,
+        summarize_snapshot(next_snapshot),
+        command.base_version,
+    )
+    log_snapshot_grid(player_label, action, srv, next_snapshot)
+    publish_room_update(room, current_version, delta)
+
+
+def record_room_version(room: RoomState, delta: dict | None) -> None:
+    if ROOM_STORE is None:
+        return
+    ROOM_STORE.record_version(
+        room.room_id,
+        room.game_id,
+        room.state_version,
+        delta,
+        room.snapshot.to_payload() if delta is None else None,
+    )
+
+
+def capture_room_states() -> dict[str, dict]:
+    return {
+        room.room_id: {
+            STORED_GAME_ID: room.game_id,
+            STORED_VERSION: room.state_version,
+            STORED_SNAPSHOT: room.snapshot.to_payload(),
+        }
+        for room in ROOMS.rooms()
+        if room.snapshot is not None
+    }
+
+
+def restore_room_state(room: RoomState) -> None:
+    recovered = ROOM_STORE.take_recovered(room.room_id) if ROOM_STORE is not None else None
+    stored = HANDOFF_ROOMS.pop(room.room_id, None) or recovered
+    if stored is None:
+        return
+    snapshot = parse_snapshot(stored.get(STORED_SNAPSHOT), stored.get(STORED_VERSION))
+    if snapshot is None:
+        return
+    room.snapshot = snapshot
+    room.state_version = snapshot.state_version
+    room.game_id = stored.get(STORED_GAME_ID)
+    for entry in stored.get(STORED_HISTORY) or ():
+        if isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], int):
+            room.history.append((entry[0], entry[1]))
+    LOGGER.info(
+        "%s -> room_restore -> %s gameId=%s history=%s info=%s",
+        server_label(),
+        format_room_label(room.room_id),
+        format_short_id(room.game_id),
+        len(room.history),
+        summarize_snapshot(snapshot),
+    )
+
+
+def build_stored_room_state(room: RoomState) -> dict:
+    return {
+        STORED_GAME_ID: room.game_id,
+        STORED_VERSION: room.state_version,
+        STORED_SNAPSHOT: room.snapshot.to_payload(),
+        STORED_HISTORY: [[version, delta] for version, delta in room.history],
+    }
+
+
+def capture_handoff_states() -> dict[str, dict]:
+    rooms = dict(HANDOFF_ROOMS)
+    for room in ROOMS.rooms():
+        if room.snapshot is None:
+            continue
+        rooms[room.room_id] = build_stored_room_state(room)
+    return rooms
+
+
+def park_room_state(room: RoomState) -> None:
+    if room.snapshot is None:
+        return
+    stored = build_stored_room_state(room)
+    HANDOFF_ROOMS[room.room_id] = stored
+    if ROOM_STORE is not None:
+        ROOM_STORE.keep_recovered(room.room_id, stored)
+    LOGGER.info(
+        "%s -> room_park -> %s gameId=%s version=%s",
+        server_label(),
+        format_room_label(room.room_id),
+        format_short_id(room.game_id),
+        room.state_version,
+    )
+
+
+def build_reconnect_message(room: RoomState, retry_after_seconds: float) -> dict:
+    return {
+        JSON_KEY_TYPE: MESSAGE_TYPE_RECONNECT,
+        JSON_KEY_REASON: CLOSE_REASON_SERVER_RESTART,
+        JSON_KEY_GAME_ID: room.game_id,
+        JSON_KEY_STATE_VERSION: room.state_version,
+        JSON_KEY_RETRY_AFTER_MS: max(round(retry_after_seconds * MS_PER_SECOND), 1),
+    }
+
+
+async def drain_server() -> None:
+    if ROOMS.draining:
+        return
+    ROOMS.draining = True
+    srv = server_label()
+    rooms = ROOMS.rooms()
+    LOGGER.info("%s -> drain -> start rooms=%s", srv, len(rooms))
+    for room in rooms:
+        async with room.lock:
+            flush_room_update(room)
+            room.stop()
+    if HANDOFF_PATH is not None:
+        handoff = capture_handoff_states()
+        try:
+            await asyncio.to_thread(write_handoff, HANDOFF_PATH, handoff)
+            LOGGER.info(
+                "%s -> handoff -> written rooms=%s path=%s", srv, len(handoff), HANDOFF_PATH
+            )
+        except OSError as error:
+            LOGGER.error(
+                "%s -> handoff -> failed path=%s error=%s", srv, HANDOFF_PATH, str(error)
+            )
+    writers: list[asyncio.Task] = []
+    for room in rooms:
+        message = build_reconnect_message(room, DRAIN_RECONNECT_MS / MS_PER_SECOND)
+        for session in room.sessions() + room.feed.viewers():
+            send_message(session, message)
+            session.close_code = WS_CLOSE_CODE_SERVICE_RESTART
+            session.close_reason = CLOSE_REASON_SERVER_RESTART
+            session.outbound.finish()
+            if session.writer_task is not None:
+                writers.append(session.writer_task)
+    if writers:
+        await asyncio.wait(writers, timeout=DRAIN_TIMEOUT_SECONDS)
+    LOGGER.info("%s -> drain -> done sessions=%s", srv, len(writers))
+
+
+class DrainingServer(uvicorn.Server):
+    async def shutdown(self, sockets=None) -> None:
+        await drain_server()
+        await super().shutdown(sockets=sockets)
+
+
+def publish_presence(room_id: str, active_count: int) -> None:
+    if BUS is None:
+        return
+    BUS.publish(
+        BUS_CHANNEL_PRESENCE,
+        {
+            PRESENCE_KEY_ROOM_ID: room_id,
+            PRESENCE_KEY_WORKER: WORKER_INDEX,
+            PRESENCE_KEY_ACTIVE_COUNT: active_count,
+        },
+    )
 
 
-async def handle_submit_word_message(session: ClientSession, payload: dict) -> None:
+def publish_room_update(room: RoomState, from_version: int, delta: dict | None) -> None:
+    if ROOM_TICK_SECONDS > 0:
+        room.defer_update(from_version, ROOM_TICK_SECONDS, flush_room_update)
+        return
+    broadcast_room_update(room, from_version, delta)
+
+
+def flush_room_update(room: RoomState) -> None:
+    from_version = room.take_pending_update()
+    if from_version is None or room.snapshot is None:
+        return
+    try:
+        broadcast_room_update(room, from_version, room.delta_since(from_version))
+    except Exception as error:
+        LOGGER.error(
+            "%s -> flush -> %s error=%s message=%s",
+            server_label(),
+            format_room_label(room.room_id),
+            type(error).__name__,
+            str(error),
+        )
+
+
+def broadcast_room_update(room: RoomState, from_version: int, delta: dict | None) -> None:
+    snapshot = room.snapshot
+    targets = room.sessions()
+    players = room.players_payload()
+    message = build_state_update_message(snapshot.to_payload(), players, room.game_id)
+    delta_message = None
+    if delta is not None:
+        delta_message = build_state_delta_message(
+            from_version,
+            room.state_version,
+            delta,
+            players,
+            room.game_id,
+        )
+    broadcast_state_update(message, delta_message, targets, snapshot, room.players_version)
+    room.feed.publish(message)
+
+
+def build_room_conflict_message(
+    room: RoomState, command: RoomCommand, players: list[dict]
+) -> dict:
+    message = build_full_conflict_message(room, command, players)
+    if command.session.schema_version == SCHEMA_VERSION_COMPACT:
+        return reference_players(message, room.players_version)
+    return message
+
+
+def build_full_conflict_message(
+    room: RoomState, command: RoomCommand, players: list[dict]
+) -> dict:
+    if (
+        command.session.sync_mode == SYNC_MODE_DELTA
+        and room.game_id is not None
+        and command.game_id == room.game_id
+        and command.base_version is not None
+    ):
+        delta = room.delta_since(command.base_version)
+        if delta is not None:
+            return build_conflict_delta_message(
+                command.base_version,
+                room.state_version,
+                delta,
+                players,
+                room.game_id,
+            )
+    return build_conflict_message(
+        build_session_snapshot_payload(command.session, room.snapshot), players
+    )
+
+
+async def handle_resync_message(
+    room: RoomState, session: ClientSession, payload: dict
+) -> None:
+    acknowledge_version(
+        session,
+        get_optional_str(payload, JSON_KEY_GAME_ID),
+        get_optional_int(payload, JSON_KEY_LAST_VERSION),
+    )
+    async with room.lock:
+        if session.spectator:
+            role = ROLE_SPECTATOR
+        elif session.player_id == room.host_player_id:
+            role = ROLE_HOST
+        else:
+            role = ROLE_GUEST
+        players = room.players_payload()
+        snapshot = room.snapshot
+        message = build_room_snapshot_message(
+            room, session, role, room.client_count(), players, payload
+        )
+        if (
+            session.schema_version == SCHEMA_VERSION_COMPACT
+            and get_optional_int(payload, JSON_KEY_PLAYERS_VERSION) == room.players_version
+        ):
+            message = reference_players(message, room.players_version)
+    log_snapshot_message(
+        format_player_label(session.player_id, session.player_name, role),
+        message,
+        snapshot,
+    )
+    send_message(session, message)
+
+
+def acknowledge_version(
+    session: ClientSession, game_id: str | None, version: int | None
+) -> None:
+    if not game_id or version is None:
+        return
+    if game_id != session.acked_game_id:
+        session.acked_game_id = game_id
+        session.acked_version = version
+    elif session.acked_version is None or version > session.acked_version:
+        session.acked_version = version
+
+
+def resume_session(session: ClientSession, replaced: ClientSession) -> None:
+    session.acked_game_id = replaced.acked_game_id
+    session.acked_version = replaced.acked_version
+
+
+def build_resume_payload(room: RoomState, session: ClientSession, payload: dict) -> dict:
+    game_id = get_optional_str(payload, JSON_KEY_GAME_ID)
+    if (
+        not game_id
+        or game_id != room.game_id
+        or session.acked_game_id != game_id
+        or session.acked_version is None
+    ):
+        return payload
+    return {**payload, JSON_KEY_LAST_VERSION: session.acked_version}
+
+
+def build_room_snapshot_message(
+    room: RoomState,
+    session: ClientSession,
+    role: str,
+    active_count: int,
+    players: list[dict],
+    payload: dict,
+) -> dict:
+    last_version = get_optional_int(payload, JSON_KEY_LAST_VERSION)
+    message = None
+    if (
+        session.sync_mode == SYNC_MODE_DELTA
+        and room.game_id is not None
+        and last_version is not None
+        and get_optional_str(payload, JSON_KEY_GAME_ID) == room.game_id
+    ):
+        delta = room.delta_since(last_version)
+        if delta is not None:
+            message = build_catch_up_message(
+                role,
+                last_version,
+                room.state_version,
+                delta,
+                active_count,
+                players,
+                room.game_id,
+                session.codec,
+            )
+    if message is None:
+        message = build_snapshot_message(
+            role,
+            build_session_snapshot_payload(session, room.snapshot),
+            active_count,
+            players,
+            session.sync_mode,
+            room.game_id,
+            session.codec,
+        )
+    message[JSON_KEY_PLAYERS_VERSION] = room.players_version
+    return message
+
+
+def build_session_snapshot_payload(
+    session: ClientSession, snapshot: RoomSnapshot | None
+) -> dict | None:
+    if snapshot is None:
+        return None
+    if session.schema_version != SCHEMA_VERSION_COMPACT:
+        return snapshot.to_payload()
+    payload = snapshot.to_compact_payload()
+    if session.word_table_id == snapshot.word_table_id:
+        return payload
+    session.word_table_id = snapshot.word_table_id
+    return {**payload, JSON_KEY_WORDS: snapshot.word_table_payload()}
+
+
+def log_snapshot_message(
+    player_label: str, message: dict, snapshot: RoomSnapshot | None
+) -> None:
+    srv = server_label()
+    if JSON_KEY_DELTA in message:
+        LOGGER.info(
+            "%s -> catchUp -> %s %s",
+            srv,
+            player_label,
+            summarize_delta(message),
+        )
+        return
+    LOGGER.info(
+        "%s -> snapshot -> %s present=%s info=%s",
+        srv,
+        player_label,
+        snapshot is not None,
+        summarize_snapshot(snapshot),
+    )
+    if snapshot is not None:
+        log_snapshot_grid(srv, "snapshot", player_label, snapshot)
+
+
+async def handle_submit_word_message(
+    room: RoomState, session: ClientSession, payload: dict
+) -> None:
     await handle_state_update_message(
+        room=room,
         session=session,
         payload=payload,
         action=MESSAGE_TYPE_SUBMIT_WORD,
@@ -789,44 +2514,213 @@ async def handle_submit_word_message(session: ClientSession, payload: dict) -> N
     )
 
 
-async def handle_reveal_cell_message(session: ClientSession, payload: dict) -> None:
+async def handle_reveal_cell_message(
+    room: RoomState, session: ClientSession, payload: dict
+) -> None:
     await handle_state_update_message(
+        room=room,
         session=session,
         payload=payload,
         action=MESSAGE_TYPE_REVEAL_CELL,
         failure_message="reveal_cell_failed",
     )
 
-async def broadcast_message(message: dict, sessions: list[ClientSession]) -> None:
+
+def broadcast_state_update(
+    message: dict,
+    delta_message: dict | None,
+    sessions: list[ClientSession],
+    snapshot: RoomSnapshot,
+    players_version: int,
+) -> None:
+    snapshot_targets: list[ClientSession] = []
+    compact_targets: list[ClientSession] = []
+    delta_targets: list[ClientSession] = []
+    compact_delta_targets: list[ClientSession] = []
+    for session in sessions:
+        compact = session.schema_version == SCHEMA_VERSION_COMPACT
+        if delta_message is not None and session.sync_mode == SYNC_MODE_DELTA:
+            (compact_delta_targets if compact else delta_targets).append(session)
+        elif compact:
+            compact_targets.append(session)
+        else:
+            snapshot_targets.append(session)
+    if snapshot_targets or not sessions:
+        broadcast_message(message, snapshot_targets, snapshot)
+    if compact_targets:
+        broadcast_word_table(compact_targets, snapshot)
+        compact_message = reference_players(message, players_version)
+        compact_message[JSON_KEY_SNAPSHOT] = snapshot.to_compact_payload()
+        broadcast_message(compact_message, compact_targets, snapshot)
+    if delta_targets:
+        broadcast_message(delta_message, delta_targets)
+    if compact_delta_targets:
+        broadcast_message(
+            reference_players(delta_message, players_version), compact_delta_targets
+        )
+
+
+def broadcast_word_table(sessions: list[ClientSession], snapshot: RoomSnapshot) -> None:
+    stale = [
+        session for session in sessions if session.word_table_id != snapshot.word_table_id
+    ]
+    if not stale:
+        return
+    for session in stale:
+        session.word_table_id = snapshot.word_table_id
+    broadcast_message(
+        build_word_table_message(snapshot.word_table_id, snapshot.word_table_payload()),
+        stale,
+    )
+
+
+def broadcast_message(
+    message: dict,
+    sessions: list[ClientSession],
+    snapshot: RoomSnapshot | None = None,
+) -> None:
     srv = server_label()
-    snapshot = message.get(JSON_KEY_SNAPSHOT)
     message_type = message.get(JSON_KEY_TYPE)
     message_label = (
         "updated crossword"
         if message_type == MESSAGE_TYPE_STATE_UPDATE
         else message_type
     )
-    LOGGER.info(
+    BROADCAST_LOGGER.info(
         "%s -> broadcast %s -> players=%s info=%s",
         srv,
         message_label,
         len(sessions),
-        summarize_snapshot(snapshot),
+        summarize_delta(message)
+        if message_type == MESSAGE_TYPE_STATE_DELTA
+        else summarize_snapshot(snapshot),
     )
-    if isinstance(snapshot, dict):
+    if snapshot is not None:
         log_snapshot_grid(srv, message_label, "players", snapshot)
+    if not sessions:
+        return
+    started = time.perf_counter()
+    frames: dict[str, OutboundFrame] = {}
+    queued_bytes = 0
     for session in sessions:
-        try:
-            await session.websocket.send_json(message)
-        except Exception as error:
-            LOGGER.warning(
-                "%s -> %s -> %s failed error=%s message=%s",
-                srv,
-                message.get(JSON_KEY_TYPE),
-                format_player_label(session.player_id, session.player_name, None),
-                type(error).__name__,
-                str(error),
+        frame = frames.get(session.codec)
+        if frame is None:
+            frame = OutboundFrame(message_type, encode_frame(message, session.codec))
+            frames[session.codec] = frame
+        queue_frame(session, frame)
+        queued_bytes += len(frame.frame)
+    BROADCAST_SECONDS.observe(time.perf_counter() - started, message_type)
+    BROADCAST_RECIPIENTS_TOTAL.inc(message_type, amount=len(sessions))
+    BROADCAST_BYTES_TOTAL.inc(message_type, amount=queued_bytes)
+
+
+def send_message(session: ClientSession, message: dict) -> None:
+    count_error_reply(message)
+    queue_frame(
+        session,
+        OutboundFrame(message.get(JSON_KEY_TYPE), encode_frame(message, session.codec)),
+    )
+
+
+async def send_direct_message(
+    websocket: WebSocket, message: dict, codec: str = CODEC_JSON
+) -> None:
+    count_error_reply(message)
+    frame = encode_frame(message, codec)
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+
+def count_error_reply(message: dict) -> None:
+    if message.get(JSON_KEY_TYPE) == MESSAGE_TYPE_ERROR:
+        ERROR_REPLIES_TOTAL.inc(message.get(JSON_KEY_MESSAGE))
+
+
+def queue_frame(session: ClientSession, frame: OutboundFrame) -> None:
+    if session.outbound.put(frame):
+        return
+    OUTBOUND_OVERFLOWS_TOTAL.inc()
+    LOGGER.warning(
+        "%s -> %s -> %s dropped reason=outbound_overflow limit=%s",
+        server_label(),
+        frame.message_type,
+        format_player_label(session.player_id, session.player_name, None),
+        OUTBOUND_QUEUE_LIMIT,
+    )
+
+
+async def run_session_writer(session: ClientSession) -> None:
+    set_activity(ACTIVITY_SEND, session.room_id)
+    failed = False
+    while True:
+        frame = await session.outbound.get()
+        if frame is None:
+            break
+        if not await send_frame(session, frame.frame, frame.message_type):
+            failed = True
+            break
+    session.outbound.close()
+    if failed or session.outbound.overflowed or session.close_code is not None:
+        await close_session_socket(session)
+
+
+def replace_stale_session(session: ClientSession) -> None:
+    session.close_code = WS_CLOSE_CODE_SESSION_REPLACED
+    session.close_reason = CLOSE_REASON_SESSION_REPLACED
+    session.outbound.close()
+
+
+async def close_session_socket(session: ClientSession) -> None:
+    code, reason = None, None
+    if session.outbound.overflowed:
+        code, reason = WS_CLOSE_CODE_TRY_AGAIN_LATER, "outbound_overflow"
+    elif session.close_code is not None:
+        code, reason = session.close_code, session.close_reason
+    try:
+        if code is None:
+            await asyncio.wait_for(session.websocket.close(), timeout=SEND_TIMEOUT_SECONDS)
+        else:
+            await asyncio.wait_for(
+                session.websocket.close(code=code, reason=reason),
+                timeout=SEND_TIMEOUT_SECONDS,
             )
+    except Exception:
+        pass
+
+
+async def send_frame(
+    session: ClientSession, frame: str | bytes, message_type: str | None
+) -> bool:
+    send = (
+        session.websocket.send_bytes(frame)
+        if isinstance(frame, bytes)
+        else session.websocket.send_text(frame)
+    )
+    try:
+        await asyncio.wait_for(send, timeout=SEND_TIMEOUT_SECONDS)
+        SENT_FRAMES_TOTAL.inc(message_type)
+        SENT_BYTES_TOTAL.inc(message_type, amount=len(frame))
+        return True
+    except asyncio.TimeoutError:
+        LOGGER.warning(
+            "%s -> %s -> %s failed error=timeout seconds=%s",
+            server_label(),
+            message_type,
+            format_player_label(session.player_id, session.player_name, None),
+            SEND_TIMEOUT_SECONDS,
+        )
+    except Exception as error:
+        LOGGER.warning(
+            "%s -> %s -> %s failed error=%s message=%s",
+            server_label(),
+            message_type,
+            format_player_label(session.player_id, session.player_name, None),
+            type(error).__name__,
+            str(error),
+        )
+    return False
 
 
 if __name__ == "__main__":
@@ -839,10 +2733,21 @@ if __name__ == "__main__":
         ENV_WS_PING_TIMEOUT_SECONDS, DEFAULT_WS_PING_TIMEOUT_SECONDS
     )
 
-    uvicorn.run(
-        "app.main:app",
-        host=host,
-        port=port,
-        ws_ping_interval=ws_ping_interval,
-        ws_ping_timeout=ws_ping_timeout,
-    )
+    workers = read_int_env(ENV_WORKERS, DEFAULT_WORKERS)
+    if workers > 1:
+        run_cluster(host, port, workers, ws_ping_interval, ws_ping_timeout)
+        raise SystemExit(0)
+
+    # uvicorn imports "app.main" as a module of its own, apart from this __main__ copy.
+    # The server class must come from that module so drain_server sees the rooms it serves.
+    from app.main import DrainingServer as ServedDrainingServer
+
+    ServedDrainingServer(
+        uvicorn.Config(
+            "app.main:app",
+            host=host,
+            port=port,
+            ws_ping_interval=ws_ping_interval,
+            ws_ping_timeout=ws_ping_timeout,
+        )
+    ).run()
@@ -0,0 +1,317 @@
+import asyncio
+import bisect
+import time
+
+METRIC_PREFIX = "words_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+INFINITY_LABEL = "+Inf"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(label_names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not label_names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = METRIC_PREFIX + name
+        self.help_text = help_text
+        self.label_names = label_names
+
+    def label_key(self, labels: tuple[str, ...]) -> tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple("" if value is None else str(value) for value in labels)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self.render_samples())
+        return lines
+
+    def render_samples(self) -> list[str]:
+        return []
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, label_names)
+        self._values: dict[tuple[str, ...], float] = {} if label_names else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self.label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self.label_key(labels), 0)
+
+    def render_samples(self) -> list[str]:
+        return [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, label_names)
+        self._values: dict[tuple[str, ...], float] = {} if label_names else {(): 0}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self.label_key(labels)] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self.label_key(labels), 0)
+
+    def render_samples(self) -> list[str]:
+        return [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self.label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0]
+            self._series[key] = series
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(self.label_key(labels))
+        return sum(series[0]) if series is not None else 0
+
+    def render_samples(self) -> list[str]:
+        lines: list[str] = []
+        bucket_names = self.label_names + ("le",)
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = format_labels(bucket_names, key + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = format_labels(bucket_names, key + (INFINITY_LABEL,))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            series_labels = format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{series_labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class TimedLock:
+    def __init__(self, wait_seconds: Histogram, hold_seconds: Histogram) -> None:
+        self._lock = asyncio.Lock()
+        self._wait_seconds = wait_seconds
+        self._hold_seconds = hold_seconds
+        self._acquired_at = 0.0
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    async def __aenter__(self) -> None:
+        started = time.perf_counter()
+        await self._lock.acquire()
+        self._acquired_at = time.perf_counter()
+        self._wait_seconds.observe(self._acquired_at - started)
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._hold_seconds.observe(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+
+REGISTRY = MetricsRegistry()
+HANDLER_SECONDS = REGISTRY.histogram(
+    "handler_seconds",
+    "Time spent handling one client message, by message type.",
+    ("type",),
+)
+ROOM_LOCK_WAIT_SECONDS = REGISTRY.histogram(
+    "room_lock_wait_seconds",
+    "Time spent waiting to acquire a room lock.",
+)
+ROOM_LOCK_HOLD_SECONDS = REGISTRY.histogram(
+    "room_lock_hold_seconds",
+    "Time a room lock was held.",
+)
+BROADCAST_SECONDS = REGISTRY.histogram(
+    "broadcast_seconds",
+    "Time spent encoding and queueing one broadcast, by message type.",
+    ("type",),
+)
+BROADCAST_RECIPIENTS_TOTAL = REGISTRY.counter(
+    "broadcast_recipients_total",
+    "Sessions a broadcast frame was queued for, by message type.",
+    ("type",),
+)
+BROADCAST_BYTES_TOTAL = REGISTRY.counter(
+    "broadcast_bytes_total",
+    "Bytes queued by broadcasts (frame size times recipients), by message type.",
+    ("type",),
+)
+SENT_FRAMES_TOTAL = REGISTRY.counter(
+    "sent_frames_total",
+    "Frames written to sockets, by message type.",
+    ("type",),
+)
+SENT_BYTES_TOTAL = REGISTRY.counter(
+    "sent_bytes_total",
+    "Bytes written to sockets, by message type.",
+    ("type",),
+)
+ERROR_REPLIES_TOTAL = REGISTRY.counter(
+    "error_replies_total",
+    "Error messages sent to clients, by reason (conflict, version_mismatch, ...).",
+    ("reason",),
+)
+OUTBOUND_OVERFLOWS_TOTAL = REGISTRY.counter(
+    "outbound_overflows_total",
+    "Sessions closed because their outbound queue overflowed.",
+)
+ACTIVE_ROOMS = REGISTRY.gauge("active_rooms", "Rooms with at least one reference.")
+ACTIVE_SESSIONS = REGISTRY.gauge("active_sessions", "Joined client sessions.")
+ACTIVE_SPECTATORS = REGISTRY.gauge("active_spectators", "Joined spectator sessions.")
+OUTBOUND_QUEUE_FRAMES = REGISTRY.gauge(
+    "outbound_queue_frames",
+    "Frames waiting in outbound queues (sum and max over sessions).",
+    ("stat",),
+)
+ROOM_COMMAND_QUEUE_COMMANDS = REGISTRY.gauge(
+    "room_command_queue_commands",
+    "Commands waiting in room actor queues (sum and max over rooms).",
+    ("stat",),
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "loop_lag_seconds",
+    "How late the event loop woke the lag sampler.",
+)
+LOOP_LAG_MAX_SECONDS = REGISTRY.gauge(
+    "loop_lag_max_seconds",
+    "Largest event loop lag among the recent samples.",
+)
+SLOW_CALLBACKS_TOTAL = REGISTRY.counter(
+    "slow_callbacks_total",
+    "Callbacks that held the event loop past the threshold, by activity.",
+    ("activity",),
+)
+BUS_EVENTS_TOTAL = REGISTRY.counter(
+    "bus_events_total",
+    "Cross-process bus events, by direction (published, received, dropped).",
+    ("direction",),
+)
+PUZZLE_POOL_READY = REGISTRY.gauge(
+    "puzzle_pool_ready",
+    "Pre-generated crosswords waiting in the puzzle pool.",
+)
+PUZZLE_POOL_MISSES_TOTAL = REGISTRY.counter(
+    "puzzle_pool_misses_total",
+    "Pool newGame requests that found the pool empty.",
+)
+PUZZLE_GENERATION_SECONDS = REGISTRY.histogram(
+    "puzzle_generation_seconds",
+    "Time to generate one crossword in the puzzle process pool.",
+)
+RATE_LIMITED_TOTAL = REGISTRY.counter(
+    "rate_limited_total",
+    "Client messages refused by a token bucket, by scope (session, room).",
+    ("scope",),
+)
+ADMISSION_REJECTED_TOTAL = REGISTRY.counter(
+    "admission_rejected_total",
+    "Joins refused at admission, by reason (room_full, server_full, server_overloaded).",
+    ("reason",),
+)
+SHED_TOTAL = REGISTRY.counter(
+    "shed_total",
+    "Work skipped in overload mode, by kind (grid_log, players_update, move).",
+    ("kind",),
+)
+OVERLOAD_LEVEL = REGISTRY.gauge(
+    "overload_level",
+    "Overload mode from recent loop lag: 0 normal, 1 shedding, 2 rejecting moves.",
+)
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from app.logs import LOGGER_NAME
+from app.snapshot import (
+    JSON_KEY_REVEALED,
+    JSON_KEY_SETTINGS,
+    JSON_KEY_SOLVED_BY,
+    JSON_KEY_WORDS,
+)
+
+WAL_FILE_NAME = "rooms.wal"
+SNAPSHOT_FILE_NAME = "rooms.snapshot.json"
+HANDOFF_FILE_NAME = "handoff.json"
+TEMP_SUFFIX = ".tmp"
+RECORD_GAME = "game"
+RECORD_VERSION = "version"
+RECORD_CLEAR = "clear"
+KEY_OP = "op"
+KEY_ROOM = "room"
+KEY_ROOMS = "rooms"
+KEY_GAME_ID = "gameId"
+KEY_VERSION = "stateVersion"
+KEY_SNAPSHOT = "snapshot"
+KEY_DELTA = "delta"
+KEY_HISTORY = "history"
+KEY_CREATED_AT = "createdAt"
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+def apply_delta(payload: dict, delta: dict) -> dict:
+    updated = dict(payload)
+    if JSON_KEY_REVEALED in delta:
+        updated[JSON_KEY_REVEALED] = list(payload.get(JSON_KEY_REVEALED, [])) + delta[
+            JSON_KEY_REVEALED
+        ]
+    if JSON_KEY_WORDS in delta:
+        updated[JSON_KEY_WORDS] = list(payload.get(JSON_KEY_WORDS, [])) + delta[JSON_KEY_WORDS]
+    if JSON_KEY_SOLVED_BY in delta:
+        solved_by = dict(payload.get(JSON_KEY_SOLVED_BY, {}))
+        solved_by.update(delta[JSON_KEY_SOLVED_BY])
+        updated[JSON_KEY_SOLVED_BY] = solved_by
+    if JSON_KEY_SETTINGS in delta:
+        updated[JSON_KEY_SETTINGS] = delta[JSON_KEY_SETTINGS]
+    return updated
+
+
+def replay_record(rooms: dict[str, dict], record: dict) -> None:
+    room_id = record.get(KEY_ROOM)
+    op = record.get(KEY_OP)
+    if not isinstance(room_id, str):
+        return
+    if op == RECORD_CLEAR:
+        rooms.pop(room_id, None)
+        return
+    current = rooms.get(room_id)
+    version = record.get(KEY_VERSION)
+    if not isinstance(version, int):
+        return
+    if op == RECORD_GAME:
+        if current is None or current[KEY_GAME_ID] != record.get(KEY_GAME_ID):
+            rooms[room_id] = {
+                KEY_GAME_ID: record.get(KEY_GAME_ID),
+                KEY_VERSION: version,
+                KEY_SNAPSHOT: record.get(KEY_SNAPSHOT),
+            }
+        return
+    if op != RECORD_VERSION or current is None:
+        return
+    if current[KEY_GAME_ID] != record.get(KEY_GAME_ID) or version <= current[KEY_VERSION]:
+        return
+    snapshot = record.get(KEY_SNAPSHOT)
+    delta = record.get(KEY_DELTA)
+    if snapshot is None:
+        if version != current[KEY_VERSION] + 1 or not isinstance(delta, dict):
+            return
+        snapshot = apply_delta(current[KEY_SNAPSHOT], delta)
+    current[KEY_VERSION] = version
+    current[KEY_SNAPSHOT] = snapshot
+
+
+def read_room_states(snapshot_path: Path, wal_path: Path) -> tuple[dict[str, dict], int]:
+    rooms: dict[str, dict] = {}
+    if snapshot_path.exists():
+        with snapshot_path.open("r", encoding="utf-8") as input_file:
+            rooms = json.load(input_file).get(KEY_ROOMS, {})
+    replayed = 0
+    if wal_path.exists():
+        with wal_path.open("r", encoding="utf-8") as input_file:
+            for line in input_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    LOGGER.warning("persistence_skip_record path=%s", wal_path)
+                    continue
+                replay_record(rooms, record)
+                replayed += 1
+    return rooms, replayed
+
+
+def append_lines(path: Path, lines: list[str]) -> None:
+    with path.open("a", encoding="utf-8") as output_file:
+        output_file.writelines(lines)
+        output_file.flush()
+        os.fsync(output_file.fileno())
+
+
+def write_json_atomic(path: Path, payload: dict) -> None:
+    temp_path = path.with_name(path.name + TEMP_SUFFIX)
+    with temp_path.open("w", encoding="utf-8") as output_file:
+        json.dump(payload, output_file, separators=(",", ":"), ensure_ascii=False)
+        output_file.flush()
+        os.fsync(output_file.fileno())
+    os.replace(temp_path, path)
+
+
+def write_compacted(snapshot_path: Path, wal_path: Path, rooms: dict[str, dict]) -> None:
+    write_json_atomic(snapshot_path, {KEY_ROOMS: rooms})
+    with wal_path.open("w", encoding="utf-8") as output_file:
+        os.fsync(output_file.fileno())
+
+
+def write_handoff(path: Path, rooms: dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(path, {KEY_CREATED_AT: time.time(), KEY_ROOMS: rooms})
+
+
+def read_handoff(path: Path, max_age_seconds: float) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as input_file:
+            payload = json.load(input_file)
+    except ValueError:
+        LOGGER.warning("handoff_skip_file path=%s reason=invalid_json", path)
+        payload = {}
+    finally:
+        path.unlink(missing_ok=True)
+    if not isinstance(payload, dict):
+        return {}
+    created_at = payload.get(KEY_CREATED_AT)
+    if not isinstance(created_at, (int, float)) or time.time() - created_at > max_age_seconds:
+        LOGGER.warning("handoff_skip_file path=%s reason=stale", path)
+        return {}
+    rooms = payload.get(KEY_ROOMS)
+    return rooms if isinstance(rooms, dict) else {}
+
+
+class RoomStore:
+    def __init__(self, directory: Path, flush_seconds: float, compact_records: int) -> None:
+        self.directory = directory
+        self.wal_path = directory / WAL_FILE_NAME
+        self.snapshot_path = directory / SNAPSHOT_FILE_NAME
+        self.flush_seconds = flush_seconds
+        self.compact_records = compact_records
+        self.recovered: dict[str, dict] = {}
+        self._pending: list[str] = []
+        self._records_since_compaction = 0
+        self._capture = None
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    def load(self) -> int:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.recovered, replayed = read_room_states(self.snapshot_path, self.wal_path)
+        self._records_since_compaction = replayed
+        return len(self.recovered)
+
+    def start(self, capture) -> None:
+        self._capture = capture
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def take_recovered(self, room_id: str) -> dict | None:
+        return self.recovered.pop(room_id, None)
+
+    def keep_recovered(self, room_id: str, stored: dict) -> None:
+        self.recovered[room_id] = stored
+
+    def record_game(self, room_id: str, game_id: str, version: int, snapshot: dict) -> None:
+        self.append(
+            {
+                KEY_OP: RECORD_GAME,
+                KEY_ROOM: room_id,
+                KEY_GAME_ID: game_id,
+                KEY_VERSION: version,
+                KEY_SNAPSHOT: snapshot,
+            }
+        )
+
+    def record_version(
+        self,
+        room_id: str,
+        game_id: str,
+        version: int,
+        delta: dict | None,
+        snapshot: dict | None,
+    ) -> None:
+        record = {
+            KEY_OP: RECORD_VERSION,
+            KEY_ROOM: room_id,
+            KEY_GAME_ID: game_id,
+            KEY_VERSION: version,
+        }
+        if delta is None:
+            record[KEY_SNAPSHOT] = snapshot
+        else:
+            record[KEY_DELTA] = delta
+        self.append(record)
+
+    def record_clear(self, room_id: str) -> None:
+        self.recovered.pop(room_id, None)
+        self.append({KEY_OP: RECORD_CLEAR, KEY_ROOM: room_id})
+
+    def append(self, record: dict) -> None:
+        self._pending.append(
+            json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        )
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as error:
+                LOGGER.error(
+                    "persistence_flush_failed error=%s message=%s",
+                    type(error).__name__,
+                    str(error),
+                )
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if self._pending:
+                lines = self._pending
+                self._pending = []
+                await asyncio.to_thread(append_lines, self.wal_path, lines)
+                self._records_since_compaction += len(lines)
+            if (
+                self._capture is not None
+                and self.compact_records > 0
+                and self._records_since_compaction >= self.compact_records
+            ):
+                await self.compact()
+
+    async def compact(self) -> None:
+        rooms = dict(self.recovered)
+        rooms.update(self._capture())
+        await asyncio.to_thread(write_compacted, self.snapshot_path, self.wal_path, rooms)
+        self._records_since_compaction = 0
+        LOGGER.info("persistence_compacted rooms=%s path=%s", len(rooms), self.snapshot_path)
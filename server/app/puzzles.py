@@ -0,0 +1,219 @@
+import asyncio
+import concurrent.futures
+import importlib
+import logging
+import multiprocessing
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from app.logs import LOGGER_NAME
+from app.metrics import PUZZLE_GENERATION_SECONDS, PUZZLE_POOL_MISSES_TOTAL, PUZZLE_POOL_READY
+from app.snapshot import (
+    CROSSWORD_EMPTY_CELL,
+    JSON_KEY_GRID_ROWS,
+    JSON_KEY_REVEALED,
+    JSON_KEY_SEED_LETTERS,
+    JSON_KEY_SETTINGS,
+    JSON_KEY_SOLVED_BY,
+    JSON_KEY_WORDS,
+    build_word_payload,
+)
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_LAB_DIR = REPO_DIR / "lab" / "crossword_repeatability"
+DEFAULT_DICTIONARY_PATH = REPO_DIR / "app" / "src" / "main" / "assets" / "words.txt"
+DEFAULT_FORBIDDEN_PATH = REPO_DIR / "app" / "src" / "main" / "assets" / "forbidden_words.txt"
+LAB_MODULE_NAME = "simulate_word_frequency"
+SELECTION_MODE_RANDOM_WORD = "random_word"
+JSON_KEY_SELECTION_MODE = "selectionMode"
+JSON_KEY_MAX_LETTER_SET_SIZE = "maxLetterSetSize"
+PROCESS_START_METHOD = "spawn"
+SEED_BITS = 64
+REFILL_RETRY_SECONDS = 1.0
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+GENERATOR_STATE: tuple | None = None
+
+
+def init_generator(
+    lab_dir: str, dictionary_path: str, forbidden_path: str, max_letter_set_size: int
+) -> None:
+    global GENERATOR_STATE
+    if lab_dir not in sys.path:
+        sys.path.insert(0, lab_dir)
+    lab = importlib.import_module(LAB_MODULE_NAME)
+    dictionary = lab.filter_forbidden_words(
+        lab.load_word_list(Path(dictionary_path)),
+        lab.load_optional_word_set(Path(forbidden_path)),
+    )
+    eligible = sorted(lab.build_eligible_words(dictionary, max_letter_set_size))
+    GENERATOR_STATE = (lab, dictionary, eligible, max_letter_set_size)
+
+
+def find_layout_words(rows: list[str], min_word_length: int) -> list[dict]:
+    lines = [
+        [(row_index, col_index) for col_index in range(len(row))]
+        for row_index, row in enumerate(rows)
+    ]
+    column_count = max((len(row) for row in rows), default=0)
+    lines.extend(
+        [(row_index, col_index) for row_index in range(len(rows))]
+        for col_index in range(column_count)
+    )
+    words: list[dict] = []
+    for line in lines:
+        run: list[tuple[int, int]] = []
+        for cell in line + [None]:
+            if cell is not None and rows[cell[0]][cell[1]] != CROSSWORD_EMPTY_CELL:
+                run.append(cell)
+                continue
+            if len(run) >= min_word_length:
+                word = "".join(rows[row][col] for row, col in run).upper()
+                words.append(build_word_payload(word, tuple(run)))
+            run = []
+    return words
+
+
+def generate_puzzle(seed: int) -> dict | None:
+    lab, dictionary, eligible, max_letter_set_size = GENERATOR_STATE
+    rng = random.Random(seed)
+    candidates = list(eligible)
+    for _ in range(lab.MAX_CROSSWORD_GENERATION_ATTEMPTS):
+        if not candidates:
+            break
+        seed_letters = candidates.pop(rng.randrange(len(candidates)))
+        mini_dictionary = [
+            word
+            for word in lab.build_mini_dictionary(seed_letters, dictionary)
+            if len(word) >= lab.MIN_CROSSWORD_WORD_LENGTH
+        ]
+        rows = lab.normalize_crossword_rows(lab.generate_random_crossword(mini_dictionary, rng))
+        words = find_layout_words(rows, lab.MIN_CROSSWORD_WORD_LENGTH)
+        if len(words) < lab.MIN_CROSSWORD_WORD_COUNT:
+            continue
+        return {
+            JSON_KEY_SEED_LETTERS: seed_letters,
+            JSON_KEY_GRID_ROWS: rows,
+            JSON_KEY_REVEALED: [],
+            JSON_KEY_WORDS: words,
+            JSON_KEY_SOLVED_BY: {},
+            JSON_KEY_SETTINGS: {
+                JSON_KEY_SELECTION_MODE: SELECTION_MODE_RANDOM_WORD,
+                JSON_KEY_MAX_LETTER_SET_SIZE: max_letter_set_size,
+            },
+        }
+    return None
+
+
+class PuzzlePool:
+    def __init__(
+        self,
+        size: int,
+        workers: int,
+        lab_dir: Path,
+        dictionary_path: Path,
+        forbidden_path: Path,
+        max_letter_set_size: int,
+    ) -> None:
+        self.size = max(size, 1)
+        self.workers = max(workers, 1)
+        self.lab_dir = lab_dir
+        self.dictionary_path = dictionary_path
+        self.forbidden_path = forbidden_path
+        self.max_letter_set_size = max_letter_set_size
+        self.failed = False
+        self._ready: deque[dict] = deque()
+        self._wanted = asyncio.Event()
+        self._rng = random.Random()
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+            initializer=init_generator,
+            initargs=(
+                str(self.lab_dir),
+                str(self.dictionary_path),
+                str(self.forbidden_path),
+                self.max_letter_set_size,
+            ),
+        )
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._executor is not None:
+            executor = self._executor
+            self._executor = None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    async def take(self) -> dict | None:
+        self._wanted.set()
+        if self._ready:
+            puzzle = self._ready.popleft()
+            PUZZLE_POOL_READY.set(len(self._ready))
+            return puzzle
+        PUZZLE_POOL_MISSES_TOTAL.inc()
+        if self.failed or self._executor is None:
+            return None
+        try:
+            return await self.generate()
+        except Exception as error:
+            LOGGER.error(
+                "puzzle_generate_failed error=%s message=%s", type(error).__name__, str(error)
+            )
+            return None
+
+    async def generate(self) -> dict | None:
+        started = time.perf_counter()
+        puzzle = await asyncio.get_running_loop().run_in_executor(
+            self._executor, generate_puzzle, self._rng.getrandbits(SEED_BITS)
+        )
+        PUZZLE_GENERATION_SECONDS.observe(time.perf_counter() - started)
+        return puzzle
+
+    async def run(self) -> None:
+        while True:
+            missing = self.size - len(self._ready)
+            if missing <= 0:
+                self._wanted.clear()
+                await self._wanted.wait()
+                continue
+            results = await asyncio.gather(
+                *(self.generate() for _ in range(min(missing, self.workers))),
+                return_exceptions=True,
+            )
+            puzzles = [result for result in results if isinstance(result, dict)]
+            self._ready.extend(puzzles)
+            PUZZLE_POOL_READY.set(len(self._ready))
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if any(isinstance(error, BrokenProcessPool) for error in errors):
+                self.failed = True
+                LOGGER.error(
+                    "puzzle_pool_failed lab=%s dictionary=%s",
+                    self.lab_dir,
+                    self.dictionary_path,
+                )
+                return
+            if not puzzles:
+                for error in errors:
+                    LOGGER.warning(
+                        "puzzle_generate_failed error=%s message=%s",
+                        type(error).__name__,
+                        str(error),
+                    )
+                await asyncio.sleep(REFILL_RETRY_SECONDS)
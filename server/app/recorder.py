@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.logs import LOGGER_NAME
+
+CAPTURE_FILE_NAME = "frames.wcap"
+CAPTURE_MAGIC = b"WCAP\x01"
+FRAME_TEXT = 0
+FRAME_BINARY = 1
+FRAME_CLOSE = 2
+FRAME_KINDS = (FRAME_TEXT, FRAME_BINARY, FRAME_CLOSE)
+RECORD_HEADER = struct.Struct("<QB16sBI")
+ROOM_ID_MAX_BYTES = 255
+MICROSECONDS_PER_SECOND = 1_000_000
+DEFAULT_RECORD_PENDING_LIMIT = 65536
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+@dataclass(frozen=True)
+class CapturedFrame:
+    recorded_at: float
+    kind: int
+    session_id: str
+    room_id: str
+    payload: bytes
+
+    def frame(self) -> str | bytes:
+        return self.payload.decode("utf-8") if self.kind == FRAME_TEXT else self.payload
+
+
+def encode_record(
+    recorded_at: float, kind: int, session_id: str, room_id: str, payload: bytes
+) -> bytes:
+    room = room_id.encode("utf-8")[:ROOM_ID_MAX_BYTES]
+    header = RECORD_HEADER.pack(
+        round(recorded_at * MICROSECONDS_PER_SECOND),
+        kind,
+        uuid.UUID(session_id).bytes,
+        len(room),
+        len(payload),
+    )
+    return header + room + payload
+
+
+def read_capture(path: Path) -> list[CapturedFrame]:
+    data = path.read_bytes()
+    if not data.startswith(CAPTURE_MAGIC):
+        raise ValueError(f"{path} is not a capture file")
+    frames: list[CapturedFrame] = []
+    position = len(CAPTURE_MAGIC)
+    while position + RECORD_HEADER.size <= len(data):
+        recorded_us, kind, session, room_length, payload_length = RECORD_HEADER.unpack_from(
+            data, position
+        )
+        position += RECORD_HEADER.size
+        end = position + room_length + payload_length
+        if end > len(data) or kind not in FRAME_KINDS:
+            LOGGER.warning("capture_truncated path=%s frames=%s", path, len(frames))
+            break
+        frames.append(
+            CapturedFrame(
+                recorded_at=recorded_us / MICROSECONDS_PER_SECOND,
+                kind=kind,
+                session_id=str(uuid.UUID(bytes=session)),
+                room_id=data[position : position + room_length].decode("utf-8", "replace"),
+                payload=data[position + room_length : end],
+            )
+        )
+        position = end
+    return frames
+
+
+def append_records(path: Path, records: list[bytes]) -> None:
+    with path.open("ab") as output_file:
+        if output_file.tell() == 0:
+            output_file.write(CAPTURE_MAGIC)
+        output_file.writelines(records)
+
+
+class FrameRecorder:
+    def __init__(
+        self,
+        path: Path,
+        flush_seconds: float,
+        pending_limit: int = DEFAULT_RECORD_PENDING_LIMIT,
+    ) -> None:
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.pending_limit = max(pending_limit, 1)
+        self.dropped = 0
+        self._clock_offset = time.time() - time.monotonic()
+        self._pending: list[bytes] = []
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self.dropped:
+            LOGGER.warning("capture_dropped frames=%s path=%s", self.dropped, self.path)
+
+    def record_frame(self, session_id: str, room_id: str, frame: str | bytes) -> None:
+        if isinstance(frame, str):
+            self.append(FRAME_TEXT, session_id, room_id, frame.encode("utf-8"))
+        else:
+            self.append(FRAME_BINARY, session_id, room_id, frame)
+
+    def record_close(self, session_id: str, room_id: str) -> None:
+        self.append(FRAME_CLOSE, session_id, room_id, b"")
+
+    def append(self, kind: int, session_id: str, room_id: str, payload: bytes) -> None:
+        if len(self._pending) >= self.pending_limit:
+            self.dropped += 1
+            return
+        recorded_at = time.monotonic() + self._clock_offset
+        self._pending.append(encode_record(recorded_at, kind, session_id, room_id, payload))
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as error:
+                LOGGER.error(
+                    "capture_flush_failed error=%s message=%s",
+                    type(error).__name__,
+                    str(error),
+                )
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            records = self._pending
+            self._pending = []
+            await asyncio.to_thread(append_records, self.path, records)
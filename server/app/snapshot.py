@@ -0,0 +1,441 @@
+import base64
+import binascii
+import itertools
+import sys
+
+JSON_KEY_STATE_VERSION = "stateVersion"
+JSON_KEY_SEED_LETTERS = "seedLetters"
+JSON_KEY_WHEEL_LETTERS = "wheelLetters"
+JSON_KEY_GRID_ROWS = "gridRows"
+JSON_KEY_REVEALED = "revealed"
+JSON_KEY_WORDS = "words"
+JSON_KEY_SETTINGS = "settings"
+JSON_KEY_SOLVED_BY = "solvedBy"
+JSON_KEY_WORD = "word"
+JSON_KEY_POSITIONS = "positions"
+JSON_KEY_ROW = "row"
+JSON_KEY_COL = "col"
+JSON_KEY_SCHEMA_VERSION = "schemaVersion"
+JSON_KEY_COLUMN_COUNT = "columnCount"
+JSON_KEY_REVEALED_BITS = "revealedBits"
+JSON_KEY_WORD_TABLE_ID = "wordTableId"
+JSON_KEY_SOLVED = "solved"
+CROSSWORD_EMPTY_CELL = "."
+SCHEMA_VERSION_FULL = 1
+SCHEMA_VERSION_COMPACT = 2
+SCHEMA_VERSIONS = (SCHEMA_VERSION_FULL, SCHEMA_VERSION_COMPACT)
+BITS_PER_BYTE = 8
+BITMAP_BYTE_ORDER = "little"
+SNAPSHOT_FIELD_KEYS = frozenset(
+    {
+        JSON_KEY_STATE_VERSION,
+        JSON_KEY_SEED_LETTERS,
+        JSON_KEY_WHEEL_LETTERS,
+        JSON_KEY_GRID_ROWS,
+        JSON_KEY_REVEALED,
+        JSON_KEY_WORDS,
+        JSON_KEY_SETTINGS,
+        JSON_KEY_SOLVED_BY,
+        JSON_KEY_SCHEMA_VERSION,
+        JSON_KEY_COLUMN_COUNT,
+        JSON_KEY_REVEALED_BITS,
+        JSON_KEY_WORD_TABLE_ID,
+        JSON_KEY_SOLVED,
+    }
+)
+WORD_TABLE_IDS = itertools.count(1)
+
+
+def cell_key(item: object) -> tuple[int, int] | None:
+    if not isinstance(item, dict):
+        return None
+    row_index = item.get(JSON_KEY_ROW)
+    col_index = item.get(JSON_KEY_COL)
+    if not isinstance(row_index, int) or not isinstance(col_index, int):
+        return None
+    return row_index, col_index
+
+
+def word_key(item: object) -> str | None:
+    if not isinstance(item, dict):
+        return None
+    word = item.get(JSON_KEY_WORD)
+    return word if isinstance(word, str) else None
+
+
+def build_cell_payload(row_index: int, col_index: int) -> dict:
+    return {JSON_KEY_ROW: row_index, JSON_KEY_COL: col_index}
+
+
+def build_word_payload(word: str, cells: tuple[tuple[int, int], ...]) -> dict:
+    return {
+        JSON_KEY_WORD: word,
+        JSON_KEY_POSITIONS: [build_cell_payload(row, col) for row, col in cells],
+    }
+
+
+def decode_bitmap(raw: object) -> bytes | None:
+    if isinstance(raw, bytes):
+        return raw
+    if not isinstance(raw, str):
+        return None
+    try:
+        return base64.b64decode(raw, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def expand_compact_payload(payload: dict, reference: "RoomSnapshot | None") -> dict | None:
+    grid_rows = payload.get(JSON_KEY_GRID_ROWS)
+    bitmap = decode_bitmap(payload.get(JSON_KEY_REVEALED_BITS, b""))
+    solved = payload.get(JSON_KEY_SOLVED, [])
+    if not isinstance(grid_rows, list) or bitmap is None or not isinstance(solved, list):
+        return None
+    words = payload.get(JSON_KEY_WORDS)
+    if words is None:
+        if reference is None or payload.get(JSON_KEY_WORD_TABLE_ID) != reference.word_table_id:
+            return None
+        table = reference.words
+        words = reference.word_table_payload()
+    elif isinstance(words, list):
+        table = tuple(word_key(item) for item in words)
+    else:
+        return None
+    solved_by: dict[str, str] = {}
+    for item in solved:
+        if not isinstance(item, list) or len(item) != 2:
+            return None
+        index, player_id = item
+        if not isinstance(index, int) or not 0 <= index < len(table) or table[index] is None:
+            return None
+        solved_by[table[index]] = player_id
+    column_count = max((len(row) for row in grid_rows if isinstance(row, str)), default=0)
+    bits = int.from_bytes(bitmap, BITMAP_BYTE_ORDER)
+    revealed: list[dict] = []
+    while bits and column_count:
+        lowest = bits & -bits
+        row_index, col_index = divmod(lowest.bit_length() - 1, column_count)
+        revealed.append(build_cell_payload(row_index, col_index))
+        bits ^= lowest
+    expanded = {
+        key: value for key, value in payload.items() if key not in SNAPSHOT_FIELD_KEYS
+    }
+    expanded[JSON_KEY_SEED_LETTERS] = payload.get(JSON_KEY_SEED_LETTERS)
+    expanded[JSON_KEY_GRID_ROWS] = grid_rows
+    expanded[JSON_KEY_REVEALED] = revealed
+    expanded[JSON_KEY_WORDS] = words
+    expanded[JSON_KEY_SOLVED_BY] = solved_by
+    if JSON_KEY_SETTINGS in payload:
+        expanded[JSON_KEY_SETTINGS] = payload[JSON_KEY_SETTINGS]
+    return expanded
+
+
+def parse_words(words: list) -> dict[str, tuple[tuple[int, int], ...]]:
+    index: dict[str, tuple[tuple[int, int], ...]] = {}
+    for item in words:
+        word = word_key(item)
+        if word is None:
+            continue
+        positions = item.get(JSON_KEY_POSITIONS)
+        if not isinstance(positions, list):
+            continue
+        cells = tuple(cell_key(position) for position in positions)
+        if None in cells:
+            continue
+        index[sys.intern(word)] = cells
+    return index
+
+
+class RoomSnapshot:
+    __slots__ = (
+        "state_version",
+        "seed_letters",
+        "grid_rows",
+        "column_count",
+        "revealed",
+        "words",
+        "word_cells",
+        "solved_by",
+        "settings",
+        "extra",
+        "word_table_id",
+        "_grid_payload",
+        "_words_payload",
+        "_payload",
+        "_compact_payload",
+        "_letter_mask",
+        "_summary",
+    )
+
+    def __init__(
+        self,
+        state_version: int,
+        seed_letters: str,
+        grid_rows: tuple[str, ...],
+        revealed: int,
+        word_cells: dict[str, tuple[tuple[int, int], ...]],
+        solved_by: dict[str, str],
+        settings: dict | None,
+        extra: dict,
+    ) -> None:
+        self.state_version = state_version
+        self.seed_letters = seed_letters
+        self.grid_rows = grid_rows
+        self.column_count = max((len(row) for row in grid_rows), default=0)
+        self.revealed = revealed
+        self.word_cells = word_cells
+        self.words = tuple(sorted(word_cells))
+        self.solved_by = solved_by
+        self.settings = settings
+        self.extra = extra
+        self.word_table_id = next(WORD_TABLE_IDS)
+        self._grid_payload: list[str] | None = None
+        self._words_payload: list[dict] | None = None
+        self._payload: dict | None = None
+        self._compact_payload: dict | None = None
+        self._letter_mask: int | None = None
+        self._summary: str | None = None
+
+    @classmethod
+    def parse(cls, payload: dict, state_version: int) -> "RoomSnapshot | None":
+        grid_rows = payload.get(JSON_KEY_GRID_ROWS)
+        if not isinstance(grid_rows, list) or not all(
+            isinstance(row, str) for row in grid_rows
+        ):
+            return None
+        revealed = payload.get(JSON_KEY_REVEALED, [])
+        words = payload.get(JSON_KEY_WORDS, [])
+        solved_by = payload.get(JSON_KEY_SOLVED_BY, {})
+        settings = payload.get(JSON_KEY_SETTINGS)
+        if not isinstance(revealed, list) or not isinstance(words, list):
+            return None
+        if not isinstance(solved_by, dict):
+            return None
+        seed_letters = payload.get(JSON_KEY_SEED_LETTERS)
+        snapshot = cls(
+            state_version=state_version,
+            seed_letters=seed_letters if isinstance(seed_letters, str) else "",
+            grid_rows=tuple(sys.intern(row) for row in grid_rows),
+            revealed=0,
+            word_cells=parse_words(words),
+            solved_by={
+                sys.intern(word): player_id
+                for word, player_id in solved_by.items()
+                if isinstance(player_id, str)
+            },
+            settings=settings if isinstance(settings, dict) else None,
+            extra={
+                key: value
+                for key, value in payload.items()
+                if key not in SNAPSHOT_FIELD_KEYS
+            },
+        )
+        bits = 0
+        for item in revealed:
+            cell = cell_key(item)
+            bit = snapshot.cell_bit(cell) if cell is not None else None
+            if bit is not None:
+                bits |= bit
+        snapshot.revealed = bits
+        return snapshot
+
+    def cell_bit(self, cell: tuple[int, int]) -> int | None:
+        row_index, col_index = cell
+        if row_index < 0 or row_index >= len(self.grid_rows):
+            return None
+        if col_index < 0 or col_index >= len(self.grid_rows[row_index]):
+            return None
+        return 1 << (row_index * self.column_count + col_index)
+
+    def is_letter_cell(self, cell: tuple[int, int]) -> bool:
+        if self.cell_bit(cell) is None:
+            return False
+        row_index, col_index = cell
+        return self.grid_rows[row_index][col_index] != CROSSWORD_EMPTY_CELL
+
+    def is_revealed(self, cell: tuple[int, int]) -> bool:
+        bit = self.cell_bit(cell)
+        return bit is not None and bool(self.revealed & bit)
+
+    def revealed_cells(self, bits: int | None = None) -> list[tuple[int, int]]:
+        remaining = self.revealed if bits is None else bits
+        cells: list[tuple[int, int]] = []
+        while remaining:
+            lowest = remaining & -remaining
+            cells.append(divmod(lowest.bit_length() - 1, self.column_count))
+            remaining ^= lowest
+        return cells
+
+    def letter_mask(self) -> int:
+        if self._letter_mask is None:
+            mask = 0
+            for row_index, row in enumerate(self.grid_rows):
+                for col_index, char in enumerate(row):
+                    if char != CROSSWORD_EMPTY_CELL:
+                        mask |= 1 << (row_index * self.column_count + col_index)
+            self._letter_mask = mask
+        return self._letter_mask
+
+    def revealed_count(self) -> int:
+        return self.revealed.bit_count()
+
+    def stamp(self, state_version: int) -> None:
+        self.state_version = state_version
+        self._payload = None
+        self._compact_payload = None
+        self._summary = None
+
+    def share_words(self, previous: "RoomSnapshot") -> None:
+        if previous.word_cells is self.word_cells or previous.word_cells != self.word_cells:
+            return
+        self.word_cells = previous.word_cells
+        self.words = previous.words
+        self.word_table_id = previous.word_table_id
+        self._words_payload = previous._words_payload
+        self._payload = None
+        self._compact_payload = None
+
+    def derive(
+        self, state_version: int, revealed: int, solved_by: dict[str, str]
+    ) -> "RoomSnapshot":
+        snapshot = RoomSnapshot.__new__(RoomSnapshot)
+        snapshot.state_version = state_version
+        snapshot.seed_letters = self.seed_letters
+        snapshot.grid_rows = self.grid_rows
+        snapshot.column_count = self.column_count
+        snapshot.revealed = revealed
+        snapshot.word_cells = self.word_cells
+        snapshot.words = self.words
+        snapshot.solved_by = solved_by
+        snapshot.settings = self.settings
+        snapshot.extra = self.extra
+        snapshot.word_table_id = self.word_table_id
+        snapshot._grid_payload = self._grid_payload
+        snapshot._words_payload = self._words_payload
+        snapshot._payload = None
+        snapshot._compact_payload = None
+        snapshot._letter_mask = self._letter_mask
+        snapshot._summary = None
+        return snapshot
+
+    def delta_from(self, previous: "RoomSnapshot") -> dict | None:
+        if (
+            previous.grid_rows != self.grid_rows
+            or previous.seed_letters != self.seed_letters
+            or previous.extra != self.extra
+        ):
+            return None
+        if previous.revealed & ~self.revealed:
+            return None
+        new_words: list[dict] = []
+        if previous.word_cells is not self.word_cells:
+            for word, cells in previous.word_cells.items():
+                if self.word_cells.get(word) != cells:
+                    return None
+            for word in self.words:
+                if word not in previous.word_cells:
+                    new_words.append(build_word_payload(word, self.word_cells[word]))
+        solved_by: dict[str, str] = {}
+        if previous.solved_by is not self.solved_by:
+            if any(word not in self.solved_by for word in previous.solved_by):
+                return None
+            for word, player_id in self.solved_by.items():
+                if previous.solved_by.get(word) != player_id:
+                    solved_by[word] = player_id
+
+        delta: dict = {}
+        new_bits = self.revealed & ~previous.revealed
+        if new_bits:
+            delta[JSON_KEY_REVEALED] = [
+                build_cell_payload(row, col) for row, col in self.revealed_cells(new_bits)
+            ]
+        if new_words:
+            delta[JSON_KEY_WORDS] = new_words
+        if solved_by:
+            delta[JSON_KEY_SOLVED_BY] = solved_by
+        if previous.settings != self.settings:
+            delta[JSON_KEY_SETTINGS] = self.settings
+        return delta
+
+    def grid_payload(self) -> list[str]:
+        if self._grid_payload is None:
+            self._grid_payload = list(self.grid_rows)
+        return self._grid_payload
+
+    def word_table_payload(self) -> list[dict]:
+        if self._words_payload is None:
+            self._words_payload = [
+                build_word_payload(word, self.word_cells[word]) for word in self.words
+            ]
+        return self._words_payload
+
+    def revealed_bitmap(self) -> bytes:
+        cell_count = len(self.grid_rows) * self.column_count
+        return self.revealed.to_bytes(
+            (cell_count + BITS_PER_BYTE - 1) // BITS_PER_BYTE, BITMAP_BYTE_ORDER
+        )
+
+    def to_compact_payload(self) -> dict:
+        if self._compact_payload is not None:
+            return self._compact_payload
+        word_indexes = {word: index for index, word in enumerate(self.words)}
+        payload = dict(self.extra)
+        payload[JSON_KEY_SCHEMA_VERSION] = SCHEMA_VERSION_COMPACT
+        payload[JSON_KEY_STATE_VERSION] = self.state_version
+        payload[JSON_KEY_SEED_LETTERS] = self.seed_letters
+        payload[JSON_KEY_GRID_ROWS] = self.grid_payload()
+        payload[JSON_KEY_COLUMN_COUNT] = self.column_count
+        payload[JSON_KEY_REVEALED_BITS] = self.revealed_bitmap()
+        payload[JSON_KEY_WORD_TABLE_ID] = self.word_table_id
+        payload[JSON_KEY_SOLVED] = [
+            [word_indexes[word], player_id]
+            for word, player_id in self.solved_by.items()
+            if word in word_indexes
+        ]
+        if self.settings is not None:
+            payload[JSON_KEY_SETTINGS] = self.settings
+        self._compact_payload = payload
+        return payload
+
+    def to_payload(self) -> dict:
+        if self._payload is not None:
+            return self._payload
+        payload = dict(self.extra)
+        payload[JSON_KEY_STATE_VERSION] = self.state_version
+        payload[JSON_KEY_SEED_LETTERS] = self.seed_letters
+        payload[JSON_KEY_GRID_ROWS] = self.grid_payload()
+        payload[JSON_KEY_REVEALED] = [
+            build_cell_payload(row, col) for row, col in self.revealed_cells()
+        ]
+        payload[JSON_KEY_WORDS] = self.word_table_payload()
+        payload[JSON_KEY_SOLVED_BY] = self.solved_by
+        if self.settings is not None:
+            payload[JSON_KEY_SETTINGS] = self.settings
+        self._payload = payload
+        return payload
+
+    def summary(self) -> str:
+        if self._summary is None:
+            self._summary = (
+                "stateVersion=%s seedLen=%s grid=%sx%s words=%s revealed=%s settings=%s"
+                % (
+                    self.state_version,
+                    len(self.seed_letters),
+                    len(self.grid_rows),
+                    len(self.grid_rows[0]) if self.grid_rows else None,
+                    len(self.words),
+                    self.revealed_count(),
+                    "yes" if self.settings is not None else "no",
+                )
+            )
+        return self._summary
+
+    def grid_rows_for_log(self) -> list[str]:
+        if not self.grid_rows:
+            return []
+        rows = [list(row) for row in self.grid_rows]
+        for row_index, col_index in self.revealed_cells():
+            char = rows[row_index][col_index]
+            if char != CROSSWORD_EMPTY_CELL:
+                rows[row_index][col_index] = char.upper()
+        return ["".join(row) for row in rows]
@@ -0,0 +1,93 @@
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from app.snapshot import RoomSnapshot
+
+REJECTION_INVALID_WORD = "invalid_word"
+REJECTION_UNKNOWN_WORD = "unknown_word"
+REJECTION_INVALID_CELL = "invalid_cell"
+SEED_COUNTS_CACHE_SIZE = 256
+
+
+def letter_signature(word: str) -> str:
+    return "".join(sorted(word))
+
+
+@lru_cache(maxsize=SEED_COUNTS_CACHE_SIZE)
+def letter_counts(letters: str) -> Counter:
+    return Counter(letters)
+
+
+def load_word_file(path: Path) -> list[str]:
+    with path.open("r", encoding="utf-8") as input_file:
+        return [line.strip().upper() for line in input_file if line.strip()]
+
+
+class WordIndex:
+    def __init__(self, words: list[str], forbidden: set[str]) -> None:
+        groups: dict[str, set[str]] = {}
+        for word in words:
+            if word in forbidden or not word.isalpha():
+                continue
+            groups.setdefault(letter_signature(word), set()).add(word)
+        self._anagrams: dict[str, frozenset[str]] = {
+            signature: frozenset(group) for signature, group in groups.items()
+        }
+        self.word_count = sum(len(group) for group in groups.values())
+
+    @classmethod
+    def load(cls, dictionary_path: Path, forbidden_path: Path) -> "WordIndex":
+        forbidden = set(load_word_file(forbidden_path)) if forbidden_path.is_file() else set()
+        return cls(load_word_file(dictionary_path), forbidden)
+
+    def contains(self, word: str) -> bool:
+        return word in self._anagrams.get(letter_signature(word), ())
+
+    def can_build(self, word: str, seed_letters: str) -> bool:
+        if len(word) > len(seed_letters):
+            return False
+        available = letter_counts(seed_letters)
+        return all(available[char] >= count for char, count in Counter(word).items())
+
+    def is_playable(self, word: str, seed_letters: str) -> bool:
+        normalized = word.upper()
+        return self.contains(normalized) and self.can_build(normalized, seed_letters.upper())
+
+
+def spells_word(snapshot: RoomSnapshot, word: str, cells: tuple[tuple[int, int], ...]) -> bool:
+    if len(cells) != len(word):
+        return False
+    for char, (row_index, col_index) in zip(word.upper(), cells):
+        if not snapshot.is_letter_cell((row_index, col_index)):
+            return False
+        if snapshot.grid_rows[row_index][col_index].upper() != char:
+            return False
+    return True
+
+
+def find_snapshot_rejection(
+    snapshot: RoomSnapshot, previous: RoomSnapshot | None, index: WordIndex | None
+) -> tuple[str, str] | None:
+    if snapshot.revealed & ~snapshot.letter_mask():
+        return REJECTION_INVALID_CELL, ""
+    for word in snapshot.solved_by:
+        if word not in snapshot.word_cells:
+            return REJECTION_UNKNOWN_WORD, word
+    if index is None:
+        return None
+    same_layout = (
+        previous is not None
+        and previous.seed_letters == snapshot.seed_letters
+        and previous.grid_rows == snapshot.grid_rows
+    )
+    if same_layout and previous.word_cells is snapshot.word_cells:
+        return None
+    for word, cells in snapshot.word_cells.items():
+        if same_layout and previous.word_cells.get(word) == cells:
+            continue
+        if not index.is_playable(word, snapshot.seed_letters) or not spells_word(
+            snapshot, word, cells
+        ):
+            return REJECTION_INVALID_WORD, word
+    return None
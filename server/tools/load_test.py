@@ -0,0 +1,695 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+SERVER_DIR = SCRIPT_DIR.parent
+PROJECT_ROOT = SERVER_DIR.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+from app.codec import CODEC_JSON, CODEC_MSGPACK, decode_frame, encode_frame  # noqa: E402
+
+DEFAULT_VERSION_PATH = PROJECT_ROOT / "version.txt"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9999
+DEFAULT_ROOMS = 10
+DEFAULT_PLAYERS = 4
+DEFAULT_RAMP_SECONDS = 5.0
+DEFAULT_DURATION_SECONDS = 30.0
+DEFAULT_THINK_MS = 50
+DEFAULT_GRID_SIZE = 8
+DEFAULT_REVEAL_RATIO = 0.5
+DEFAULT_SEED = 1
+SERVER_START_TIMEOUT_SECONDS = 15.0
+SERVER_START_POLL_SECONDS = 0.1
+REPLY_TIMEOUT_SECONDS = 10.0
+VERSION_DEBUG_SUFFIX = "-debug"
+PERCENTILES = (50, 95, 99)
+MS_PER_SECOND = 1000.0
+PLAYER_COLORS = ("red", "blue", "green", "orange", "purple", "teal")
+
+MESSAGE_TYPE_JOIN = "join"
+MESSAGE_TYPE_SNAPSHOT = "snapshot"
+MESSAGE_TYPE_STATE_UPDATE = "stateUpdate"
+MESSAGE_TYPE_STATE_DELTA = "stateDelta"
+MESSAGE_TYPE_NEW_GAME = "newGame"
+MESSAGE_TYPE_SUBMIT_WORD = "submitWord"
+MESSAGE_TYPE_REVEAL_CELL = "revealCell"
+MESSAGE_TYPE_ERROR = "error"
+MESSAGE_ERROR_CONFLICT = "conflict"
+JSON_DELTA_KEY = "delta"
+JSON_SNAPSHOT_KEY = "snapshot"
+ROLE_HOST = "host"
+SYNC_MODES = ("snapshot", "delta")
+WIRE_CODECS = (CODEC_JSON, CODEC_MSGPACK)
+
+
+@dataclass
+class LoadStats:
+    recording: bool = False
+    connected: int = 0
+    join_failures: int = 0
+    disconnects: int = 0
+    games: int = 0
+    submits: int = 0
+    applied: int = 0
+    conflicts: int = 0
+    rejected: int = 0
+    timeouts: int = 0
+    messages_received: int = 0
+    bytes_received: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class PendingMove:
+    action: str
+    cell: tuple[int, int] | None
+    word: str | None
+    sent_at: float
+
+
+class PlayerState:
+    def __init__(self) -> None:
+        self.state_version: int | None = None
+        self.game_id: str | None = None
+        self.snapshot: dict | None = None
+        self.revealed: set[tuple[int, int]] = set()
+        self.solved_by: dict[str, str] = {}
+        self.changed = asyncio.Event()
+
+    def apply_snapshot(self, snapshot: dict | None, game_id: str | None) -> None:
+        self.snapshot = snapshot
+        self.game_id = game_id
+        if snapshot is None:
+            self.state_version = None
+            self.revealed = set()
+            self.solved_by = {}
+        else:
+            self.state_version = snapshot.get("stateVersion")
+            self.revealed = {
+                (item["row"], item["col"]) for item in snapshot.get("revealed", [])
+            }
+            self.solved_by = dict(snapshot.get("solvedBy", {}))
+        self.changed.set()
+
+    def apply_delta(self, message: dict) -> None:
+        if self.snapshot is None or message.get("fromVersion") != self.state_version:
+            return
+        delta = message.get("delta") or {}
+        self.revealed.update(
+            (item["row"], item["col"]) for item in delta.get("revealed", [])
+        )
+        self.solved_by.update(delta.get("solvedBy", {}))
+        self.state_version = message.get("toVersion")
+        if message.get("gameId"):
+            self.game_id = message["gameId"]
+        self.changed.set()
+
+    def build_snapshot(self) -> dict:
+        assert self.snapshot is not None
+        snapshot = dict(self.snapshot)
+        snapshot["stateVersion"] = self.state_version
+        snapshot["revealed"] = [
+            {"row": row, "col": col} for row, col in sorted(self.revealed)
+        ]
+        snapshot["solvedBy"] = dict(self.solved_by)
+        return snapshot
+
+    def is_complete(self) -> bool:
+        if self.snapshot is None:
+            return False
+        return len(self.solved_by) >= len(self.snapshot.get("words", []))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Simulate rooms x players against the words WebSocket server and "
+            "print a JSON report with throughput, latency, conflicts and server CPU."
+        )
+    )
+    parser.add_argument(
+        "--url",
+        default=None,
+        help=f"WebSocket URL (default: ws://{DEFAULT_HOST}:<port>/ws).",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Server port used for --url and --start-server (default: {DEFAULT_PORT}).",
+    )
+    parser.add_argument(
+        "--start-server",
+        action="store_true",
+        help="Start 'python -m app.main' from the server folder for the run.",
+    )
+    parser.add_argument(
+        "--server-pid",
+        type=int,
+        default=None,
+        help="PID of an already running server to sample CPU from.",
+    )
+    parser.add_argument(
+        "--rooms",
+        type=int,
+        default=DEFAULT_ROOMS,
+        help=f"Number of rooms (default: {DEFAULT_ROOMS}).",
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        default=DEFAULT_PLAYERS,
+        help=f"Players per room, host included (default: {DEFAULT_PLAYERS}).",
+    )
+    parser.add_argument(
+        "--ramp",
+        type=float,
+        default=DEFAULT_RAMP_SECONDS,
+        help=f"Seconds over which rooms are opened (default: {DEFAULT_RAMP_SECONDS}).",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=DEFAULT_DURATION_SECONDS,
+        help=(
+            "Measured seconds after the ramp "
+            f"(default: {DEFAULT_DURATION_SECONDS})."
+        ),
+    )
+    parser.add_argument(
+        "--think-ms",
+        type=int,
+        default=DEFAULT_THINK_MS,
+        help=f"Pause between moves of one player (default: {DEFAULT_THINK_MS}).",
+    )
+    parser.add_argument(
+        "--grid-size",
+        type=int,
+        default=DEFAULT_GRID_SIZE,
+        help=f"Rows and word length of generated puzzles (default: {DEFAULT_GRID_SIZE}).",
+    )
+    parser.add_argument(
+        "--reveal-ratio",
+        type=float,
+        default=DEFAULT_REVEAL_RATIO,
+        help=(
+            "Share of moves that are revealCell instead of submitWord "
+            f"(default: {DEFAULT_REVEAL_RATIO})."
+        ),
+    )
+    parser.add_argument(
+        "--sync-mode",
+        choices=SYNC_MODES,
+        default=SYNC_MODES[0],
+        help="syncMode sent on join (default: snapshot).",
+    )
+    parser.add_argument(
+        "--codec",
+        choices=WIRE_CODECS,
+        default=CODEC_JSON,
+        help="codec requested on join (default: json; msgpack needs the msgpack package).",
+    )
+    parser.add_argument(
+        "--operations",
+        action="store_true",
+        help="Send typed operations instead of full snapshots with baseVersion.",
+    )
+    parser.add_argument(
+        "--client-version",
+        default=None,
+        help=f"clientVersion sent on join (default: read from {DEFAULT_VERSION_PATH}).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=DEFAULT_SEED,
+        help=f"Random seed (default: {DEFAULT_SEED}).",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="Write the JSON report to this path instead of stdout.",
+    )
+    return parser.parse_args()
+
+
+def read_client_version(path: Path) -> str:
+    try:
+        raw = path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+    if raw.endswith(VERSION_DEBUG_SUFFIX):
+        return raw[: -len(VERSION_DEBUG_SUFFIX)]
+    return raw
+
+
+def build_puzzle(rng: random.Random, size: int) -> dict:
+    rows = ["".join(rng.choice(string.ascii_lowercase) for _ in range(size)) for _ in range(size)]
+    words = [
+        {
+            "word": f"{row}{row_index}",
+            "positions": [{"row": row_index, "col": col} for col in range(size)],
+        }
+        for row_index, row in enumerate(rows)
+    ]
+    return {
+        "seedLetters": "".join(sorted(set("".join(rows)))),
+        "gridRows": rows,
+        "revealed": [],
+        "words": words,
+        "solvedBy": {},
+        "settings": {"loadTest": True},
+    }
+
+
+def decode_message(raw: str | bytes) -> dict:
+    return decode_frame(raw) if isinstance(raw, bytes) else json.loads(raw)
+
+
+def percentile(sorted_values: list[float], percent: int) -> float | None:
+    if not sorted_values:
+        return None
+    index = round(percent / 100 * (len(sorted_values) - 1))
+    return round(sorted_values[index], 3)
+
+
+def read_process_cpu_seconds(pid: int | None) -> float | None:
+    if pid is None:
+        return None
+    try:
+        raw = Path(f"/proc/{pid}/stat").read_text(encoding="utf-8")
+    except OSError:
+        return None
+    fields = raw.rsplit(")", 1)[1].split()
+    user_ticks, system_ticks = int(fields[11]), int(fields[12])
+    return (user_ticks + system_ticks) / os.sysconf("SC_CLK_TCK")
+
+
+def start_server(port: int, env_defaults: dict[str, str] | None = None) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["PORT"] = str(port)
+    for name, value in (env_defaults or {}).items():
+        env.setdefault(name, value)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("WORD_VALIDATION", "0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.main"],
+        cwd=SERVER_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_for_server(url: str, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            async with websockets.connect(url):
+                return
+        except OSError:
+            await asyncio.sleep(SERVER_START_POLL_SECONDS)
+    raise RuntimeError(f"Server did not accept connections within {SERVER_START_TIMEOUT_SECONDS}s")
+
+
+class LoadPlayer:
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        url: str,
+        room_id: str,
+        index: int,
+        stats: LoadStats,
+        rng: random.Random,
+        stop: asyncio.Event,
+    ) -> None:
+        self.args = args
+        self.url = url
+        self.room_id = room_id
+        self.player_id = f"{room_id}-p{index}"
+        self.color = PLAYER_COLORS[index % len(PLAYER_COLORS)]
+        self.stats = stats
+        self.rng = rng
+        self.stop = stop
+        self.state = PlayerState()
+        self.role: str | None = None
+        self.codec = CODEC_JSON
+        self.pending: PendingMove | None = None
+        self.settled = asyncio.Event()
+        self.websocket = None
+
+    async def run(self) -> None:
+        try:
+            async with websockets.connect(self.url, max_size=None) as websocket:
+                self.websocket = websocket
+                if not await self.join():
+                    self.stats.join_failures += 1
+                    return
+                self.stats.connected += 1
+                reader = asyncio.create_task(self.read_messages())
+                try:
+                    await self.play()
+                finally:
+                    reader.cancel()
+                    await asyncio.gather(reader, return_exceptions=True)
+        except (OSError, websockets.ConnectionClosed):
+            self.stats.disconnects += 1
+
+    async def join(self) -> bool:
+        await self.send(
+            {
+                "type": MESSAGE_TYPE_JOIN,
+                "playerId": self.player_id,
+                "playerName": self.player_id,
+                "playerColor": self.color,
+                "clientVersion": self.args.client_version,
+                "roomId": self.room_id,
+                "syncMode": self.args.sync_mode,
+                "codec": self.args.codec,
+            }
+        )
+        reply = decode_message(
+            await asyncio.wait_for(self.websocket.recv(), REPLY_TIMEOUT_SECONDS)
+        )
+        if reply.get("type") != MESSAGE_TYPE_SNAPSHOT:
+            self.count_error(reply.get("message") or reply.get("type"))
+            return False
+        self.role = reply.get("role")
+        self.codec = reply.get("codec") or CODEC_JSON
+        self.state.apply_snapshot(reply.get("snapshot"), reply.get("gameId"))
+        return True
+
+    async def send(self, message: dict) -> None:
+        await self.websocket.send(encode_frame(message, self.codec))
+
+    async def read_messages(self) -> None:
+        async for raw in self.websocket:
+            if self.stats.recording:
+                self.stats.messages_received += 1
+                self.stats.bytes_received += len(raw)
+            message = decode_message(raw)
+            message_type = message.get("type")
+            if message_type in (MESSAGE_TYPE_STATE_UPDATE, MESSAGE_TYPE_SNAPSHOT):
+                self.state.apply_snapshot(message.get("snapshot"), message.get("gameId"))
+                self.check_pending()
+            elif message_type == MESSAGE_TYPE_STATE_DELTA:
+                self.state.apply_delta(message)
+                self.check_pending()
+            elif message_type == MESSAGE_TYPE_ERROR:
+                self.handle_error(message)
+
+    def handle_error(self, message: dict) -> None:
+        reason = message.get("message")
+        if reason == MESSAGE_ERROR_CONFLICT:
+            if JSON_DELTA_KEY in message:
+                self.state.apply_delta(message)
+            elif JSON_SNAPSHOT_KEY in message:
+                self.state.apply_snapshot(message.get(JSON_SNAPSHOT_KEY), self.state.game_id)
+            if self.pending is not None and self.stats.recording:
+                self.stats.conflicts += 1
+        elif self.stats.recording:
+            self.count_error(reason)
+            if self.pending is not None:
+                self.stats.rejected += 1
+        self.settle()
+
+    def count_error(self, reason: str | None) -> None:
+        key = reason or "unknown"
+        self.stats.errors[key] = self.stats.errors.get(key, 0) + 1
+
+    def check_pending(self) -> None:
+        pending = self.pending
+        if pending is None:
+            return
+        if pending.cell is not None:
+            matched = pending.cell in self.state.revealed
+        else:
+            matched = self.state.solved_by.get(pending.word) == self.player_id
+        if not matched:
+            return
+        if self.stats.recording:
+            self.stats.applied += 1
+            self.stats.latencies_ms.append(
+                (time.perf_counter() - pending.sent_at) * MS_PER_SECOND
+            )
+        self.settle()
+
+    def settle(self) -> None:
+        self.pending = None
+        self.settled.set()
+
+    async def play(self) -> None:
+        think_seconds = self.args.think_ms / MS_PER_SECOND
+        while not self.stop.is_set():
+            if self.role == ROLE_HOST and (
+                self.state.snapshot is None or self.state.is_complete()
+            ):
+                await self.start_game()
+            message = self.next_move()
+            if message is None:
+                self.state.changed.clear()
+                await self.wait_or_stop(self.state.changed.wait())
+                continue
+            self.settled.clear()
+            await self.send(message)
+            if self.stats.recording:
+                self.stats.submits += 1
+            try:
+                await asyncio.wait_for(self.settled.wait(), REPLY_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.pending = None
+                if self.stats.recording:
+                    self.stats.timeouts += 1
+            if think_seconds > 0:
+                await self.wait_or_stop(asyncio.sleep(think_seconds))
+
+    async def wait_or_stop(self, awaitable) -> None:
+        stop_task = asyncio.create_task(self.stop.wait())
+        wait_task = asyncio.ensure_future(awaitable)
+        await asyncio.wait((stop_task, wait_task), return_when=asyncio.FIRST_COMPLETED)
+        for task in (stop_task, wait_task):
+            task.cancel()
+
+    async def start_game(self) -> None:
+        game_id = self.state.game_id
+        self.state.changed.clear()
+        await self.send(
+            {
+                "type": MESSAGE_TYPE_NEW_GAME,
+                "snapshot": build_puzzle(self.rng, self.args.grid_size),
+            }
+        )
+        while self.state.game_id == game_id and not self.stop.is_set():
+            self.state.changed.clear()
+            await self.wait_or_stop(self.state.changed.wait())
+        if self.stats.recording:
+            self.stats.games += 1
+
+    def next_move(self) -> dict | None:
+        state = self.state
+        if state.snapshot is None or state.state_version is None:
+            return None
+        words = state.snapshot.get("words", [])
+        open_cells = [
+            (position["row"], position["col"])
+            for item in words
+            for position in item["positions"]
+            if (position["row"], position["col"]) not in state.revealed
+        ]
+        open_words = [item["word"] for item in words if item["word"] not in state.solved_by]
+        if not open_words:
+            return None
+        reveal = open_cells and self.rng.random() < self.args.reveal_ratio
+        if reveal:
+            cell = self.rng.choice(open_cells)
+            self.pending = PendingMove(MESSAGE_TYPE_REVEAL_CELL, cell, None, 0.0)
+        else:
+            word = self.rng.choice(open_words)
+            self.pending = PendingMove(MESSAGE_TYPE_SUBMIT_WORD, None, word, 0.0)
+        message = self.build_move_message(self.pending)
+        self.pending.sent_at = time.perf_counter()
+        return message
+
+    def build_move_message(self, move: PendingMove) -> dict:
+        state = self.state
+        message: dict = {"type": move.action, "gameId": state.game_id}
+        if self.args.operations:
+            if move.cell is not None:
+                message["operation"] = {"row": move.cell[0], "col": move.cell[1]}
+            else:
+                message["operation"] = {"word": move.word}
+            return message
+        snapshot = state.build_snapshot()
+        if move.cell is not None:
+            snapshot["revealed"].append({"row": move.cell[0], "col": move.cell[1]})
+        else:
+            snapshot["solvedBy"][move.word] = self.player_id
+            word_item = next(item for item in snapshot["words"] if item["word"] == move.word)
+            known = {(item["row"], item["col"]) for item in snapshot["revealed"]}
+            snapshot["revealed"].extend(
+                position
+                for position in word_item["positions"]
+                if (position["row"], position["col"]) not in known
+            )
+        message["baseVersion"] = state.state_version
+        message["snapshot"] = snapshot
+        return message
+
+
+async def run_room(
+    args: argparse.Namespace,
+    url: str,
+    room_index: int,
+    run_id: str,
+    stats: LoadStats,
+    stop: asyncio.Event,
+) -> None:
+    room_id = f"load-{run_id}-{room_index}"
+    rng = random.Random(args.seed * 1_000_003 + room_index)
+    players = [
+        LoadPlayer(args, url, room_id, index, stats, random.Random(rng.random()), stop)
+        for index in range(args.players)
+    ]
+    host_task = asyncio.create_task(players[0].run())
+    while players[0].role is None and not host_task.done():
+        await asyncio.sleep(SERVER_START_POLL_SECONDS)
+    await asyncio.gather(host_task, *(player.run() for player in players[1:]))
+
+
+async def run_load(args: argparse.Namespace) -> dict:
+    url = args.url or f"ws://{DEFAULT_HOST}:{args.port}/ws"
+    process = None
+    server_pid = args.server_pid
+    if args.start_server:
+        process = start_server(args.port)
+        server_pid = process.pid
+        await wait_for_server(url, process)
+    stats = LoadStats()
+    stop = asyncio.Event()
+    run_id = uuid.uuid4().hex[:8]
+    try:
+        ramp_step = args.ramp / args.rooms if args.rooms else 0
+        room_tasks = []
+        for room_index in range(args.rooms):
+            room_tasks.append(
+                asyncio.create_task(run_room(args, url, room_index, run_id, stats, stop))
+            )
+            if ramp_step > 0:
+                await asyncio.sleep(ramp_step)
+
+        stats.recording = True
+        cpu_start = read_process_cpu_seconds(server_pid)
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        elapsed = time.perf_counter() - started
+        cpu_end = read_process_cpu_seconds(server_pid)
+        stats.recording = False
+        stop.set()
+        await asyncio.gather(*room_tasks, return_exceptions=True)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    return build_report(args, url, stats, elapsed, cpu_start, cpu_end)
+
+
+def build_report(
+    args: argparse.Namespace,
+    url: str,
+    stats: LoadStats,
+    elapsed: float,
+    cpu_start: float | None,
+    cpu_end: float | None,
+) -> dict:
+    latencies = sorted(stats.latencies_ms)
+    cpu_seconds = None
+    cpu_percent = None
+    if cpu_start is not None and cpu_end is not None:
+        cpu_seconds = round(cpu_end - cpu_start, 3)
+        cpu_percent = round(cpu_seconds / elapsed * 100, 1) if elapsed > 0 else None
+    return {
+        "config": {
+            "url": url,
+            "rooms": args.rooms,
+            "playersPerRoom": args.players,
+            "rampSeconds": args.ramp,
+            "durationSeconds": args.duration,
+            "thinkMs": args.think_ms,
+            "gridSize": args.grid_size,
+            "revealRatio": args.reveal_ratio,
+            "syncMode": args.sync_mode,
+            "codec": args.codec,
+            "operations": args.operations,
+            "seed": args.seed,
+        },
+        "elapsedSeconds": round(elapsed, 3),
+        "connected": stats.connected,
+        "joinFailures": stats.join_failures,
+        "disconnects": stats.disconnects,
+        "games": stats.games,
+        "submits": stats.submits,
+        "applied": stats.applied,
+        "conflicts": stats.conflicts,
+        "rejected": stats.rejected,
+        "timeouts": stats.timeouts,
+        "conflictRate": round(stats.conflicts / stats.submits, 4) if stats.submits else None,
+        "throughputPerSecond": round(stats.applied / elapsed, 1) if elapsed > 0 else None,
+        "messagesReceived": stats.messages_received,
+        "bytesReceived": stats.bytes_received,
+        "latencyMs": {
+            "count": len(latencies),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            **{f"p{percent}": percentile(latencies, percent) for percent in PERCENTILES},
+            "max": round(latencies[-1], 3) if latencies else None,
+        },
+        "errors": dict(sorted(stats.errors.items())),
+        "serverCpu": {"seconds": cpu_seconds, "percent": cpu_percent},
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    if websockets is None:
+        raise SystemExit("The 'websockets' package is required: pip install websockets")
+    if args.rooms < 1 or args.players < 1:
+        raise SystemExit("--rooms and --players must be at least 1")
+    if args.client_version is None:
+        args.client_version = read_client_version(DEFAULT_VERSION_PATH)
+    report = asyncio.run(run_load(args))
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+        return
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(output + "\n", encoding="utf-8")
+    print(f"Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+SERVER_DIR = SCRIPT_DIR.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+from app.codec import CODEC_MSGPACK, encode_frame  # noqa: E402
+from app.recorder import FRAME_BINARY, FRAME_CLOSE, CapturedFrame, read_capture  # noqa: E402
+from load_test import (  # noqa: E402
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DEFAULT_VERSION_PATH,
+    MESSAGE_TYPE_ERROR,
+    MESSAGE_TYPE_JOIN,
+    MESSAGE_TYPE_NEW_GAME,
+    MESSAGE_TYPE_REVEAL_CELL,
+    MESSAGE_TYPE_SNAPSHOT,
+    MESSAGE_TYPE_STATE_DELTA,
+    MESSAGE_TYPE_STATE_UPDATE,
+    MESSAGE_TYPE_SUBMIT_WORD,
+    MS_PER_SECOND,
+    PERCENTILES,
+    REPLY_TIMEOUT_SECONDS,
+    decode_message,
+    percentile,
+    read_client_version,
+    read_process_cpu_seconds,
+    start_server,
+    wait_for_server,
+    websockets,
+)
+
+DEFAULT_SPEED = 1.0
+DEFAULT_TAIL_SECONDS = 2.0
+DEFAULT_MAX_GAP_SECONDS = 0.0
+JSON_KEY_TYPE = "type"
+JSON_KEY_ROOM_ID = "roomId"
+JSON_KEY_CLIENT_VERSION = "clientVersion"
+JSON_KEY_GAME_ID = "gameId"
+JSON_KEY_MESSAGE = "message"
+JSON_KEY_SNAPSHOT = "snapshot"
+JSON_KEY_STATE_VERSION = "stateVersion"
+JSON_KEY_BASE_VERSION = "baseVersion"
+JSON_KEY_BASE_VERSION_ALT = "base_version"
+JSON_KEY_TO_VERSION = "toVersion"
+MESSAGE_TYPE_RESYNC = "resync"
+MOVE_MESSAGE_TYPES = (MESSAGE_TYPE_NEW_GAME, MESSAGE_TYPE_SUBMIT_WORD, MESSAGE_TYPE_REVEAL_CELL)
+SNAPSHOT_REQUEST_TYPES = (MESSAGE_TYPE_JOIN, MESSAGE_TYPE_RESYNC)
+STATE_MESSAGE_TYPES = (MESSAGE_TYPE_STATE_UPDATE, MESSAGE_TYPE_STATE_DELTA)
+REQUEST_MESSAGE_TYPES = MOVE_MESSAGE_TYPES + SNAPSHOT_REQUEST_TYPES
+SERVER_ENV_DEFAULTS = {"SESSION_RATE_PER_SECOND": "0", "ROOM_RATE_PER_SECOND": "0"}
+DELTA_LATENCY_KEYS = ("mean", "p50", "p95", "p99")
+DELTA_CPU_KEYS = ("seconds", "percent")
+
+
+@dataclass
+class ReplayFrame:
+    offset_seconds: float
+    kind: int
+    session_id: str
+    room_id: str
+    message_type: str | None
+    frame: str | bytes
+    payload: dict | None = None
+    expected_version: int | None = None
+
+    def encode(self, game_id: str | None) -> str | bytes:
+        if self.payload is None or not game_id or self.payload[JSON_KEY_GAME_ID] == game_id:
+            return self.frame
+        return encode_payload(self.kind, {**self.payload, JSON_KEY_GAME_ID: game_id})
+
+
+@dataclass
+class PendingReply:
+    sent_at: float
+    message_type: str
+    expected_version: int | None
+    game_id: str | None = None
+
+
+@dataclass
+class ReplayStats:
+    sessions: int = 0
+    connect_failures: int = 0
+    disconnects: int = 0
+    frames_sent: int = 0
+    frames_skipped: int = 0
+    unanswered: int = 0
+    messages_received: int = 0
+    bytes_received: int = 0
+    latencies_ms: dict[str, list[float]] = field(default_factory=dict)
+    schedule_lag_ms: list[float] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=dict)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Replay frames captured with RECORD_DIR against a words WebSocket server and "
+            "print a JSON report with reply latency, errors and server CPU."
+        )
+    )
+    parser.add_argument(
+        "captures",
+        type=Path,
+        nargs="+",
+        help="Capture files to replay; frames from several files are merged by time.",
+    )
+    parser.add_argument(
+        "--url",
+        default=None,
+        help=f"WebSocket URL (default: ws://{DEFAULT_HOST}:<port>/ws).",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Server port used for --url and --start-server (default: {DEFAULT_PORT}).",
+    )
+    parser.add_argument(
+        "--start-server",
+        action="store_true",
+        help="Start 'python -m app.main' from the server folder for the run.",
+    )
+    parser.add_argument(
+        "--server-pid",
+        type=int,
+        default=None,
+        help="PID of an already running server to sample CPU from.",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=DEFAULT_SPEED,
+        help=(
+            "Playback speed: 1 keeps the recorded timing, N plays N times faster and 0 "
+            f"sends every frame as soon as the previous one is out (default: {DEFAULT_SPEED})."
+        ),
+    )
+    parser.add_argument(
+        "--max-gap-seconds",
+        type=float,
+        default=DEFAULT_MAX_GAP_SECONDS,
+        help="Shorten idle gaps between recorded frames to this many seconds (default: off).",
+    )
+    parser.add_argument(
+        "--room",
+        action="append",
+        default=None,
+        help="Only replay sessions of this room; repeat for several rooms.",
+    )
+    parser.add_argument(
+        "--tail-seconds",
+        type=float,
+        default=DEFAULT_TAIL_SECONDS,
+        help=(
+            "Seconds to keep reading replies after the last frame "
+            f"(default: {DEFAULT_TAIL_SECONDS})."
+        ),
+    )
+    parser.add_argument(
+        "--client-version",
+        default=None,
+        help=(
+            "clientVersion written into recorded joins "
+            f"(default: read from {DEFAULT_VERSION_PATH})."
+        ),
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Earlier replay report to compute latency and CPU deltas against.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="Write the JSON report to this path instead of stdout.",
+    )
+    return parser.parse_args()
+
+
+def encode_payload(kind: int, payload: dict) -> str | bytes:
+    if kind == FRAME_BINARY:
+        return encode_frame(payload, CODEC_MSGPACK)
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def read_expected_version(message_type: str | None, payload: dict | None) -> int | None:
+    if message_type not in MOVE_MESSAGE_TYPES or message_type == MESSAGE_TYPE_NEW_GAME:
+        return None
+    if payload is None:
+        return None
+    base_version = payload.get(JSON_KEY_BASE_VERSION, payload.get(JSON_KEY_BASE_VERSION_ALT))
+    snapshot = payload.get(JSON_KEY_SNAPSHOT)
+    if not isinstance(base_version, int) and isinstance(snapshot, dict):
+        base_version = snapshot.get(JSON_KEY_STATE_VERSION)
+    return base_version + 1 if isinstance(base_version, int) else None
+
+
+def read_message_version(message: dict) -> int | None:
+    snapshot = message.get(JSON_KEY_SNAPSHOT)
+    if isinstance(snapshot, dict):
+        version = snapshot.get(JSON_KEY_STATE_VERSION)
+    else:
+        version = message.get(JSON_KEY_TO_VERSION)
+    return version if isinstance(version, int) else None
+
+
+def find_session_rooms(frames: list[CapturedFrame]) -> dict[str, str]:
+    rooms: dict[str, str] = {}
+    for frame in frames:
+        if frame.room_id:
+            rooms.setdefault(frame.session_id, frame.room_id)
+    return rooms
+
+
+def load_frames(
+    paths: list[Path], rooms: set[str] | None, client_version: str, max_gap_seconds: float
+) -> list[ReplayFrame]:
+    captured = sorted(
+        (frame for path in paths for frame in read_capture(path)),
+        key=lambda frame: frame.recorded_at,
+    )
+    session_rooms = find_session_rooms(captured)
+    frames: list[ReplayFrame] = []
+    offset = 0.0
+    previous_at = captured[0].recorded_at if captured else 0.0
+    for frame in captured:
+        gap = frame.recorded_at - previous_at
+        previous_at = frame.recorded_at
+        offset += min(gap, max_gap_seconds) if max_gap_seconds > 0 else gap
+        message_type = None
+        raw: str | bytes = b""
+        payload = None
+        if frame.kind != FRAME_CLOSE:
+            raw = frame.frame()
+            try:
+                payload = decode_message(raw)
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                payload = None
+            message_type = payload.get(JSON_KEY_TYPE) if payload is not None else None
+            if message_type == MESSAGE_TYPE_JOIN:
+                room_id = payload.get(JSON_KEY_ROOM_ID)
+                if isinstance(room_id, str):
+                    session_rooms.setdefault(frame.session_id, room_id)
+                if client_version:
+                    payload = {**payload, JSON_KEY_CLIENT_VERSION: client_version}
+                    raw = encode_payload(frame.kind, payload)
+        room_id = session_rooms.get(frame.session_id, "")
+        if rooms is not None and room_id not in rooms:
+            continue
+        expected_version = read_expected_version(message_type, payload)
+        if payload is not None and not isinstance(payload.get(JSON_KEY_GAME_ID), str):
+            payload = None
+        frames.append(
+            ReplayFrame(
+                offset,
+                frame.kind,
+                frame.session_id,
+                room_id,
+                message_type,
+                raw,
+                payload,
+                expected_version,
+            )
+        )
+    return frames
+
+
+class ReplaySession:
+    def __init__(
+        self, url: str, room_id: str, stats: ReplayStats, game_ids: dict[str, str]
+    ) -> None:
+        self.url = url
+        self.room_id = room_id
+        self.stats = stats
+        self.game_ids = game_ids
+        self.websocket = None
+        self.reader: asyncio.Task | None = None
+        self.pending: deque[PendingReply] = deque()
+        self.answered = asyncio.Event()
+        self.answered.set()
+
+    async def open(self) -> None:
+        try:
+            self.websocket = await websockets.connect(self.url, max_size=None)
+        except OSError:
+            self.stats.connect_failures += 1
+            return
+        self.stats.sessions += 1
+        self.reader = asyncio.create_task(self.read_messages())
+
+    async def send(self, frame: ReplayFrame) -> None:
+        if self.websocket is None or self.reader is None or self.reader.done():
+            self.stats.frames_skipped += 1
+            return
+        game_id = self.game_ids.get(self.room_id)
+        pending = None
+        if frame.message_type in REQUEST_MESSAGE_TYPES:
+            pending = PendingReply(
+                time.perf_counter(), frame.message_type, frame.expected_version, game_id
+            )
+            self.pending.append(pending)
+            self.answered.clear()
+        try:
+            await self.websocket.send(frame.encode(game_id))
+        except websockets.ConnectionClosed:
+            self.stats.frames_skipped += 1
+            if self.pending and self.pending[-1] is pending:
+                self.pending.pop()
+            return
+        self.stats.frames_sent += 1
+
+    def find_replies(self, message: dict) -> list[int]:
+        message_type = message.get(JSON_KEY_TYPE)
+        if not self.pending:
+            return []
+        if message_type == MESSAGE_TYPE_ERROR:
+            # The server handles one socket's requests in order and never coalesces errors.
+            return [0]
+        if message_type == MESSAGE_TYPE_SNAPSHOT:
+            candidates = [
+                index
+                for index, pending in enumerate(self.pending)
+                if pending.message_type in SNAPSHOT_REQUEST_TYPES
+            ]
+            return candidates[:1]
+        if message_type not in STATE_MESSAGE_TYPES:
+            return []
+        # Queued updates are coalesced server-side, so one update answers every move it has
+        # reached: those of its own game up to its version, and those of an earlier game
+        # that the server handled before the next pending newGame.
+        version = read_message_version(message)
+        game_id = message.get(JSON_KEY_GAME_ID)
+        new_game = next(
+            (
+                index
+                for index, pending in enumerate(self.pending)
+                if pending.message_type == MESSAGE_TYPE_NEW_GAME
+            ),
+            len(self.pending),
+        )
+        return [
+            index
+            for index, pending in enumerate(self.pending)
+            if pending.message_type in MOVE_MESSAGE_TYPES
+            and (
+                pending.expected_version is None
+                or version is None
+                or (pending.game_id != game_id and index < new_game)
+                or (pending.game_id == game_id and pending.expected_version <= version)
+            )
+        ]
+
+    def record_replies(self, message: dict, received_at: float) -> None:
+        indexes = self.find_replies(message)
+        for index in reversed(indexes):
+            pending = self.pending[index]
+            del self.pending[index]
+            self.stats.latencies_ms.setdefault(pending.message_type, []).append(
+                (received_at - pending.sent_at) * MS_PER_SECOND
+            )
+        if not self.pending:
+            self.answered.set()
+
+    async def read_messages(self) -> None:
+        try:
+            async for raw in self.websocket:
+                received_at = time.perf_counter()
+                self.stats.messages_received += 1
+                self.stats.bytes_received += len(raw)
+                try:
+                    message = decode_message(raw)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                game_id = message.get(JSON_KEY_GAME_ID)
+                if isinstance(game_id, str) and game_id:
+                    self.game_ids[self.room_id] = game_id
+                self.record_replies(message, received_at)
+                if message.get(JSON_KEY_TYPE) == MESSAGE_TYPE_ERROR:
+                    key = message.get(JSON_KEY_MESSAGE) or "unknown"
+                    self.stats.errors[key] = self.stats.errors.get(key, 0) + 1
+        except websockets.ConnectionClosed:
+            pass
+        self.stats.disconnects += 1
+        self.answered.set()
+
+    async def finish(self) -> None:
+        try:
+            await asyncio.wait_for(self.answered.wait(), REPLY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        await self.close()
+
+    async def close(self) -> None:
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+        self.stats.unanswered += len(self.pending)
+        self.pending.clear()
+
+
+async def play_frames(
+    args: argparse.Namespace, url: str, frames: list[ReplayFrame], stats: ReplayStats
+) -> None:
+    sessions: dict[str, ReplaySession] = {}
+    closing: list[asyncio.Task] = []
+    game_ids: dict[str, str] = {}
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        for frame in frames:
+            if args.speed > 0:
+                due = started + frame.offset_seconds / args.speed
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                stats.schedule_lag_ms.append(max(loop.time() - due, 0.0) * MS_PER_SECOND)
+            session = sessions.get(frame.session_id)
+            if frame.kind == FRAME_CLOSE:
+                if session is not None:
+                    closing.append(asyncio.create_task(session.finish()))
+                continue
+            if session is None:
+                session = ReplaySession(url, frame.room_id, stats, game_ids)
+                sessions[frame.session_id] = session
+                await session.open()
+            await session.send(frame)
+        await asyncio.sleep(args.tail_seconds)
+        await asyncio.gather(*closing, return_exceptions=True)
+    finally:
+        for task in closing:
+            task.cancel()
+        await asyncio.gather(
+            *(session.close() for session in sessions.values()), return_exceptions=True
+        )
+
+
+async def run_replay(args: argparse.Namespace, frames: list[ReplayFrame]) -> dict:
+    url = args.url or f"ws://{DEFAULT_HOST}:{args.port}/ws"
+    process = None
+    server_pid = args.server_pid
+    if args.start_server:
+        process = start_server(args.port, SERVER_ENV_DEFAULTS)
+        server_pid = process.pid
+        await wait_for_server(url, process)
+    stats = ReplayStats()
+    try:
+        cpu_start = read_process_cpu_seconds(server_pid)
+        started = time.perf_counter()
+        await play_frames(args, url, frames, stats)
+        elapsed = time.perf_counter() - started
+        cpu_end = read_process_cpu_seconds(server_pid)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return build_report(args, url, frames, stats, elapsed, cpu_start, cpu_end)
+
+
+def summarize_ms(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3) if ordered else None,
+        **{f"p{percent}": percentile(ordered, percent) for percent in PERCENTILES},
+        "max": round(ordered[-1], 3) if ordered else None,
+    }
+
+
+def subtract(current: float | None, baseline: float | None) -> float | None:
+    if current is None or baseline is None:
+        return None
+    return round(current - baseline, 3)
+
+
+def build_deltas(report: dict, baseline: dict) -> dict:
+    latency = report["latencyMs"]
+    baseline_latency = baseline.get("latencyMs", {})
+    cpu = report["serverCpu"]
+    baseline_cpu = baseline.get("serverCpu", {})
+    return {
+        "latencyMs": {
+            key: subtract(latency.get(key), baseline_latency.get(key))
+            for key in DELTA_LATENCY_KEYS
+        },
+        "serverCpu": {
+            key: subtract(cpu.get(key), baseline_cpu.get(key)) for key in DELTA_CPU_KEYS
+        },
+        "errors": {
+            key: report["errors"].get(key, 0) - baseline.get("errors", {}).get(key, 0)
+            for key in sorted(set(report["errors"]) | set(baseline.get("errors", {})))
+        },
+    }
+
+
+def build_report(
+    args: argparse.Namespace,
+    url: str,
+    frames: list[ReplayFrame],
+    stats: ReplayStats,
+    elapsed: float,
+    cpu_start: float | None,
+    cpu_end: float | None,
+) -> dict:
+    cpu_seconds = None
+    cpu_percent = None
+    if cpu_start is not None and cpu_end is not None:
+        cpu_seconds = round(cpu_end - cpu_start, 3)
+        cpu_percent = round(cpu_seconds / elapsed * 100, 1) if elapsed > 0 else None
+    all_latencies = [value for values in stats.latencies_ms.values() for value in values]
+    report = {
+        "config": {
+            "url": url,
+            "captures": [str(path) for path in args.captures],
+            "speed": args.speed,
+            "maxGapSeconds": args.max_gap_seconds,
+            "rooms": args.room,
+            "tailSeconds": args.tail_seconds,
+        },
+        "captureFrames": len(frames),
+        "captureSeconds": round(frames[-1].offset_seconds, 3) if frames else 0.0,
+        "elapsedSeconds": round(elapsed, 3),
+        "sessions": stats.sessions,
+        "connectFailures": stats.connect_failures,
+        "disconnects": stats.disconnects,
+        "framesSent": stats.frames_sent,
+        "framesSkipped": stats.frames_skipped,
+        "unanswered": stats.unanswered,
+        "messagesReceived": stats.messages_received,
+        "bytesReceived": stats.bytes_received,
+        "latencyMs": summarize_ms(all_latencies),
+        "latencyMsByType": {
+            message_type: summarize_ms(values)
+            for message_type, values in sorted(stats.latencies_ms.items())
+        },
+        "scheduleLagMs": summarize_ms(stats.schedule_lag_ms),
+        "errors": dict(sorted(stats.errors.items())),
+        "serverCpu": {"seconds": cpu_seconds, "percent": cpu_percent},
+    }
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        report["baseline"] = str(args.baseline)
+        report["delta"] = build_deltas(report, baseline)
+    return report
+
+
+def main() -> None:
+    args = parse_args()
+    if websockets is None:
+        raise SystemExit("The 'websockets' package is required: pip install websockets")
+    if args.speed < 0:
+        raise SystemExit("--speed must be 0 or more")
+    if args.client_version is None:
+        args.client_version = read_client_version(DEFAULT_VERSION_PATH)
+    try:
+        frames = load_frames(
+            args.captures,
+            set(args.room) if args.room else None,
+            args.client_version,
+            args.max_gap_seconds,
+        )
+    except (OSError, ValueError) as error:
+        raise SystemExit(str(error))
+    if not frames:
+        raise SystemExit("No frames to replay")
+    report = asyncio.run(run_replay(args, frames))
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+        return
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(output + "\n", encoding="utf-8")
+    print(f"Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()